@@ -0,0 +1,520 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from base_local import conectar, candado
+from esquema import tiempo_a_segundos, segundos_a_tiempo, tipar_dataframe, existe_fecha, FORMATO_FECHA
+from instrumentacion import tramo, en_contexto, tamano_valores
+from planificador_google import ejecutar
+
+# =============================================================================
+# MOTORES DE ALMACENAMIENTO
+# =============================================================================
+# `data_management` guarda y consulta las sesiones a través de un motor:
+#   - "sqlite": base de datos local indexada por (hoja, fecha) y (hoja, ejercicio).
+#     Google Sheets queda como espejo opcional: las escrituras se copian a la
+#     hoja a través del diario y, si un atleta aún no tiene datos locales, se
+#     siembran desde su hoja.
+#   - "sheets": Google Sheets como única fuente (instantánea local + diario).
+# Se elige con CAMBIO_FISICO_ALMACENAMIENTO y el espejo se desactiva con
+# CAMBIO_FISICO_ESPEJO_SHEETS=0. Los atletas se identifican por su hoja.
+MOTOR = os.environ.get("CAMBIO_FISICO_ALMACENAMIENTO", "sqlite")
+ESPEJO_SHEETS = os.environ.get("CAMBIO_FISICO_ESPEJO_SHEETS", "1") != "0"
+
+_almacenamiento = None
+_candado = threading.Lock()
+
+# Tablas del motor SQLite en la base local compartida (ver `base_local`)
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hoja TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    tiempo REAL,
+    sensacion TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS sesiones_hoja_fecha ON sesiones (hoja, fecha);
+CREATE TABLE IF NOT EXISTS sembradas (
+    hoja TEXT PRIMARY KEY,
+    instante REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS series (
+    sesion INTEGER NOT NULL REFERENCES sesiones (id) ON DELETE CASCADE,
+    hoja TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    ejercicio TEXT NOT NULL,
+    valor REAL NOT NULL,
+    series INTEGER,
+    repeticiones INTEGER,
+    PRIMARY KEY (sesion, ejercicio)
+);
+CREATE INDEX IF NOT EXISTS series_hoja_ejercicio ON series (hoja, ejercicio, fecha, sesion);
+"""
+
+
+def _columnas():
+    from data_management import COLUMNAS, COLUMNAS_EJERCICIOS  # Diferido: data_management importa este módulo
+    return COLUMNAS, COLUMNAS_EJERCICIOS
+
+
+class AlmacenamientoSheets:
+    """Google Sheets como base de datos: se carga la hoja entera y se escribe por el diario."""
+
+    copia_local = False  # Lo que Google rechaza no queda guardado en ningún otro sitio
+    guarda_series = False  # La hoja no tiene columnas para series y repeticiones
+
+    def cargar(self, hojas, respaldo=True):
+        """
+        Carga los DataFrames tipados de varias hojas a la vez.
+
+        Las hojas se descargan en un grupo acotado de hilos, así que la espera
+        total es la de la hoja más lenta. Si Google falla, se usa la instantánea
+        local de la hoja; con `respaldo=False` se lanza el error.
+        """
+        from data_management import cargar_hoja, _preparar_dataframe, MAX_HILOS_CARGA
+
+        if not hojas:
+            return []
+        with ThreadPoolExecutor(max_workers=min(MAX_HILOS_CARGA, len(hojas))) as grupo:
+            futuros = [grupo.submit(*en_contexto(cargar_hoja, hoja, respaldo)) for hoja in hojas]
+            dfs = [futuro.result() for futuro in futuros]
+        return [_preparar_dataframe(df) for df in dfs]
+
+    def instantanea(self, hojas):
+        """DataFrames de la última instantánea local de cada hoja, sin llamar a Google (None si no hay)."""
+        from sincronizacion import instantanea_local
+        from data_management import _preparar_dataframe
+
+        dfs = [instantanea_local(hoja) for hoja in hojas]
+        return [None if df is None else _preparar_dataframe(df) for df in dfs]
+
+    def refrescar(self, hojas):
+        """Trae de Google las filas nuevas de cada hoja; si Google no responde, lanza el error."""
+        return self.cargar(hojas, respaldo=False)
+
+    def existe_sesion(self, nombre_hoja, fecha):
+        return existe_fecha(self.cargar([nombre_hoja])[0], fecha)
+
+    def guardar_sesion(self, nombre_hoja, registro):
+        """Anota el registro en el diario; devuelve False si esa fecha ya estaba."""
+        from diario_escrituras import registrar_escritura
+        return registrar_escritura(nombre_hoja, registro, _columnas()[0])
+
+    def importar_registros(self, nombre_hoja, registros):
+        """Anota muchos registros en el diario en una sola transacción."""
+        from diario_escrituras import registrar_escrituras
+        return registrar_escrituras(nombre_hoja, registros, _columnas()[0])
+
+    def rango(self, nombre_hoja, inicio, fin):
+        df = self.cargar([nombre_hoja])[0]
+        return df.loc[pd.Timestamp(inicio):pd.Timestamp(fin)]
+
+    def bloques(self, nombre_hoja, tamano):
+        """
+        Recorre la hoja de Google Sheets por rangos de `tamano` filas, sin leerla entera.
+
+        Yields:
+            list: Filas de texto en el orden de COLUMNAS (sin la cabecera).
+        """
+        from google_clients import obtener_hoja
+        from gspread.utils import rowcol_to_a1
+
+        hoja = obtener_hoja(nombre_hoja)
+        ancho = len(_columnas()[0])
+        ultima_columna = rowcol_to_a1(1, ancho).rstrip("0123456789")
+        inicio = 2  # La fila 1 es la cabecera
+        while True:
+            rango = f"A{inicio}:{ultima_columna}{inicio + tamano - 1}"
+            with tramo("sheets.get", hoja=nombre_hoja, desde=inicio):
+                filas = ejecutar(
+                    "sheets.lectura", "get", lambda: hoja.get(rango), clave=(nombre_hoja, rango), tamano=tamano_valores
+                )
+            if not filas:
+                return
+            yield [(list(fila) + [""] * ancho)[:ancho] for fila in filas]
+            inicio += tamano
+
+    def ultimos_valores(self, nombre_hoja):
+        df = self.cargar([nombre_hoja])[0]
+        ultimos = df[_columnas()[1]].ffill().iloc[-1] if len(df) else pd.Series(dtype=float)
+        return {ejercicio: float(valor) for ejercicio, valor in ultimos.dropna().items()}
+
+    def detalle_series(self, nombre_hoja, desde=None):
+        """Sin series ni repeticiones en la hoja: (None, None)."""
+        return None, None
+
+
+class AlmacenamientoSQLite:
+    """
+    Base de datos local con una fila por sesión y una fila por ejercicio hecho.
+
+    `sesiones` está indexada por (hoja, fecha) para las consultas por fechas y
+    `series` por (hoja, ejercicio, fecha) para el último valor de cada ejercicio,
+    así que ninguna de las dos consultas recorre el historial completo.
+    """
+
+    copia_local = True  # La base es la copia principal; Sheets es solo un espejo
+    guarda_series = True
+
+    def __init__(self, ruta=None, espejo=ESPEJO_SHEETS):
+        self.ruta = ruta  # None: la base local compartida
+        self.espejo = AlmacenamientoSheets() if espejo else None
+
+    def _conectar(self):
+        conexion = conectar(_ESQUEMA, self.ruta)
+        return conexion
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+    def _insertar(self, conexion, nombre_hoja, fecha, tiempo, sensacion, valores):
+        """Inserta una sesión con sus series; devuelve False si ya había una ese día."""
+        cursor = conexion.execute(
+            "INSERT OR IGNORE INTO sesiones (hoja, fecha, tiempo, sensacion) VALUES (?, ?, ?, ?)",
+            (nombre_hoja, fecha, tiempo, sensacion)
+        )
+        if cursor.rowcount == 0:
+            return False
+        conexion.executemany(
+            "INSERT INTO series (sesion, hoja, fecha, ejercicio, valor, series, repeticiones) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(cursor.lastrowid, nombre_hoja, fecha, *valor) for valor in valores]
+        )
+        return True
+
+    def guardar_sesion(self, nombre_hoja, registro):
+        """
+        Guarda una sesión del formulario y la copia al espejo de Sheets.
+
+        El registro puede traer en "Series" las series y repeticiones de cada
+        ejercicio ({ejercicio: {"series": 4, "repeticiones": 8}}); solo se
+        guardan aquí, porque la hoja no tiene columnas para ellas.
+
+        Returns:
+            bool: True si la sesión es nueva, False si ya había una ese día.
+        """
+        _, columnas_ejercicios = _columnas()
+        fecha = pd.to_datetime(registro["Fecha"], format=FORMATO_FECHA).strftime("%Y-%m-%d")
+        tiempo = tiempo_a_segundos(pd.Series([registro.get("Tiempo entrenado")])).iloc[0]
+        valores = pd.to_numeric(
+            pd.Series({ejercicio: registro.get(ejercicio) for ejercicio in columnas_ejercicios}, dtype=object),
+            errors="coerce"
+        ).dropna()
+        detalle = registro.get("Series") or {}
+        filas = [
+            (ejercicio, float(valor), detalle.get(ejercicio, {}).get("series"),
+             detalle.get(ejercicio, {}).get("repeticiones"))
+            for ejercicio, valor in valores.items()
+        ]
+
+        with candado, self._conectar() as conexion:
+            nueva = self._insertar(
+                conexion, nombre_hoja, fecha, None if pd.isna(tiempo) else float(tiempo),
+                registro.get("Sensación") or None, filas
+            )
+        conexion.close()
+
+        if nueva and self.espejo is not None:
+            self.espejo.guardar_sesion(nombre_hoja, registro)
+        return nueva
+
+    def importar(self, nombre_hoja, df):
+        """
+        Añade las sesiones de un DataFrame tipado cuyas fechas aún no estén en la base.
+
+        Es idempotente: reimportar la misma hoja no duplica sesiones, y de los
+        días repetidos en `df` solo se guarda el primero.
+
+        Returns:
+            int: Número de sesiones añadidas.
+        """
+        _, columnas_ejercicios = _columnas()
+        fechas = df["Fecha"].dt.strftime("%Y-%m-%d").to_numpy()
+        tiempos = df["Tiempo entrenado"].to_numpy()
+        sensaciones = df["Sensación"].astype(object).to_numpy()
+        valores = df[columnas_ejercicios].to_numpy()
+
+        with tramo("sqlite.importar", hoja=nombre_hoja, filas=len(df)):
+            with candado, self._conectar() as conexion:
+                existentes = {
+                    fila[0] for fila in conexion.execute("SELECT fecha FROM sesiones WHERE hoja = ?", (nombre_hoja,))
+                }
+                anadidas = 0
+                for i, fecha in enumerate(fechas):
+                    if fecha in existentes:
+                        continue  # Atajo: el índice UNIQUE (hoja, fecha) descartaría la fila de todos modos
+                    presentes = ~pd.isna(valores[i])
+                    anadidas += self._insertar(
+                        conexion, nombre_hoja, fecha,
+                        None if pd.isna(tiempos[i]) else float(tiempos[i]),
+                        None if pd.isna(sensaciones[i]) else sensaciones[i],
+                        [(columnas_ejercicios[j], float(valores[i, j]), None, None) for j in presentes.nonzero()[0]]
+                    )
+            conexion.close()
+        return anadidas
+
+    def importar_registros(self, nombre_hoja, registros):
+        """
+        Guarda muchos registros del formato de la hoja (importaciones) y los copia al espejo.
+
+        Returns:
+            int: Número de sesiones nuevas (las fechas ya guardadas se saltan).
+        """
+        columnas, columnas_ejercicios = _columnas()
+        df = tipar_dataframe(pd.DataFrame(registros).reindex(columns=columnas), columnas_ejercicios)
+        nuevas = self.importar(nombre_hoja, df)
+        if self.espejo is not None:
+            self.espejo.importar_registros(nombre_hoja, registros)
+        return nuevas
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+    def _tiene_sesiones(self, conexion, nombre_hoja):
+        return conexion.execute("SELECT 1 FROM sesiones WHERE hoja = ? LIMIT 1", (nombre_hoja,)).fetchone() is not None
+
+    def _leer(self, conexion, nombre_hoja, inicio=None, fin=None):
+        """Lee las sesiones de una hoja (entre dos fechas, si se dan) como DataFrame tipado."""
+        _, columnas_ejercicios = _columnas()
+        filtro, parametros = "hoja = ?", [nombre_hoja]
+        if inicio is not None:
+            filtro += " AND fecha >= ?"
+            parametros.append(pd.Timestamp(inicio).strftime("%Y-%m-%d"))
+        if fin is not None:
+            filtro += " AND fecha <= ?"
+            parametros.append(pd.Timestamp(fin).strftime("%Y-%m-%d"))
+
+        sesiones = pd.read_sql_query(
+            f"SELECT id, fecha, tiempo, sensacion FROM sesiones WHERE {filtro} ORDER BY fecha, id",
+            conexion, params=parametros
+        )
+        series = pd.read_sql_query(
+            f"SELECT sesion, ejercicio, valor FROM series WHERE sesion IN "
+            f"(SELECT id FROM sesiones WHERE {filtro})",
+            conexion, params=parametros
+        )
+        ancho = series.pivot(index="sesion", columns="ejercicio", values="valor").reindex(
+            index=sesiones["id"], columns=columnas_ejercicios
+        )
+        valores = ancho.to_numpy(dtype="float32")
+        df = pd.DataFrame({
+            "Fecha": pd.to_datetime(sesiones["fecha"], format="%Y-%m-%d"),
+            "Tiempo entrenado": sesiones["tiempo"].astype("float32"),
+            "Sensación": sesiones["sensacion"],
+            **{ejercicio: valores[:, j] for j, ejercicio in enumerate(columnas_ejercicios)},
+        })
+        return tipar_dataframe(df, columnas_ejercicios)
+
+    def instantanea(self, hojas):
+        """DataFrames de las hojas con datos locales, sin llamar a Google (None en las vacías)."""
+        conexion = self._conectar()
+        try:
+            return [self._leer(conexion, hoja) if self._tiene_sesiones(conexion, hoja) else None for hoja in hojas]
+        finally:
+            conexion.close()
+
+    def refrescar(self, hojas):
+        """
+        Copia a la base las sesiones nuevas del espejo y recarga las hojas.
+
+        Solo se copian las fechas que aún no están en la base: la base es la
+        copia principal, así que editar en Sheets una fila ya copiada no
+        cambia la sesión local. A diferencia de la siembra, si Google no
+        responde se lanza el error.
+        """
+        if self.espejo is not None:
+            for hoja, df in zip(hojas, self.espejo.refrescar(hojas)):
+                self.importar(hoja, df)
+            self._marcar_sembradas(hojas)
+        return self.cargar(hojas)
+
+    def _marcar_sembradas(self, hojas):
+        with self._conectar() as conexion:
+            conexion.executemany(
+                "INSERT OR IGNORE INTO sembradas VALUES (?, ?)", [(hoja, time.time()) for hoja in hojas]
+            )
+        conexion.close()
+
+    def _sembrar(self, hojas):
+        """
+        Siembra desde el espejo de Sheets las hojas que aún no se han sembrado.
+
+        Cada hoja se siembra una sola vez (tabla `sembradas`): una hoja que sigue
+        vacía no vuelve a leerse de Google en cada carga. Las que ya tenían
+        sesiones locales se marcan sin leerlas; si Google falla, la hoja queda
+        sin marcar y se reintenta en la próxima carga.
+        """
+        if self.espejo is None or not hojas:
+            return
+        conexion = self._conectar()
+        try:
+            marcas = ", ".join("?" * len(hojas))
+            sembradas = {
+                fila[0] for fila in conexion.execute(f"SELECT hoja FROM sembradas WHERE hoja IN ({marcas})", hojas)
+            }
+            pendientes = [hoja for hoja in hojas if hoja not in sembradas]
+            con_datos = [hoja for hoja in pendientes if self._tiene_sesiones(conexion, hoja)]
+        finally:
+            conexion.close()
+        vacias = [hoja for hoja in pendientes if hoja not in con_datos]
+        if vacias:
+            try:
+                for hoja, df in zip(vacias, self.espejo.refrescar(vacias)):
+                    self.importar(hoja, df)
+            except Exception as e:
+                print(f"No se pudieron sembrar {vacias} desde Google Sheets: {e}")
+                vacias = []
+        if con_datos or vacias:
+            self._marcar_sembradas(con_datos + vacias)
+
+    def cargar(self, hojas):
+        """
+        Carga los DataFrames tipados de varias hojas desde la base local.
+
+        Las hojas sin ninguna sesión local se siembran antes desde el espejo de Sheets.
+        """
+        self._sembrar(hojas)
+        conexion = self._conectar()
+        try:
+            with tramo("sqlite.cargar", hojas=len(hojas)):
+                return [self._leer(conexion, hoja) for hoja in hojas]
+        finally:
+            conexion.close()
+
+    def cargar_largo(self, hojas, desde=None):
+        """
+        Lee las sesiones de varias hojas directamente en formato largo (ver `formato_largo`).
+
+        Con `desde`, solo las sesiones de esa fecha en adelante.
+
+        Returns:
+            tuple: (sesiones, series), con la hoja como identificador del atleta.
+        """
+        from formato_largo import tabla_sesiones, tabla_series
+
+        marcas = ", ".join("?" * len(hojas))
+        filtro, parametros = "", list(hojas)
+        if desde is not None:
+            filtro = " AND fecha >= ?"
+            parametros.append(pd.Timestamp(desde).strftime("%Y-%m-%d"))
+        conexion = self._conectar()
+        try:
+            with tramo("sqlite.cargar_largo", hojas=len(hojas)):
+                sesiones = pd.read_sql_query(
+                    f"SELECT hoja, id, fecha, tiempo, sensacion FROM sesiones WHERE hoja IN ({marcas}){filtro} "
+                    "ORDER BY hoja, fecha, id", conexion, params=parametros
+                )
+                series = pd.read_sql_query(
+                    f"SELECT hoja, sesion, fecha, ejercicio, valor, series, repeticiones FROM series "
+                    f"WHERE hoja IN ({marcas}){filtro} ORDER BY hoja, fecha, sesion", conexion, params=parametros
+                )
+        finally:
+            conexion.close()
+        return (
+            tabla_sesiones(hojas, sesiones["hoja"], sesiones["id"], pd.to_datetime(sesiones["fecha"]),
+                           sesiones["tiempo"], sesiones["sensacion"]),
+            tabla_series(hojas, series["hoja"], series["sesion"], pd.to_datetime(series["fecha"]),
+                         series["ejercicio"], series["valor"], series["series"], series["repeticiones"]),
+        )
+
+    def detalle_series(self, nombre_hoja, desde=None):
+        """
+        Series y repeticiones de un atleta con la forma de su DataFrame ancho
+        (con `desde`, solo de esa fecha en adelante).
+
+        Returns:
+            tuple: (series, repeticiones), DataFrames por fecha y ejercicio (ver
+            `formato_largo.detalle_a_ancho`); si un día tiene varias sesiones,
+            vale la última.
+        """
+        from formato_largo import detalle_a_ancho
+
+        sesiones, series = self.cargar_largo([nombre_hoja], desde)
+        return tuple(tabla.groupby(level=0).last() for tabla in detalle_a_ancho(sesiones, series))
+
+    def existe_sesion(self, nombre_hoja, fecha):
+        conexion = self._conectar()
+        try:
+            return conexion.execute(
+                "SELECT 1 FROM sesiones WHERE hoja = ? AND fecha = ? LIMIT 1",
+                (nombre_hoja, pd.Timestamp(fecha).strftime("%Y-%m-%d"))
+            ).fetchone() is not None
+        finally:
+            conexion.close()
+
+    def rango(self, nombre_hoja, inicio, fin):
+        """Sesiones entre `inicio` y `fin` (ambas incluidas), leídas por el índice de fechas."""
+        conexion = self._conectar()
+        try:
+            return self._leer(conexion, nombre_hoja, inicio, fin)
+        finally:
+            conexion.close()
+
+    def bloques(self, nombre_hoja, tamano):
+        """
+        Recorre las sesiones de una hoja en orden de fecha, de `tamano` en `tamano`.
+
+        Yields:
+            list: Filas de texto en el orden de COLUMNAS, como en la hoja.
+        """
+        self._sembrar([nombre_hoja])
+        _, columnas_ejercicios = _columnas()
+        posicion = {ejercicio: i for i, ejercicio in enumerate(columnas_ejercicios)}
+        conexion = self._conectar()
+        try:
+            cursor = conexion.execute(
+                "SELECT id, fecha, tiempo, sensacion FROM sesiones WHERE hoja = ? ORDER BY fecha, id", (nombre_hoja,)
+            )
+            while True:
+                sesiones = cursor.fetchmany(tamano)
+                if not sesiones:
+                    return
+                valores = {id_: [""] * len(columnas_ejercicios) for id_, _, _, _ in sesiones}
+                marcas = ", ".join("?" * len(sesiones))
+                for sesion, ejercicio, valor in conexion.execute(
+                    f"SELECT sesion, ejercicio, valor FROM series WHERE sesion IN ({marcas})", list(valores)
+                ):
+                    valores[sesion][posicion[ejercicio]] = f"{valor:g}"
+                yield [
+                    [pd.Timestamp(fecha).strftime(FORMATO_FECHA), segundos_a_tiempo(tiempo), sensacion or "", *valores[id_]]
+                    for id_, fecha, tiempo, sensacion in sesiones
+                ]
+        finally:
+            conexion.close()
+
+    def ultimos_valores(self, nombre_hoja):
+        """Último valor de cada ejercicio, en una sola consulta sobre el índice (hoja, ejercicio, fecha)."""
+        conexion = self._conectar()
+        try:
+            return dict(conexion.execute(
+                "SELECT ejercicio, valor FROM ("
+                "    SELECT ejercicio, valor, ROW_NUMBER() OVER ("
+                "        PARTITION BY ejercicio ORDER BY fecha DESC, sesion DESC"
+                "    ) AS orden FROM series WHERE hoja = ?"
+                ") WHERE orden = 1",
+                (nombre_hoja,)
+            ))
+        finally:
+            conexion.close()
+
+
+MOTORES = {"sqlite": AlmacenamientoSQLite, "sheets": AlmacenamientoSheets}
+
+
+def obtener_almacenamiento():
+    """Devuelve el motor de almacenamiento del proceso, creándolo según MOTOR."""
+    global _almacenamiento
+    with _candado:
+        if _almacenamiento is None:
+            if MOTOR not in MOTORES:
+                raise ValueError(f"Motor de almacenamiento desconocido: {MOTOR}")
+            _almacenamiento = MOTORES[MOTOR]()
+        return _almacenamiento
+
+
+def establecer_almacenamiento(almacenamiento):
+    """Sustituye el motor del proceso (p. ej. en benchmarks); None vuelve al de MOTOR."""
+    global _almacenamiento
+    with _candado:
+        _almacenamiento = almacenamiento
@@ -0,0 +1,82 @@
+import json
+import os
+from drive_utils import CARPETA_DRIVE_ID
+
+# =============================================================================
+# REGISTRO DE ATLETAS
+# =============================================================================
+# Si existe RUTA_ATLETAS se usa en lugar del registro por defecto. Es una lista
+# JSON con objetos {"nombre", "hoja", "genero", "carpeta_drive"}; la carpeta
+# es opcional y por defecto se usa CARPETA_DRIVE_ID.
+RUTA_ATLETAS = "atletas.json"
+GENEROS = ("hombre", "mujer")  # Claves de MAXIMOS en stats_analysis
+
+ATLETAS_POR_DEFECTO = [
+    {"nombre": "Animalaco", "hoja": "data_animalaco", "genero": "hombre", "carpeta_drive": CARPETA_DRIVE_ID},
+    {"nombre": "Mamasota", "hoja": "data_mamasota", "genero": "mujer", "carpeta_drive": CARPETA_DRIVE_ID},
+]
+
+_atletas = None
+
+
+def _validar(atletas):
+    """Comprueba que cada atleta tenga los campos necesarios y nombres únicos."""
+    nombres = set()
+    hojas = set()
+    for atleta in atletas:
+        for campo in ("nombre", "hoja", "genero"):
+            if not atleta.get(campo):
+                raise ValueError(f"Falta el campo '{campo}' en el atleta {atleta}")
+        if atleta["genero"] not in GENEROS:
+            raise ValueError(f"Género desconocido para {atleta['nombre']}: {atleta['genero']}")
+        if atleta["nombre"] in nombres or atleta["hoja"] in hojas:
+            raise ValueError(f"Atleta u hoja repetidos: {atleta['nombre']} / {atleta['hoja']}")
+        nombres.add(atleta["nombre"])
+        hojas.add(atleta["hoja"])
+        atleta.setdefault("carpeta_drive", CARPETA_DRIVE_ID)
+    return atletas
+
+
+def cargar_atletas(ruta=RUTA_ATLETAS):
+    """
+    Carga el registro de atletas desde `ruta`, o el registro por defecto si no existe.
+
+    Returns:
+        list: Lista de diccionarios con nombre, hoja, genero y carpeta_drive.
+    """
+    if os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            atletas = json.load(f)
+    else:
+        atletas = [dict(atleta) for atleta in ATLETAS_POR_DEFECTO]
+    return _validar(atletas)
+
+
+def obtener_atletas():
+    """Devuelve el registro de atletas, leyéndolo una sola vez por proceso."""
+    global _atletas
+    if _atletas is None:
+        _atletas = cargar_atletas()
+    return _atletas
+
+
+def establecer_atletas(atletas):
+    """Sustituye el registro del proceso (p. ej. por atletas sintéticos en benchmarks)."""
+    global _atletas
+    _atletas = _validar([dict(atleta) for atleta in atletas])
+
+
+def atleta_por_nombre(nombre):
+    """Devuelve el atleta con ese nombre (el de su pestaña)."""
+    for atleta in obtener_atletas():
+        if atleta["nombre"] == nombre:
+            return atleta
+    raise KeyError(f"Atleta desconocido: {nombre}")
+
+
+def atleta_por_hoja(nombre_hoja):
+    """Devuelve el atleta cuyos datos están en la hoja `nombre_hoja`."""
+    for atleta in obtener_atletas():
+        if atleta["hoja"] == nombre_hoja:
+            return atleta
+    raise KeyError(f"Hoja sin atleta asociado: {nombre_hoja}")
@@ -0,0 +1,33 @@
+import sqlite3
+import threading
+
+# =============================================================================
+# BASE LOCAL SQLITE COMPARTIDA
+# =============================================================================
+# Las sesiones (almacenamiento), el diario de escrituras, el historial de
+# puntuaciones y el índice de récords viven en un único archivo SQLite en modo
+# WAL. Cada módulo abre sus conexiones con `conectar()`, que crea sus tablas si
+# no existen, y toma `candado` para escribir: así los hilos del proceso se
+# turnan en lugar de esperar al bloqueo del archivo.
+RUTA_BASE_LOCAL = "entrenamientos.sqlite3"
+
+candado = threading.RLock()  # Reentrante: una escritura puede llamar a otra del mismo hilo
+
+
+def conectar(esquema=None, ruta=None):
+    """
+    Abre una conexión a la base local.
+
+    Args:
+        esquema (str, optional): Script SQL con los CREATE ... IF NOT EXISTS del módulo.
+        ruta (str, optional): Otro archivo en lugar de RUTA_BASE_LOCAL (p. ej. en benchmarks).
+
+    Returns:
+        sqlite3.Connection: Conexión en modo WAL y con claves foráneas activadas.
+    """
+    conexion = sqlite3.connect(ruta or RUTA_BASE_LOCAL, timeout=30)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA foreign_keys=ON")
+    if esquema:
+        conexion.executescript(esquema)
+    return conexion
@@ -0,0 +1,137 @@
+"""
+Benchmark del arranque en frío: cuánto cuesta `import main` y quién se lo lleva.
+
+Lanza un intérprete nuevo con `python -X importtime -c "import main"` y reparte
+el tiempo propio de cada import entre los paquetes de primer nivel (pandas,
+streamlit, ...) y los módulos del repositorio. Además comprueba que las
+dependencias que se cargan al primer uso (gspread, googleapiclient, ...) no se
+importan al arrancar.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_arranque --repeticiones 5 --salida arranque.json
+    python -m benchmarks.bench_arranque --comparar arranque.json --tolerancia 0.25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencias que solo deben cargarse cuando se usan por primera vez
+DIFERIDAS = ["gspread", "oauth2client", "googleapiclient", "google.oauth2"]
+
+
+def _modulos_propios():
+    return {nombre[:-3] for nombre in os.listdir(RAIZ) if nombre.endswith(".py")}
+
+
+def _importtime(modulo):
+    """Ejecuta `import modulo` en un proceso nuevo y devuelve las líneas de -X importtime."""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, cwd=RAIZ, check=True
+    )
+    return [linea for linea in proceso.stderr.splitlines() if linea.startswith("import time:")]
+
+
+def desglosar(lineas, propios):
+    """
+    Reparte el tiempo propio (sin hijos) de cada import por paquete de primer nivel.
+
+    Returns:
+        tuple: (total_ms, {paquete: ms}, {módulo propio: {"propio_ms", "acumulado_ms"}})
+    """
+    paquetes = defaultdict(float)
+    modulos = {}
+    total = 0.0
+    for linea in lineas[1:]:  # La primera es la cabecera de columnas
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        propio_ms = int(propio) / 1000
+        paquete = nombre.strip().split(".")[0]
+        paquetes[paquete] += propio_ms
+        total += propio_ms
+        if paquete in propios:
+            modulos[paquete] = {"propio_ms": propio_ms, "acumulado_ms": int(acumulado) / 1000}
+    return total, dict(paquetes), modulos
+
+
+def cargadas_al_arrancar(modulo):
+    """Devuelve las dependencias diferidas que aparecen en sys.modules tras `import modulo`."""
+    codigo = (
+        f"import sys, json, {modulo}; "
+        f"print(json.dumps([m for m in {DIFERIDAS!r} if m in sys.modules]))"
+    )
+    proceso = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, cwd=RAIZ, check=True)
+    return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+
+def medir(modulo, repeticiones):
+    """Mide el arranque varias veces y se queda con la más rápida (la menos ruidosa)."""
+    propios = _modulos_propios()
+    mejor = None
+    for _ in range(repeticiones):
+        total, paquetes, modulos = desglosar(_importtime(modulo), propios)
+        if mejor is None or total < mejor[0]:
+            mejor = (total, paquetes, modulos)
+    total, paquetes, modulos = mejor
+    return {
+        "modulo": modulo,
+        "total_ms": total,
+        "paquetes": dict(sorted(paquetes.items(), key=lambda p: -p[1])),
+        "modulos_propios": dict(sorted(modulos.items(), key=lambda m: -m[1]["acumulado_ms"])),
+        "diferidas_cargadas": cargadas_al_arrancar(modulo),
+    }
+
+
+def comparar(base, actual, tolerancia, minimo_ms=5.0):
+    """Paquetes cuyo coste de importación empeora más de `tolerancia` (y más de `minimo_ms`)."""
+    regresiones = []
+    for paquete, ms in actual["paquetes"].items():
+        antes = base["paquetes"].get(paquete, 0.0)
+        if ms - antes > minimo_ms and ms > antes * (1 + tolerancia):
+            regresiones.append({"paquete": paquete, "antes_ms": antes, "ahora_ms": ms})
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modulo", default="main", help="Módulo cuyo import se mide")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Paquetes a mostrar en el resumen")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento admitido (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    resultado = medir(args.modulo, args.repeticiones)
+
+    print(f"import {args.modulo}: {resultado['total_ms']:.0f} ms", file=sys.stderr)
+    for paquete, ms in list(resultado["paquetes"].items())[:args.top]:
+        print(f"  {paquete:30s} {ms:9.1f} ms", file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+
+    fallos = False
+    if resultado["diferidas_cargadas"]:
+        print(f"REGRESIÓN: se importan al arrancar {', '.join(resultado['diferidas_cargadas'])}", file=sys.stderr)
+        fallos = True
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = comparar(json.load(f), resultado, args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion['paquete']}: {regresion['antes_ms']:.1f} ms -> "
+                  f"{regresion['ahora_ms']:.1f} ms", file=sys.stderr)
+        fallos = fallos or bool(regresiones)
+    if fallos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Compara el motor de puntuación vectorizado con el cálculo original, categoría
+por categoría, sobre historiales largos.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_puntuacion --filas 1000 10000 100000
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from data_management import COLUMNAS
+from stats_analysis import (
+    CATEGORIAS, MAXIMOS, PESO_EJERCICIOS,
+    obtener_ultimo_registro_ejercicio, calcular_puntuaciones_atletas,
+)
+
+
+def calcular_puntuacion_grupo_original(df, categoria, genero):
+    """Copia de la implementación anterior, una categoría cada vez."""
+    ejercicios = CATEGORIAS[categoria]
+    total = 0
+    peso_total = 0
+    if categoria == "biceps":
+        ultimos_registros = [obtener_ultimo_registro_ejercicio(df, ej) for ej in ejercicios]
+        ejercicio_usado = ejercicios[np.argmax(ultimos_registros)]
+        peso = max(ultimos_registros)
+        maximo = MAXIMOS[genero][categoria][ejercicio_usado]
+        try:
+            peso = float(peso)
+        except (ValueError, TypeError):
+            peso = 0.0
+        return (peso / maximo) * 10 if maximo != 0 else 0
+    for ejercicio in ejercicios:
+        peso = obtener_ultimo_registro_ejercicio(df, ejercicio)
+        try:
+            peso = float(peso)
+        except (ValueError, TypeError):
+            peso = 0.0
+        if peso == 0:
+            continue
+        ponderacion = PESO_EJERCICIOS.get(categoria, {}).get(ejercicio, 1.0)
+        maximo = MAXIMOS[genero][categoria][ejercicio]
+        total += (peso / maximo) * 10 * ponderacion
+        peso_total += ponderacion
+    return min(total / peso_total, 10) if peso_total > 0 else 0
+
+
+def historial_sintetico(filas, semilla=0):
+    """Historial con el aspecto de `get_all_records`: enteros y cadenas vacías."""
+    rng = np.random.default_rng(semilla)
+    datos = {"Fecha": [f"{i:06d}" for i in range(filas)], "Tiempo entrenado": "1:00:00", "Sensación": "normal"}
+    for columna in COLUMNAS[3:]:
+        valores = rng.integers(5, 150, filas).astype(object)
+        valores[rng.random(filas) < 0.8] = ""
+        datos[columna] = valores
+    df = pd.DataFrame(datos, columns=COLUMNAS)
+    # El cálculo original falla con bíceps mezclando "" y números: dejarlos siempre rellenos
+    for ejercicio in CATEGORIAS["biceps"]:
+        df[ejercicio] = rng.integers(5, 40, filas)
+    return df
+
+
+def medir(funcion, repeticiones):
+    """Mejor tiempo (segundos) de `repeticiones` ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--atletas", type=int, default=2)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = []
+    for filas in args.filas:
+        dfs = {f"atleta{i}": historial_sintetico(filas, semilla=i) for i in range(args.atletas)}
+        generos = {nombre: ("hombre", "mujer")[i % 2] for i, nombre in enumerate(dfs)}
+
+        def original():
+            return {
+                nombre: {categoria: calcular_puntuacion_grupo_original(df, categoria, generos[nombre])
+                         for categoria in CATEGORIAS}
+                for nombre, df in dfs.items()
+            }
+
+        def vectorizado():
+            return calcular_puntuaciones_atletas(dfs, generos)
+
+        esperado, obtenido = original(), vectorizado()
+        for nombre in dfs:
+            for categoria in CATEGORIAS:
+                assert np.isclose(esperado[nombre][categoria], obtenido[nombre][categoria]), (nombre, categoria)
+
+        t_original = medir(original, args.repeticiones)
+        t_vectorizado = medir(vectorizado, args.repeticiones)
+        resultados.append({
+            "filas": filas,
+            "atletas": args.atletas,
+            "original_s": t_original,
+            "vectorizado_s": t_vectorizado,
+            "aceleracion": t_original / t_vectorizado,
+        })
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
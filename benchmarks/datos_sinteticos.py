@@ -0,0 +1,80 @@
+"""
+Generador de historiales de entrenamiento sintéticos con el aspecto de las hojas reales.
+
+Cada atleta entrena unas `sesiones_por_semana` veces; en cada sesión elige uno
+o dos focus y hace algunos de sus ejercicios, con cargas que progresan poco a
+poco y algún bajón. Los valores se devuelven como texto, igual que Sheets.
+"""
+from datetime import date, timedelta
+import numpy as np
+from data_management import COLUMNAS, COLUMNAS_EJERCICIOS
+from esquema import SENSACIONES, FORMATO_FECHA
+
+FOCUS = {
+    "pata": COLUMNAS_EJERCICIOS[0:12],
+    "espalda": COLUMNAS_EJERCICIOS[12:20],
+    "biceps": COLUMNAS_EJERCICIOS[20:24],
+    "pechito": COLUMNAS_EJERCICIOS[24:27],
+    "hombro": COLUMNAS_EJERCICIOS[27:28],
+    "triceps": COLUMNAS_EJERCICIOS[28:32],
+    "core": COLUMNAS_EJERCICIOS[32:33],
+}
+
+
+def atletas_sinteticos(n):
+    """Registro de `n` atletas sintéticos, alternando género."""
+    return [
+        {"nombre": f"Atleta {i}", "hoja": f"data_sintetica_{i}", "genero": ("hombre", "mujer")[i % 2]}
+        for i in range(n)
+    ]
+
+
+def historial_sintetico(anios, semilla=0, sesiones_por_semana=4, inicio=date(2020, 1, 6)):
+    """
+    Genera las filas de una hoja (cabecera incluida) para `anios` años de entrenamiento.
+
+    Returns:
+        list: Lista de filas de texto, la primera con COLUMNAS.
+    """
+    rng = np.random.default_rng(semilla)
+    cargas = {ejercicio: float(rng.integers(10, 60)) for ejercicio in COLUMNAS_EJERCICIOS}
+    filas = [list(COLUMNAS)]
+
+    dias = int(anios * 365)
+    probabilidad = sesiones_por_semana / 7
+    for dia in range(dias):
+        if rng.random() >= probabilidad:
+            continue
+        fecha = inicio + timedelta(days=dia)
+        segundos = int(rng.integers(45 * 60, 110 * 60))
+        fila = {
+            "Fecha": fecha.strftime(FORMATO_FECHA),
+            "Tiempo entrenado": f"{segundos // 3600}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}",
+            "Sensación": SENSACIONES[rng.integers(len(SENSACIONES))],
+        }
+        for focus in rng.choice(list(FOCUS), size=rng.integers(1, 3), replace=False):
+            ejercicios = FOCUS[focus]
+            for ejercicio in rng.choice(ejercicios, size=min(len(ejercicios), rng.integers(2, 5)), replace=False):
+                cargas[ejercicio] = max(5.0, cargas[ejercicio] * rng.normal(1.004, 0.03))
+                fila[ejercicio] = int(round(cargas[ejercicio]))
+        filas.append([str(fila.get(columna, "")) for columna in COLUMNAS])
+    return filas
+
+
+def imagen_sintetica(lado=1024, semilla=0):
+    """
+    Bytes de una imagen JPEG de `lado` x `lado` píxeles: degradados con algo de
+    ruido, que se comprimen más o menos como una foto (el ruido puro no).
+    """
+    import io
+    from PIL import Image
+    rng = np.random.default_rng(semilla)
+    eje = np.linspace(0, 1, lado)
+    fase = rng.random(3) * np.pi
+    pixeles = np.stack([
+        127 + 100 * np.sin(np.add.outer(eje * (2 + c), eje * (3 - c)) * np.pi + fase[c]) for c in range(3)
+    ], axis=-1) + rng.normal(0, 6, (lado, lado, 3))
+    pixeles = pixeles.clip(0, 255).astype(np.uint8)
+    salida = io.BytesIO()
+    Image.fromarray(pixeles).save(salida, format="JPEG", quality=85)
+    return salida.getvalue()
@@ -0,0 +1,308 @@
+"""
+Suite de benchmarks de la app con historiales sintéticos y servicios de Google falsos.
+
+Mide la carga de datos, la comprobación de fechas, la puntuación, el gráfico de
+araña, la escritura (directa y optimista) y la foto de Drive, y guarda los resultados en JSON para
+comparar ejecuciones.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.suite --atletas 4 --anios 5 --latencia 0.05 --salida base.json
+    python -m benchmarks.suite --comparar base.json --tolerancia 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+import almacenamiento
+import cache_imagenes
+import diario_escrituras
+import fotos
+import google_clients
+import planificador_google
+import servicio_datos
+import sincronizacion
+import stats_analysis
+from atletas import establecer_atletas
+from data_management import (
+    inicializar_dataframes, cargar_hoja, existe_entrenamiento_en_fecha, guardar_entrenamiento,
+    consultar_rango, ultimos_valores_ejercicios,
+)
+from diario_escrituras import vaciar_diario
+from drive_utils import buscar_ultima_imagen_drive, descargar_imagen_drive
+from cache_imagenes import CacheImagenes
+from stats_analysis import (
+    CATEGORIAS, calcular_puntuacion_grupo, calcular_puntuaciones_atletas, generar_radar_chart, generar_radar_combinado,
+)
+from historial_puntuaciones import obtener_historial
+from formato_largo import dfs_a_largo, puntuaciones_largo
+from progresion import detectar_records, resumen_progresion
+from fakes_google import SheetsFalso, DriveFalso
+from benchmarks.datos_sinteticos import atletas_sinteticos, historial_sintetico, imagen_sintetica
+
+CARPETA_FOTOS = "carpeta-sintetica"
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Suite:
+    """Prepara los datos sintéticos y los servicios falsos, y mide cada etapa."""
+
+    def __init__(self, n_atletas, anios, latencia, repeticiones):
+        self.repeticiones = repeticiones
+        self.sheets = SheetsFalso(latencia)
+        self.drive = DriveFalso(latencia)
+        self.atletas = atletas_sinteticos(n_atletas)
+        self.sesiones = 0
+        for i, atleta in enumerate(self.atletas):
+            filas = historial_sintetico(anios, semilla=i)
+            self.sesiones += len(filas) - 1
+            self.sheets.crear_hoja(atleta["hoja"], filas)
+            atleta["carpeta_drive"] = CARPETA_FOTOS
+        for i in range(50):
+            self.drive.anadir_archivo(
+                CARPETA_FOTOS, f"{i}.jpg", imagen_sintetica(semilla=i),
+                creado=datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=i)
+            )
+
+        google_clients.establecer_cliente_sheets(self.sheets)
+        google_clients.establecer_servicio_drive(self.drive)
+        establecer_atletas(self.atletas)
+        almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())  # SQLite se mide aparte
+        diario_escrituras.establecer_vaciado_automatico(False)  # El vaciado se mide aparte
+        planificador_google.establecer_limites(dict.fromkeys(planificador_google.LIMITES))  # Sin cuota: se mide el código
+        self.resultados = []
+
+    def medir(self, etapa, funcion, preparar=None, repeticiones=None):
+        """Ejecuta `funcion` varias veces y anota tiempos y llamadas a la API."""
+        tiempos = []
+        llamadas = 0
+        transferidos = 0
+        for _ in range(repeticiones or self.repeticiones):
+            if preparar:
+                preparar()
+            llamadas_antes = sum(self.sheets.llamadas.values()) + sum(self.drive.llamadas.values())
+            bytes_antes = self.sheets.bytes_transferidos + self.drive.bytes_descargados
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+            llamadas = sum(self.sheets.llamadas.values()) + sum(self.drive.llamadas.values()) - llamadas_antes
+            transferidos = self.sheets.bytes_transferidos + self.drive.bytes_descargados - bytes_antes
+        self.resultados.append({
+            "etapa": etapa,
+            "mejor_s": min(tiempos),
+            "media_s": sum(tiempos) / len(tiempos),
+            "repeticiones": len(tiempos),
+            "llamadas_api": llamadas,
+            "bytes": transferidos,
+        })
+        print(f"{etapa:32s} {min(tiempos) * 1000:10.2f} ms  ({llamadas} llamadas)", file=sys.stderr)
+
+    def ejecutar(self):
+        def sin_instantaneas():
+            sincronizacion._estados.clear()
+            shutil.rmtree(sincronizacion.DIRECTORIO_INSTANTANEAS, ignore_errors=True)
+
+        def cargar():
+            self.dfs = inicializar_dataframes(self.atletas)
+
+        # Carga de datos
+        self.medir("carga_fria", cargar, preparar=sin_instantaneas)
+        self.medir("carga_incremental", cargar)
+        self.medir("carga_desde_disco", cargar, preparar=sincronizacion._estados.clear)
+        self.medir("lectura_completa", lambda: [cargar_hoja(a["hoja"]) for a in self.atletas],
+                   preparar=sin_instantaneas)
+
+        # Servicio de datos: primera visita (instantánea local, sin Google) y visitas siguientes
+        self.medir("servicio_datos_primera_visita", lambda: servicio_datos.dataframes(self.atletas),
+                   preparar=servicio_datos.reiniciar)
+        self.medir("servicio_datos_caliente", lambda: servicio_datos.dataframes(self.atletas))
+
+        # Muchas sesiones pidiendo la misma hoja a la vez: una la descarga y las demás solo buscan filas nuevas
+        def lecturas_simultaneas():
+            with ThreadPoolExecutor(max_workers=8) as grupo:
+                list(grupo.map(cargar_hoja, [self.atletas[0]["hoja"]] * 8))
+
+        self.medir("lecturas_simultaneas_agrupadas", lecturas_simultaneas, preparar=sin_instantaneas)
+
+        # Motor SQLite local: siembra desde Sheets, carga y consultas por índice
+        sqlite = almacenamiento.AlmacenamientoSQLite(ruta="benchmark.sqlite3", espejo=True)
+        hojas = [a["hoja"] for a in self.atletas]
+        self.medir(
+            "carga_sqlite_siembra", lambda: sqlite.cargar(hojas),
+            preparar=lambda: [os.remove(r) for r in os.listdir() if r.startswith("benchmark.sqlite3")]
+        )
+        self.medir("carga_sqlite", lambda: sqlite.cargar(hojas))
+        almacenamiento.establecer_almacenamiento(sqlite)
+        self.medir("ultimos_valores_sqlite", lambda: [ultimos_valores_ejercicios(hoja) for hoja in hojas])
+        self.medir("rango_sqlite", lambda: [consultar_rango(hoja, date(2021, 1, 1), date(2021, 3, 31)) for hoja in hojas])
+        almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())
+
+        # Consultas sobre los DataFrames
+        fechas = [date(2020, 1, 6) + timedelta(days=d) for d in range(0, 2000, 2)]
+        self.medir("existe_entrenamiento_en_fecha", lambda: [
+            existe_entrenamiento_en_fecha(df, fecha) for df in self.dfs.values() for fecha in fechas
+        ])
+        generos = {a["nombre"]: a["genero"] for a in self.atletas}
+        self.medir("puntuacion_por_categoria", lambda: [
+            calcular_puntuacion_grupo(self.dfs[nombre], categoria, genero)
+            for nombre, genero in generos.items() for categoria in CATEGORIAS
+        ])
+        self.medir("puntuacion_en_bloque", lambda: calcular_puntuaciones_atletas(self.dfs, generos))
+        self.medir("formato_largo_conversion", lambda: dfs_a_largo(self.dfs))
+        _, series = dfs_a_largo(self.dfs)
+        self.medir("puntuacion_formato_largo", lambda: puntuaciones_largo(series, generos))
+        puntuaciones = calcular_puntuaciones_atletas(self.dfs, generos)
+        self.medir(
+            "generar_radar_chart", lambda: [generar_radar_chart(p) for p in puntuaciones.values()],
+            preparar=stats_analysis._figuras.clear
+        )
+        self.medir("generar_radar_chart_cache", lambda: [generar_radar_chart(p) for p in puntuaciones.values()])
+        self.medir("generar_radar_combinado", lambda: generar_radar_combinado(puntuaciones),
+                   preparar=stats_analysis._figuras.clear)
+        self.medir("historial_puntuaciones", lambda: [
+            obtener_historial(a["hoja"], self.dfs[a["nombre"]], a["genero"]) for a in self.atletas
+        ])
+        self.medir("detectar_records", lambda: [detectar_records(df) for df in self.dfs.values()])
+        self.medir("resumen_progresion", lambda: [
+            resumen_progresion(a["hoja"], self.dfs[a["nombre"]], a["genero"]) for a in self.atletas
+        ])
+
+        # Escritura: una sesión nueva por atleta y vaciado del diario
+        dias = iter(range(10_000))
+
+        def escribir():
+            fecha = (date(2040, 1, 1) + timedelta(days=next(dias))).strftime("%d-%m-%Y")
+            for atleta in self.atletas:
+                registro = {"Fecha": fecha, "Tiempo entrenado": "1:00:00", "Sensación": "buena", "press banca": 60}
+                self.dfs[atleta["nombre"]] = guardar_entrenamiento(self.dfs[atleta["nombre"]], registro, atleta["hoja"])
+
+        self.medir("guardar_entrenamiento", escribir)
+        self.medir("vaciar_diario", vaciar_diario, preparar=escribir)
+
+        # Escritura optimista desde la app: se aplica a la instantánea y la puntuación
+        # se actualiza con la fila nueva, sin recargar las hojas
+        def registrar():
+            fecha = (date(2040, 1, 1) + timedelta(days=next(dias))).strftime("%d-%m-%Y")
+            for atleta in self.atletas:
+                registro = {"Fecha": fecha, "Tiempo entrenado": "1:00:00", "Sensación": "buena", "press banca": 60}
+                servicio_datos.registrar_sesion(atleta, registro)
+            calcular_puntuaciones_atletas(
+                servicio_datos.dataframes(self.atletas), generos, servicio_datos.ultimos(self.atletas)
+            )
+
+        servicio_datos.ultimos(self.atletas)
+        self.medir("registro_optimista", registrar)
+
+        # Foto de Drive: sin caché y con caché caliente
+        cache = CacheImagenes(directorio="cache-benchmark")
+        def ultima_imagen():
+            return descargar_imagen_drive(buscar_ultima_imagen_drive(CARPETA_FOTOS), cache=cache)
+
+        self.medir(
+            "imagen_drive_fria", ultima_imagen,
+            preparar=lambda: (shutil.rmtree("cache-benchmark", ignore_errors=True), cache.vaciar_memoria())
+        )
+        self.medir("imagen_drive_cache", ultima_imagen)
+
+        # Fotos de progreso: la última (cabecera), un lote de la galería, la carpeta
+        # entera (variantes WebP) y comprobación sin fotos nuevas
+        def sin_fotos():
+            shutil.rmtree(fotos.DIRECTORIO_FOTOS, ignore_errors=True)
+            shutil.rmtree(cache_imagenes.DIRECTORIO_CACHE_IMAGENES, ignore_errors=True)
+            cache_imagenes.obtener_cache().vaciar_memoria()
+            fotos.reiniciar_indice()
+
+        self.medir("fotos_ultima", lambda: fotos.ingerir_ultima_drive(CARPETA_FOTOS), preparar=sin_fotos)
+        self.medir("fotos_ingesta_lote", lambda: fotos.ingerir_carpeta_drive(CARPETA_FOTOS, forzar=True),
+                   preparar=sin_fotos)
+        self.medir("fotos_ingesta_completa", lambda: fotos.ingerir_carpeta_drive(CARPETA_FOTOS, forzar=True, lote=None),
+                   preparar=sin_fotos, repeticiones=1)
+        self.medir("fotos_ingesta_sin_cambios", lambda: fotos.ingerir_carpeta_drive(CARPETA_FOTOS, forzar=True))
+        self.medir("fotos_pagina_galeria", lambda: fotos.fotos([CARPETA_FOTOS])[:12])
+        return self.resultados
+
+
+def comparar(base, actual, tolerancia):
+    """Devuelve las etapas cuyo mejor tiempo empeora más de `tolerancia` (fracción)."""
+    anteriores = {r["etapa"]: r for r in base["etapas"]}
+    regresiones = []
+    for resultado in actual["etapas"]:
+        anterior = anteriores.get(resultado["etapa"])
+        if anterior and resultado["mejor_s"] > anterior["mejor_s"] * (1 + tolerancia):
+            regresiones.append({
+                "etapa": resultado["etapa"],
+                "antes_s": anterior["mejor_s"],
+                "ahora_s": resultado["mejor_s"],
+                "factor": resultado["mejor_s"] / anterior["mejor_s"],
+            })
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--atletas", type=int, default=2)
+    parser.add_argument("--anios", type=float, default=3)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos por llamada a Google")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, la salida estándar)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento admitido (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    directorio_original = os.getcwd()
+    directorio_trabajo = tempfile.mkdtemp(prefix="bench-cambio-fisico-")
+    os.chdir(directorio_trabajo)  # Instantáneas, diario y cachés van a un directorio temporal
+    try:
+        suite = Suite(args.atletas, args.anios, args.latencia, args.repeticiones)
+        etapas = suite.ejecutar()
+    finally:
+        os.chdir(directorio_original)
+        shutil.rmtree(directorio_trabajo, ignore_errors=True)
+
+    resultado = {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "commit": _commit_actual(),
+            "python": platform.python_version(),
+            "atletas": args.atletas,
+            "anios": args.anios,
+            "sesiones": suite.sesiones,
+            "latencia_s": args.latencia,
+        },
+        "etapas": etapas,
+    }
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            regresiones = comparar(json.load(f), resultado, args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion['etapa']}: {regresion['antes_s'] * 1000:.2f} ms -> "
+                  f"{regresion['ahora_s'] * 1000:.2f} ms (x{regresion['factor']:.2f})", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
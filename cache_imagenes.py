@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Configuración de la caché de imágenes
+DIRECTORIO_CACHE_IMAGENES = ".cache_imagenes"
+MAX_BYTES_DISCO = 200 * 1024 * 1024  # Tamaño máximo de la caché en disco
+MAX_BYTES_MEMORIA = 32 * 1024 * 1024  # Tamaño máximo de la caché en memoria
+
+
+class CacheImagenes:
+    """
+    Caché de imágenes direccionada por contenido, en memoria y en disco.
+
+    La clave combina el ID del archivo de Drive y su md5, así que una imagen
+    modificada nunca se confunde con la versión anterior. Las dos capas
+    expulsan primero lo usado hace más tiempo (LRU) al superar su tamaño.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_CACHE_IMAGENES, max_bytes_disco=MAX_BYTES_DISCO,
+                 max_bytes_memoria=MAX_BYTES_MEMORIA):
+        self.directorio = directorio
+        self.max_bytes_disco = max_bytes_disco
+        self.max_bytes_memoria = max_bytes_memoria
+        self._memoria = OrderedDict()
+        self._bytes_memoria = 0
+        self._candado = threading.Lock()
+
+    @staticmethod
+    def clave(archivo_id, md5):
+        """Clave de caché para una versión concreta de un archivo."""
+        return f"{archivo_id}-{md5}"
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def _guardar_en_memoria(self, clave, datos):
+        if len(datos) > self.max_bytes_memoria:
+            return
+        if clave in self._memoria:
+            self._memoria.move_to_end(clave)
+            return
+        self._memoria[clave] = datos
+        self._bytes_memoria += len(datos)
+        while self._bytes_memoria > self.max_bytes_memoria:
+            _, expulsado = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(expulsado)
+
+    def obtener(self, clave):
+        """Devuelve los bytes cacheados para `clave`, o None si no están."""
+        with self._candado:
+            datos = self._memoria.get(clave)
+            if datos is not None:
+                self._memoria.move_to_end(clave)
+                return datos
+
+            ruta = self._ruta(clave)
+            try:
+                with open(ruta, "rb") as f:
+                    datos = f.read()
+                os.utime(ruta)  # La fecha de modificación marca el último uso
+            except OSError:
+                return None
+            self._guardar_en_memoria(clave, datos)
+            return datos
+
+    def guardar(self, clave, datos):
+        """Guarda `datos` en ambas capas y expulsa lo más antiguo si no cabe."""
+        with self._candado:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = self._ruta(clave)
+            temporal = ruta + ".tmp"
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+            self._guardar_en_memoria(clave, datos)
+            self._expulsar_disco()
+
+    def vaciar_memoria(self):
+        """Descarta la capa en memoria (la de disco se conserva)."""
+        with self._candado:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+
+    def _expulsar_disco(self):
+        """Borra los archivos usados hace más tiempo hasta quedar bajo el límite."""
+        archivos = []
+        total = 0
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+        archivos.sort()
+        for _, tamano, ruta in archivos:
+            if total <= self.max_bytes_disco:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except OSError:
+                pass
+
+
+_cache = CacheImagenes()
+
+
+def obtener_cache():
+    """Devuelve la caché de imágenes compartida por el proceso."""
+    return _cache
@@ -1,11 +1,10 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
-import os
-
-# Configuración de Google Sheets
-CREDENCIALES_JSON = "sheets-key.json"  # Ruta al archivo JSON de credenciales
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+from google_clients import invalidar_hoja
+from almacenamiento import obtener_almacenamiento
+from sincronizacion import sincronizar_hoja, instantanea_local
+from atletas import obtener_atletas, atleta_por_hoja
+from esquema import tipar_dataframe, existe_fecha, anadir_registro
+from instrumentacion import tramo
 
 # Columnas base para los DataFrames
 COLUMNAS_EJERCICIOS = [
@@ -20,93 +19,142 @@ COLUMNAS_EJERCICIOS = [
 ]
 COLUMNAS = ["Fecha", "Tiempo entrenado", "Sensación"] + COLUMNAS_EJERCICIOS
 
-def conectar_google_sheets(nombre_hoja):
+MAX_HILOS_CARGA = 8  # Hojas que se descargan a la vez como máximo
+
+def validar_tiempo(tiempo):
+    """Comprueba que el tiempo entrenado tenga el formato H:MM:SS (menos de 24 horas)."""
+    try:
+        horas, minutos, segundos = map(int, tiempo.split(":"))
+        if 0 <= horas < 24 and 0 <= minutos < 60 and 0 <= segundos < 60:
+            return True
+        return False
+    except (ValueError, TypeError):
+        return False
+
+def cargar_hoja(nombre_hoja, respaldo=True):
     """
-    Conecta a Google Sheets y devuelve un DataFrame.
+    Carga una hoja de forma incremental a partir de su instantánea local.
+    
+    Si Google Sheets no responde, devuelve la última instantánea guardada.
     
     Args:
         nombre_hoja (str): Nombre de la hoja de Google Sheets.
+        respaldo (bool): Si es False, el error de Google se relanza en lugar
+            de devolver la instantánea.
     
     Returns:
         pd.DataFrame: DataFrame con los datos de la hoja.
     """
     try:
-        # Autenticación
-        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENCIALES_JSON, SCOPE)
-        client = gspread.authorize(creds)
-        
-        # Abrir la hoja de cálculo
-        hoja = client.open(nombre_hoja).sheet1
-        
-        # Convertir a DataFrame
-        datos = hoja.get_all_records()
-        df = pd.DataFrame(datos)
-        
-        return df
+        return sincronizar_hoja(nombre_hoja)
     except Exception as e:
-        print(f"Error al conectar con Google Sheets: {e}")
-        return pd.DataFrame()
+        print(f"Error al sincronizar con Google Sheets: {e}")
+        invalidar_hoja(nombre_hoja)
+        if not respaldo:
+            raise
+        df = instantanea_local(nombre_hoja)
+        return df if df is not None else pd.DataFrame()
 
-def inicializar_dataframes():
+def _preparar_dataframe(df):
     """
-    Inicializa los DataFrames para Animalaco y Mamasota desde Google Sheets.
-    Si las hojas están vacías, crea DataFrames con las columnas base.
+    Asegura que el DataFrame tenga las columnas base, aunque la hoja esté vacía,
+    y lo convierte al esquema tipado (fechas, float32, categorías) indexado por fecha.
     """
-    # Crear DataFrames base con las columnas definidas
-    df_base = pd.DataFrame(columns=COLUMNAS)
-    df_base["Fecha"] = pd.to_datetime(df_base["Fecha"])  # Asegurar tipo datetime
+    if df.empty:
+        df = pd.DataFrame(columns=COLUMNAS)
+        df["Fecha"] = pd.to_datetime(df["Fecha"])  # Asegurar tipo datetime
+    with tramo("pandas.preparar_dataframe", filas=len(df)):
+        df = df.reindex(columns=COLUMNAS, fill_value=None)
+        return tipar_dataframe(df, COLUMNAS_EJERCICIOS)
 
-    # Cargar datos desde Google Sheets
-    df_animalaco = conectar_google_sheets("data_animalaco")
-    df_mamasota = conectar_google_sheets("data_mamasota")
-    
-    # Si las hojas están vacías, usar el DataFrame base
-    if df_animalaco.empty:
-        df_animalaco = df_base.copy()
-    if df_mamasota.empty:
-        df_mamasota = df_base.copy()
+def inicializar_dataframes(atletas=None):
+    """
+    Inicializa los DataFrames de todos los atletas del registro desde el motor
+    de almacenamiento (la base SQLite local o Google Sheets, ver `almacenamiento`).
+    Con Google Sheets las hojas se descargan a la vez en un grupo acotado de
+    hilos. Si una hoja está vacía, se usa un DataFrame con las columnas base.
     
-    # Asegurar que los DataFrames tengan las columnas correctas
-    df_animalaco = df_animalaco.reindex(columns=COLUMNAS, fill_value=None)
-    df_mamasota = df_mamasota.reindex(columns=COLUMNAS, fill_value=None)
+    Args:
+        atletas (list, optional): Atletas a cargar. Por defecto, todo el registro.
     
-    return df_animalaco, df_mamasota
+    Returns:
+        dict: DataFrame de cada atleta, por nombre, en el orden del registro.
+    """
+    if atletas is None:
+        atletas = obtener_atletas()
+    if not atletas:
+        return {}
+
+    with tramo("inicializar_dataframes", atletas=len(atletas)):
+        dfs = obtener_almacenamiento().cargar([atleta["hoja"] for atleta in atletas])
+
+    return {atleta["nombre"]: df for atleta, df in zip(atletas, dfs)}
 
-def existe_entrenamiento_en_fecha(df, fecha):
+def existe_entrenamiento_en_fecha(df, fecha, nombre_hoja=None):
     """
     Verifica si ya existe un entrenamiento registrado en la fecha dada.
+    
+    Sin DataFrame (df=None) se pregunta directamente al almacenamiento por la
+    hoja `nombre_hoja`.
     """
+    if df is None:
+        return obtener_almacenamiento().existe_sesion(nombre_hoja, fecha)
     if df.empty:
         return False
+    # DataFrames tipados: búsqueda en el índice de fechas, sin recorrer la tabla
+    if isinstance(df.index, pd.DatetimeIndex):
+        return existe_fecha(df, fecha)
     # Convertir a string para comparación exacta
     fecha_str = fecha.strftime("%d-%m-%Y")
     return fecha_str in df["Fecha"].astype(str).values
 
+def consultar_rango(nombre_hoja, inicio, fin):
+    """Devuelve las sesiones de una hoja entre dos fechas (ambas incluidas)."""
+    return obtener_almacenamiento().rango(nombre_hoja, inicio, fin)
+
+def ultimos_valores_ejercicios(nombre_hoja):
+    """Devuelve el último valor registrado de cada ejercicio de una hoja."""
+    return obtener_almacenamiento().ultimos_valores(nombre_hoja)
+
+def importar_entrenamientos(registros, nombre_hoja):
+    """
+    Guarda de una vez muchos registros ya validados (importaciones históricas).
+
+    Returns:
+        int: Número de registros nuevos.
+    """
+    return obtener_almacenamiento().importar_registros(nombre_hoja, registros)
+
 def guardar_entrenamiento(df, registro, nombre_hoja):
     """
-    Guarda un nuevo registro en el DataFrame correspondiente y lo guarda en Google Sheets.
+    Guarda un nuevo registro en el almacenamiento y en el DataFrame correspondiente.
+    Lo que va a Google Sheets se anota en el diario local y se sube en segundo plano.
     """
     try:
-        # Autenticación
-        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENCIALES_JSON, SCOPE)
-        client = gspread.authorize(creds)
-        
-        # Abrir la hoja de cálculo
-        hoja = client.open(nombre_hoja).sheet1
-        
-        # Si la hoja está vacía, escribir las columnas primero
-        if hoja.get_all_records() == []:
-            hoja.append_row(COLUMNAS)  # Escribir las columnas
+        # Guardar el registro (durable) sin esperar a Google Sheets
+        if not obtener_almacenamiento().guardar_sesion(nombre_hoja, registro):
+            print(f"Ya hay un registro para {nombre_hoja} el {registro['Fecha']}")
+            return df
         
-        # Convertir el registro a lista (en el orden de COLUMNAS)
-        nuevo_registro = [registro.get(col, "") for col in COLUMNAS]
+        # Añadir la sesión al historial de puntuaciones (sin recalcular las anteriores)
+        try:
+            from historial_puntuaciones import registrar_sesion
+            registrar_sesion(nombre_hoja, atleta_por_hoja(nombre_hoja)["genero"], registro)
+        except Exception as e:
+            print(f"Error al actualizar el historial de puntuaciones: {e}")
         
-        # Añadir el registro a la hoja
-        hoja.append_row(nuevo_registro)
+        # Comparar la sesión con el índice de récords (solo sus ejercicios)
+        try:
+            from progresion import registrar_sesion as registrar_records
+            registrar_records(nombre_hoja, registro)
+        except Exception as e:
+            print(f"Error al actualizar el índice de récords: {e}")
         
         # Actualizar el DataFrame local
+        if isinstance(df.index, pd.DatetimeIndex):
+            return anadir_registro(df, registro, COLUMNAS_EJERCICIOS)
         df = pd.concat([df, pd.DataFrame([registro])], ignore_index=True)
         return df
     except Exception as e:
-        print(f"Error al guardar en Google Sheets: {e}")
+        print(f"Error al guardar el entrenamiento: {e}")
         return df
\ No newline at end of file
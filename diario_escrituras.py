@@ -0,0 +1,303 @@
+import json
+import threading
+import time
+from base_local import conectar
+from google_clients import obtener_hoja, invalidar_hoja
+from instrumentacion import tramo, tamano_valores
+from planificador_google import ejecutar, codigo_http
+
+# Configuración del diario local de escrituras
+INTERVALO_REINTENTO = 30  # Segundos entre reintentos cuando Google Sheets falla
+TAMANO_LOTE = 500  # Filas máximas por llamada a append_rows
+MAX_INTENTOS_RECHAZO = 3  # Veces que Google rechaza los datos de una fila (HTTP 400) antes de descartarla
+
+_candado = threading.Lock()
+_candado_vaciado = threading.Lock()  # Un solo vaciado a la vez para no duplicar filas
+_evento = threading.Event()
+_hilo = None
+_vaciado_automatico = True  # Ver establecer_vaciado_automatico()
+
+# Tabla del diario en la base local compartida (ver `base_local`)
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS escrituras (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hoja TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    fila TEXT NOT NULL,
+    creado REAL NOT NULL,
+    enviado REAL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    ultimo_error TEXT,
+    rechazos INTEGER NOT NULL DEFAULT 0,
+    descartado REAL,
+    UNIQUE (hoja, fecha)
+);
+"""
+
+
+def _conectar():
+    """Abre una conexión al diario, creando la tabla si no existe."""
+    conexion = conectar(_ESQUEMA)
+    conexion.execute("PRAGMA synchronous=FULL")  # Cada commit llega al disco antes de responder
+    conexion.execute("CREATE INDEX IF NOT EXISTS escrituras_pendientes ON escrituras (enviado, hoja, id)")
+    return conexion
+
+
+# Una fecha descartada se puede volver a registrar: la fila se reutiliza como nueva
+_INSERTAR = (
+    "INSERT INTO escrituras (hoja, fecha, fila, creado) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (hoja, fecha) DO UPDATE SET fila = excluded.fila, creado = excluded.creado, "
+    "enviado = NULL, intentos = 0, ultimo_error = NULL, rechazos = 0, descartado = NULL "
+    "WHERE escrituras.descartado IS NOT NULL"
+)
+_PENDIENTES = "enviado IS NULL AND descartado IS NULL"
+
+
+def registrar_escritura(nombre_hoja, registro, columnas):
+    """
+    Anota un registro en el diario y despierta al vaciador en segundo plano.
+
+    La clave de idempotencia es (hoja, Fecha): un segundo registro para la
+    misma hoja y fecha se descarta, salvo que el primero lo rechazara Google.
+
+    Args:
+        nombre_hoja (str): Nombre de la hoja de Google Sheets de destino.
+        registro (dict): Datos del entrenamiento, con la clave "Fecha".
+        columnas (list): Orden de las columnas en la hoja.
+
+    Returns:
+        bool: True si el registro es nuevo, False si ya estaba en el diario.
+    """
+    fila = [registro.get(col, "") for col in columnas]
+    with _conectar() as conexion:
+        cursor = conexion.execute(
+            _INSERTAR, (nombre_hoja, str(registro["Fecha"]), json.dumps(fila), time.time())
+        )
+        nuevo = cursor.rowcount == 1
+    conexion.close()
+
+    if nuevo and _vaciado_automatico:
+        iniciar_vaciador()
+        _evento.set()
+    return nuevo
+
+
+def registrar_escrituras(nombre_hoja, registros, columnas):
+    """
+    Anota varios registros en el diario en una sola transacción (importaciones).
+
+    Como en `registrar_escritura`, los registros con una fecha que ya está en
+    el diario para esa hoja se descartan.
+
+    Returns:
+        int: Número de registros nuevos.
+    """
+    ahora = time.time()
+    filas = [
+        (nombre_hoja, str(registro["Fecha"]), json.dumps([registro.get(col, "") for col in columnas]), ahora)
+        for registro in registros
+    ]
+    with _conectar() as conexion:
+        antes = conexion.total_changes
+        conexion.executemany(_INSERTAR, filas)
+        nuevos = conexion.total_changes - antes
+    conexion.close()
+
+    if nuevos and _vaciado_automatico:
+        iniciar_vaciador()
+        _evento.set()
+    return nuevos
+
+
+def profundidad_cola(nombre_hoja=None):
+    """Devuelve cuántas filas del diario siguen pendientes de subir a Google Sheets."""
+    conexion = _conectar()
+    try:
+        if nombre_hoja is None:
+            fila = conexion.execute(f"SELECT COUNT(*) FROM escrituras WHERE {_PENDIENTES}").fetchone()
+        else:
+            fila = conexion.execute(
+                f"SELECT COUNT(*) FROM escrituras WHERE {_PENDIENTES} AND hoja = ?", (nombre_hoja,)
+            ).fetchone()
+        return fila[0]
+    finally:
+        conexion.close()
+
+
+def estado_escritura(nombre_hoja, fecha):
+    """
+    Estado en el diario del registro de una hoja y fecha.
+
+    Returns:
+        dict: "estado" ("pendiente", "enviada" o "descartada", si Google
+        rechazó sus datos MAX_INTENTOS_RECHAZO veces) y "error" del último
+        intento, o None si el registro no pasó por el diario.
+    """
+    conexion = _conectar()
+    try:
+        fila = conexion.execute(
+            "SELECT enviado, descartado, ultimo_error FROM escrituras WHERE hoja = ? AND fecha = ?",
+            (nombre_hoja, str(fecha))
+        ).fetchone()
+    finally:
+        conexion.close()
+    if fila is None:
+        return None
+    enviado, descartado, error = fila
+    estado = "enviada" if enviado is not None else "descartada" if descartado is not None else "pendiente"
+    return {"estado": estado, "error": error}
+
+
+def _vaciar_hoja(conexion, nombre_hoja, pendientes, columnas):
+    """Sube en lotes las filas pendientes de una hoja, marcando cada lote como enviado al escribirlo."""
+    hoja = obtener_hoja(nombre_hoja)
+
+    # Una sola lectura de la primera columna sirve para saber si falta la
+    # cabecera y qué fechas llegaron ya (por si un vaciado anterior se cortó
+    # tras escribir en la hoja pero antes de marcarlas en el diario).
+    with tramo("sheets.col_values", hoja=nombre_hoja):
+        fechas_remotas = ejecutar(
+            "sheets.lectura", "col_values", lambda: hoja.col_values(1), clave=nombre_hoja,
+            tamano=lambda fechas: sum(map(len, fechas))
+        )
+    fechas_remotas = set(fechas_remotas)
+    _marcar_enviadas(conexion, [id_ for id_, fecha, _ in pendientes if fecha in fechas_remotas])
+    por_subir = [(id_, json.loads(fila)) for id_, fecha, fila in pendientes if fecha not in fechas_remotas]
+
+    if not fechas_remotas and por_subir:
+        _anadir_filas(hoja, nombre_hoja, [list(columnas)])  # Escribir las columnas primero
+
+    for inicio in range(0, len(por_subir), TAMANO_LOTE):
+        _subir_lote(conexion, hoja, nombre_hoja, por_subir[inicio:inicio + TAMANO_LOTE])
+
+
+def _anadir_filas(hoja, nombre_hoja, filas):
+    # Sin reintentos aquí: si falla, el próximo vaciado lo reintenta sin duplicar filas
+    with tramo("sheets.append_rows", hoja=nombre_hoja, filas=len(filas)):
+        ejecutar(
+            "sheets.escritura", "append_rows", lambda: hoja.append_rows(filas), reintentar=False,
+            tamano=lambda _: tamano_valores(filas)
+        )
+
+
+def _subir_lote(conexion, hoja, nombre_hoja, lote):
+    """
+    Sube un lote de (id, fila) y lo marca como enviado.
+
+    Si Google rechaza los datos (HTTP 400), el lote se parte por la mitad hasta
+    dar con las filas culpables, que se anotan como rechazadas; las demás se
+    suben. Cualquier otro error (red, cuota, permisos, hoja inexistente) se
+    relanza y el lote entero se reintenta en el próximo vaciado.
+    """
+    try:
+        _anadir_filas(hoja, nombre_hoja, [fila for _, fila in lote])
+    except Exception as e:
+        if codigo_http(e) != 400:
+            raise
+        if len(lote) == 1:
+            _rechazar(conexion, lote[0][0], e)
+            return
+        mitad = len(lote) // 2
+        _subir_lote(conexion, hoja, nombre_hoja, lote[:mitad])
+        _subir_lote(conexion, hoja, nombre_hoja, lote[mitad:])
+        return
+    _marcar_enviadas(conexion, [id_ for id_, _ in lote])
+
+
+def _marcar_enviadas(conexion, ids):
+    with conexion:
+        conexion.executemany(
+            "UPDATE escrituras SET enviado = ?, ultimo_error = NULL WHERE id = ?",
+            [(time.time(), id_) for id_ in ids]
+        )
+
+
+def _rechazar(conexion, id_, error):
+    """Anota que Google rechazó los datos de una fila; a los MAX_INTENTOS_RECHAZO rechazos se descarta."""
+    print(f"Google Sheets rechazó una fila del diario: {error}")
+    with conexion:
+        conexion.execute(
+            "UPDATE escrituras SET intentos = intentos + 1, rechazos = rechazos + 1, ultimo_error = ?, "
+            "descartado = CASE WHEN rechazos + 1 >= ? THEN ? END WHERE id = ?",
+            (str(error) or type(error).__name__, MAX_INTENTOS_RECHAZO, time.time(), id_)
+        )
+
+
+def vaciar_diario(columnas=None):
+    """
+    Sube a Google Sheets todas las filas pendientes del diario.
+
+    Returns:
+        int: Número de filas que siguen pendientes tras el intento.
+    """
+    if columnas is None:
+        from data_management import COLUMNAS
+        columnas = COLUMNAS
+
+    with _candado_vaciado:
+        return _vaciar_diario(columnas)
+
+
+def _vaciar_diario(columnas):
+    """Recorre las filas pendientes agrupadas por hoja y las sube una hoja cada vez."""
+    conexion = _conectar()
+    try:
+        pendientes = {}
+        for id_, hoja, fecha, fila in conexion.execute(
+            f"SELECT id, hoja, fecha, fila FROM escrituras WHERE {_PENDIENTES} ORDER BY id"
+        ):
+            pendientes.setdefault(hoja, []).append((id_, fecha, fila))
+
+        for nombre_hoja, filas in pendientes.items():
+            try:
+                _vaciar_hoja(conexion, nombre_hoja, filas, columnas)
+            except Exception as e:
+                print(f"Error al vaciar el diario en Google Sheets ({nombre_hoja}): {e}")
+                invalidar_hoja(nombre_hoja)
+                # Estas filas se reintentan siempre (nunca se descartan); las de los
+                # lotes que ya se escribieron están marcadas como enviadas
+                with conexion:
+                    conexion.executemany(
+                        "UPDATE escrituras SET intentos = intentos + 1, ultimo_error = ? "
+                        "WHERE id = ? AND enviado IS NULL AND descartado IS NULL",
+                        [(str(e) or type(e).__name__, id_) for id_, _, _ in filas]
+                    )
+        return conexion.execute(f"SELECT COUNT(*) FROM escrituras WHERE {_PENDIENTES}").fetchone()[0]
+    finally:
+        conexion.close()
+
+
+def _bucle_vaciador():
+    """Vacía el diario cada vez que hay escrituras nuevas y reintenta si quedan pendientes."""
+    while True:
+        _evento.wait(INTERVALO_REINTENTO)
+        _evento.clear()
+        try:
+            vaciar_diario()
+        except Exception as e:
+            print(f"Error en el vaciador del diario: {e}")
+
+
+def establecer_vaciado_automatico(activo):
+    """
+    Activa o desactiva el vaciado en segundo plano tras cada registro.
+    Desactivado, el diario solo se vacía llamando a `vaciar_diario()`
+    (importaciones masivas, benchmarks).
+
+    Returns:
+        bool: El valor anterior, para restaurarlo después.
+    """
+    global _vaciado_automatico
+    with _candado:
+        anterior, _vaciado_automatico = _vaciado_automatico, bool(activo)
+    return anterior
+
+
+def iniciar_vaciador():
+    """Arranca (una sola vez por proceso) el hilo que vacía el diario en segundo plano."""
+    global _hilo
+    with _candado:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle_vaciador, name="vaciador-diario", daemon=True)
+            _hilo.start()
+            _evento.set()  # Subir lo que quedara pendiente de ejecuciones anteriores
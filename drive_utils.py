@@ -1,77 +1,112 @@
-import os
-import io
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from PIL import Image
-import streamlit as st
+from google_clients import obtener_servicio_drive
+from cache_imagenes import obtener_cache
+from instrumentacion import tramo
+from planificador_google import ejecutar
 
 # Configuración de Google Drive
-CREDENCIALES_JSON = "drive-key.json"  # Ruta al archivo JSON de credenciales
-SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
 CARPETA_DRIVE_ID = "14CXQsA8LrNjTcKDpowvcUgwJCW82fTMG"  # Reemplaza con el ID de tu carpeta en Drive
 
 def conectar_google_drive():
-    """Conecta a Google Drive y devuelve el servicio."""
-    creds = service_account.Credentials.from_service_account_file(CREDENCIALES_JSON, scopes=SCOPES)
-    servicio = build("drive", "v3", credentials=creds)
-    return servicio
+    """Devuelve el servicio de Google Drive compartido (autenticado una sola vez)."""
+    return obtener_servicio_drive()
 
-def obtener_ultima_imagen_drive():
+def buscar_ultima_imagen_drive(carpeta_id=CARPETA_DRIVE_ID, servicio=None):
     """
-    Obtiene la última imagen de la carpeta en Google Drive.
+    Pide a Drive solo el archivo más reciente de la carpeta.
+    
+    El orden lo resuelve el servidor (orderBy + pageSize=1), así que el coste
+    no depende de cuántas fotos haya en la carpeta.
     
     Returns:
-        str: Ruta temporal de la imagen descargada.
+        dict: Metadatos (id, name, createdTime, modifiedTime, md5Checksum) o None si no hay imágenes.
     """
-    try:
-        # Conectar a Google Drive
+    if servicio is None:
         servicio = conectar_google_drive()
-        
-        # Listar archivos en la carpeta
-        resultados = servicio.files().list(
-            q=f"'{CARPETA_DRIVE_ID}' in parents",
-            fields="files(id, name, createdTime)"
-        ).execute()
-        
-        archivos = resultados.get("files", [])
-        
-        if not archivos:
-            return None
-        
-        # Ordenar archivos por fecha de creación (el más reciente primero)
-        archivos.sort(key=lambda x: x["createdTime"], reverse=True)
-        
-        # Obtener el ID del archivo más reciente
-        ultimo_archivo = archivos[0]
-        archivo_id = ultimo_archivo["id"]
-        archivo_nombre = ultimo_archivo["name"]
-        
-        # Descargar la imagen
-        request = servicio.files().get_media(fileId=archivo_id)
-        fh = io.BytesIO()
-        descargador = MediaIoBaseDownload(fh, request)
-        
-        done = False
-        while not done:
-            status, done = descargador.next_chunk()
-        
-        # Guardar la imagen temporalmente
-        ruta_temporal = f"temp_{archivo_nombre}"
-        with open(ruta_temporal, "wb") as f:
-            f.write(fh.getvalue())
-        
-        return ruta_temporal
-    except Exception as e:
-        print(f"Error al obtener la imagen desde Google Drive: {e}")
-        return None
+    
+    consulta = f"'{carpeta_id}' in parents and mimeType contains 'image/' and trashed = false"
+    peticion = servicio.files().list(
+        q=consulta, orderBy="createdTime desc", pageSize=1,
+        fields="files(id, name, createdTime, modifiedTime, md5Checksum)"
+    )
+    with tramo("drive.ultima_imagen", carpeta=carpeta_id):
+        respuesta = ejecutar("drive", "files.list", peticion.execute, clave=(consulta, "ultima"))
+    archivos = respuesta.get("files", [])
+    return archivos[0] if archivos else None
+
+def iterar_imagenes_drive(carpeta_id=CARPETA_DRIVE_ID, servicio=None, desde=None, tamano_pagina=1000):
+    """
+    Recorre las imágenes de una carpeta de Drive, de la más antigua a la más reciente.
+    
+    Cada página se pide a Drive solo cuando se llega a ella, así que quien deja
+    de recorrer a medias no paga las páginas que no usa.
+    
+    Args:
+        carpeta_id (str): ID de la carpeta de Drive.
+        servicio: Servicio de Drive a usar (por defecto, el compartido).
+        desde (str, optional): Solo las creadas en ese instante (RFC 3339) o
+            después. Las del instante exacto se vuelven a listar, así que quien
+            llama debe descartar las que ya conoce (por ID y md5).
+        tamano_pagina (int): Archivos por llamada a Drive.
+    
+    Yields:
+        dict: Metadatos (id, name, createdTime, modifiedTime, md5Checksum) de cada imagen.
+    """
+    if servicio is None:
+        servicio = conectar_google_drive()
+    
+    consulta = f"'{carpeta_id}' in parents and mimeType contains 'image/' and trashed = false"
+    if desde:
+        consulta += f" and createdTime >= '{desde}'"
+    pagina = None
+    while True:
+        peticion = servicio.files().list(
+            q=consulta, orderBy="createdTime", pageSize=tamano_pagina, pageToken=pagina,
+            fields="nextPageToken, files(id, name, createdTime, modifiedTime, md5Checksum)"
+        )
+        with tramo("drive.files_list", carpeta=carpeta_id):
+            respuesta = ejecutar("drive", "files.list", peticion.execute, clave=(consulta, tamano_pagina, pagina))
+        yield from respuesta.get("files", [])
+        pagina = respuesta.get("nextPageToken")
+        if not pagina:
+            return
+
+def listar_imagenes_drive(carpeta_id=CARPETA_DRIVE_ID, servicio=None, desde=None):
+    """
+    Lista todas las imágenes de una carpeta de Drive, de la más antigua a la más
+    reciente (ver `iterar_imagenes_drive`).
+    
+    Returns:
+        list: Metadatos (id, name, createdTime, modifiedTime, md5Checksum) de cada imagen.
+    """
+    return list(iterar_imagenes_drive(carpeta_id, servicio, desde))
+
+def version_archivo(archivo):
+    """Versión de un archivo de Drive: su md5 (o la fecha de modificación si no lo tiene)."""
+    return archivo.get("md5Checksum") or archivo.get("modifiedTime", "")
 
-def mostrar_imagen_desde_drive():
-    """Muestra la última imagen de la carpeta en Google Drive."""
-    ruta_imagen = obtener_ultima_imagen_drive()
+def descargar_imagen_drive(archivo, servicio=None, cache=None):
+    """
+    Descarga una imagen de Drive, salvo que esta versión (ID + md5) ya esté en
+    la caché local; en ese caso se sirve desde memoria o disco.
+    
+    Args:
+        archivo (dict): Metadatos de `listar_imagenes_drive`.
+        servicio: Servicio de Drive a usar (por defecto, el compartido).
+        cache (CacheImagenes): Caché a usar (por defecto, la compartida).
+    
+    Returns:
+        bytes: Contenido de la imagen.
+    """
+    if servicio is None:
+        servicio = conectar_google_drive()
+    if cache is None:
+        cache = obtener_cache()
     
-    if ruta_imagen:
-        st.image(ruta_imagen, caption="Última imagen registrada", use_column_width=True)
-        os.remove(ruta_imagen)  # Eliminar la imagen temporal después de mostrarla
-    else:
-        st.warning("No se encontraron imágenes en la carpeta de Google Drive.")
\ No newline at end of file
+    clave = cache.clave(archivo["id"], version_archivo(archivo))
+    datos = cache.obtener(clave)
+    if datos is None:
+        peticion = servicio.files().get_media(fileId=archivo["id"])
+        with tramo("drive.descarga", archivo=archivo["id"]):
+            datos = ejecutar("drive", "files.get_media", peticion.execute, clave=clave, tamano=len)
+        cache.guardar(clave, datos)
+    return datos
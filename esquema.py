@@ -0,0 +1,91 @@
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype
+
+# =============================================================================
+# ESQUEMA TIPADO DE LOS DATAFRAMES DE ENTRENAMIENTO
+# =============================================================================
+# Las hojas llegan como columnas object con enteros, textos y cadenas vacías.
+# Aquí se convierten una sola vez a tipos compactos:
+#   - "Fecha": datetime64, y además índice ordenado del DataFrame
+#   - "Tiempo entrenado": duración en segundos (float32, NaN si falta)
+#   - "Sensación": categórica
+#   - ejercicios: float32 con NaN donde no hay valor
+FORMATO_FECHA = "%d-%m-%Y"
+SENSACIONES = ["mala", "normal", "buena"]
+
+
+def tiempo_a_segundos(serie):
+    """Convierte tiempos "H:MM:SS" a segundos (NaN si no son válidos)."""
+    duraciones = pd.to_timedelta(serie.astype("string"), errors="coerce")
+    return duraciones.dt.total_seconds().astype("float32")
+
+
+def segundos_a_tiempo(segundos):
+    """Convierte segundos al formato "H:MM:SS" de la hoja ("" si falta)."""
+    if pd.isna(segundos):
+        return ""
+    segundos = int(segundos)
+    return f"{segundos // 3600}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+
+def tipar_dataframe(df, columnas_ejercicios):
+    """
+    Devuelve una copia tipada del DataFrame, ordenada e indexada por fecha.
+
+    Las filas con una fecha que no se puede interpretar se descartan, porque
+    no pueden colocarse en el índice.
+
+    Args:
+        df (pd.DataFrame): Datos con las columnas de COLUMNAS.
+        columnas_ejercicios (list): Columnas que contienen pesos.
+
+    Returns:
+        pd.DataFrame: DataFrame tipado con un DatetimeIndex ordenado.
+    """
+    # Las columnas se reúnen en un diccionario y el DataFrame se crea de una vez
+    columnas = {}
+    if is_datetime64_any_dtype(df["Fecha"]):
+        columnas["Fecha"] = df["Fecha"].to_numpy()
+    else:
+        columnas["Fecha"] = pd.to_datetime(df["Fecha"].astype("string"), format=FORMATO_FECHA, errors="coerce").to_numpy()
+
+    tiempo = df["Tiempo entrenado"]
+    columnas["Tiempo entrenado"] = (
+        tiempo.to_numpy(dtype="float32") if tiempo.dtype == "float32" else tiempo_a_segundos(tiempo).to_numpy()
+    )
+    columnas["Sensación"] = pd.Categorical(df["Sensación"].to_numpy(), categories=SENSACIONES)
+
+    for columna in columnas_ejercicios:
+        columnas[columna] = pd.to_numeric(df[columna], errors="coerce").to_numpy(dtype="float32")
+    tipado = pd.DataFrame(columnas, index=pd.RangeIndex(len(df)))
+
+    invalidas = tipado["Fecha"].isna()
+    if invalidas.any():
+        print(f"Se descartan {int(invalidas.sum())} fila(s) con fecha no válida")
+        tipado = tipado[~invalidas]
+
+    # Orden estable: los entrenamientos del mismo día conservan su orden de registro
+    tipado = tipado.sort_values("Fecha", kind="stable")
+    tipado.index = pd.DatetimeIndex(tipado["Fecha"].to_numpy())
+    return tipado
+
+
+def existe_fecha(df, fecha):
+    """Comprueba con el índice de fechas (sin recorrer la tabla) si hay una sesión ese día."""
+    return pd.Timestamp(fecha) in df.index
+
+
+def rango_fechas(df, inicio, fin):
+    """Devuelve las sesiones entre `inicio` y `fin` (ambas incluidas) por búsqueda binaria."""
+    return df.loc[pd.Timestamp(inicio):pd.Timestamp(fin)]
+
+
+def anadir_registro(df, registro, columnas_ejercicios):
+    """Añade un registro (con los textos del formulario) a un DataFrame tipado."""
+    nuevo = tipar_dataframe(
+        pd.DataFrame([registro]).reindex(columns=df.columns), columnas_ejercicios
+    )
+    combinado = pd.concat([df, nuevo])
+    if len(df) and nuevo.index[0] < df.index[-1]:
+        combinado = combinado.sort_values("Fecha", kind="stable")
+    return combinado
@@ -0,0 +1,241 @@
+"""
+Sustitutos en memoria de los servicios de Google para pruebas y benchmarks.
+
+Imitan solo la parte de la API que usa la app y cuentan las llamadas que
+reciben. `latencia` (segundos) simula el tiempo de ida y vuelta de cada una.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+
+# =============================================================================
+# GOOGLE DRIVE
+# =============================================================================
+class _Peticion:
+    """Petición diferida, como las de googleapiclient: se ejecuta con `execute()`."""
+
+    def __init__(self, servicio, nombre, resultado):
+        self._servicio = servicio
+        self._nombre = nombre
+        self._resultado = resultado
+
+    def execute(self):
+        self._servicio._registrar(self._nombre)
+        return self._resultado()
+
+
+class _ArchivosDrive:
+    """Recurso `files()` del servicio de Drive falso."""
+
+    def __init__(self, servicio):
+        self._servicio = servicio
+
+    def list(self, q="", orderBy=None, pageSize=None, fields=None, pageToken=None):
+        def resultado():
+            carpeta = re.search(r"'([^']+)' in parents", q or "")
+            desde = re.search(r"createdTime (>=?) '([^']+)'", q or "")
+            archivos = [
+                a for a in self._servicio.archivos
+                if (carpeta is None or a["carpeta"] == carpeta.group(1))
+                and ("mimeType contains 'image/'" not in (q or "") or a["mimeType"].startswith("image/"))
+                and (desde is None or a["createdTime"] > desde.group(2)
+                     or (desde.group(1) == ">=" and a["createdTime"] == desde.group(2)))
+            ]
+            for criterio in reversed((orderBy or "").split(",")):
+                if criterio.strip():
+                    campo, *sentido = criterio.split()
+                    archivos.sort(key=lambda a: a[campo], reverse=sentido == ["desc"])
+            respuesta = {}
+            if pageSize:
+                inicio = int(pageToken or 0)  # El token de página es el desplazamiento
+                if inicio + pageSize < len(archivos):
+                    respuesta["nextPageToken"] = str(inicio + pageSize)
+                archivos = archivos[inicio:inicio + pageSize]
+            respuesta["files"] = [{k: v for k, v in a.items() if k not in ("carpeta", "contenido")} for a in archivos]
+            return respuesta
+        return _Peticion(self._servicio, "files.list", resultado)
+
+    def get_media(self, fileId):
+        def resultado():
+            for archivo in self._servicio.archivos:
+                if archivo["id"] == fileId:
+                    self._servicio.bytes_descargados += len(archivo["contenido"])
+                    return archivo["contenido"]
+            raise FileNotFoundError(fileId)
+        return _Peticion(self._servicio, "files.get_media", resultado)
+
+
+class DriveFalso:
+    """Servicio de Google Drive v3 falso con archivos en memoria."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.archivos = []
+        self.llamadas = Counter()
+        self.bytes_descargados = 0
+        self._candado = threading.Lock()
+
+    def _registrar(self, nombre):
+        with self._candado:
+            self.llamadas[nombre] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def anadir_archivo(self, carpeta_id, nombre, contenido, creado=None, mime_type="image/jpeg"):
+        """Añade un archivo a la carpeta y devuelve sus metadatos."""
+        creado = creado or datetime.now(timezone.utc)
+        archivo = {
+            "id": f"archivo-{len(self.archivos)}",
+            "name": nombre,
+            "mimeType": mime_type,
+            "createdTime": creado.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "modifiedTime": creado.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "md5Checksum": hashlib.md5(contenido).hexdigest(),
+            "carpeta": carpeta_id,
+            "contenido": contenido,
+        }
+        self.archivos.append(archivo)
+        return archivo
+
+    def files(self):
+        return _ArchivosDrive(self)
+
+
+# =============================================================================
+# GOOGLE SHEETS
+# =============================================================================
+def _celda(valor):
+    """Texto que devolvería Sheets para un valor escrito en crudo."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def _fila_de_a1(referencia):
+    """Número de fila de una referencia A1 ("B7" -> 7, "B" -> None)."""
+    digitos = "".join(c for c in referencia if c.isdigit())
+    return int(digitos) if digitos else None
+
+
+def _columna_de_a1(referencia):
+    """Número de columna de una referencia A1 ("B7" -> 2, "7" -> None)."""
+    letras = "".join(c for c in referencia if c.isalpha())
+    if not letras:
+        return None
+    numero = 0
+    for letra in letras.upper():
+        numero = numero * 26 + ord(letra) - ord("A") + 1
+    return numero
+
+
+class HojaFalsa:
+    """Pestaña de una hoja de cálculo falsa (el `sheet1` de gspread)."""
+
+    def __init__(self, cliente, valores=None):
+        self._cliente = cliente
+        self.valores = [[_celda(v) for v in fila] for fila in (valores or [])]
+
+    def _llamada(self, nombre, filas=()):
+        self._cliente._registrar(nombre, sum(len(",".join(f)) for f in filas))
+
+    def get_all_values(self):
+        self._llamada("get_all_values", self.valores)
+        return [list(fila) for fila in self.valores]
+
+    def get_all_records(self):
+        from gspread.utils import numericise_all
+        self._llamada("get_all_records", self.valores)
+        if not self.valores:
+            return []
+        cabecera = self.valores[0]
+        return [
+            dict(zip(cabecera, numericise_all((fila + [""] * len(cabecera))[:len(cabecera)], default_blank="")))
+            for fila in self.valores[1:]
+        ]
+
+    def _leer_rango(self, rango):
+        inicio, _, fin = rango.partition(":")
+        fin = fin or inicio
+        fila_inicio = _fila_de_a1(inicio) or 1
+        fila_fin = _fila_de_a1(fin) or len(self.valores)
+        columna_inicio = _columna_de_a1(inicio) or 1
+        columna_fin = _columna_de_a1(fin)
+        filas = []
+        for fila in self.valores[fila_inicio - 1:fila_fin]:
+            filas.append(list(fila[columna_inicio - 1:columna_fin]))
+        while filas and not any(filas[-1]):
+            filas.pop()
+        return filas
+
+    def batch_get(self, rangos):
+        resultado = [self._leer_rango(rango) for rango in rangos]
+        self._llamada("batch_get", [f for filas in resultado for f in filas])
+        return resultado
+
+    def get(self, rango):
+        resultado = self._leer_rango(rango)
+        self._llamada("get", resultado)
+        return resultado
+
+    def col_values(self, columna):
+        valores = [fila[columna - 1] if len(fila) >= columna else "" for fila in self.valores]
+        while valores and not valores[-1]:
+            valores.pop()
+        self._llamada("col_values", [valores])
+        return valores
+
+    def row_values(self, fila):
+        valores = list(self.valores[fila - 1]) if len(self.valores) >= fila else []
+        self._llamada("row_values", [valores])
+        return valores
+
+    def append_rows(self, filas, **kwargs):
+        nuevas = [[_celda(v) for v in fila] for fila in filas]
+        self._llamada("append_rows", nuevas)
+        self.valores.extend(nuevas)
+
+    def append_row(self, fila, **kwargs):
+        nueva = [_celda(v) for v in fila]
+        self._llamada("append_row", [nueva])
+        self.valores.append(nueva)
+
+
+class _HojaDeCalculoFalsa:
+    def __init__(self, hoja):
+        self.sheet1 = hoja
+
+
+class SheetsFalso:
+    """Cliente de gspread falso: `open(nombre).sheet1` devuelve una HojaFalsa."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.hojas = {}
+        self.llamadas = Counter()
+        self.bytes_transferidos = 0
+        self._candado = threading.Lock()
+
+    def _registrar(self, nombre, tamano=0):
+        with self._candado:
+            self.llamadas[nombre] += 1
+            self.bytes_transferidos += tamano
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def crear_hoja(self, nombre, valores=None):
+        """Crea (o sustituye) una hoja con `valores` como filas, cabecera incluida."""
+        self.hojas[nombre] = HojaFalsa(self, valores)
+        return self.hojas[nombre]
+
+    def open(self, nombre):
+        self._registrar("open")
+        if nombre not in self.hojas:
+            from gspread.exceptions import SpreadsheetNotFound
+            raise SpreadsheetNotFound(nombre)
+        return _HojaDeCalculoFalsa(self.hojas[nombre])
@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+import stats_analysis
+from esquema import tipar_dataframe, SENSACIONES
+
+# =============================================================================
+# MODELO DE SESIONES EN FORMATO LARGO
+# =============================================================================
+# En la hoja cada sesión es una fila con las 33 columnas de ejercicios, casi
+# todas vacías. En formato largo se guardan dos tablas:
+#   - sesiones: una fila por sesión (atleta, sesion, fecha, tiempo, sensacion)
+#   - series: una fila por ejercicio hecho (atleta, sesion, fecha, ejercicio,
+#     carga y, si se conocen, series y repeticiones)
+# "ejercicio" es categórica con COLUMNAS_EJERCICIOS como categorías, así que
+# su código es la posición del ejercicio en el formato ancho. "sesion"
+# identifica la sesión dentro del atleta; a igual fecha, la menor va antes.
+COLUMNAS_SESIONES = ["atleta", "sesion", "fecha", "tiempo", "sensacion"]
+COLUMNAS_SERIES = ["atleta", "sesion", "fecha", "ejercicio", "carga", "series", "repeticiones"]
+
+
+def _columnas():
+    from data_management import COLUMNAS, COLUMNAS_EJERCICIOS  # Diferido: data_management importa Google
+    return COLUMNAS, COLUMNAS_EJERCICIOS
+
+
+def tipo_ejercicio():
+    """Tipo categórico de la columna "ejercicio" (códigos = posición en el formato ancho)."""
+    return pd.CategoricalDtype(_columnas()[1])
+
+
+def _ejercicios(ejercicio):
+    """Columna "ejercicio" a partir de códigos enteros o de nombres."""
+    ejercicio = np.asarray(ejercicio)
+    if ejercicio.dtype.kind in "iu":
+        return pd.Categorical.from_codes(ejercicio.astype("int16"), dtype=tipo_ejercicio())
+    return pd.Categorical(ejercicio, dtype=tipo_ejercicio())
+
+
+def _enteros(valores, n):
+    if valores is None:
+        return pd.array([pd.NA] * n, dtype="Int16")
+    return pd.array(pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce"), dtype="Int16")
+
+
+def tabla_sesiones(atletas, atleta, sesion, fecha, tiempo, sensacion):
+    """Construye la tabla de sesiones con sus tipos (`atletas` son las categorías de "atleta")."""
+    return pd.DataFrame({
+        "atleta": pd.Categorical(np.asarray(atleta, dtype=object), categories=atletas),
+        "sesion": np.asarray(sesion, dtype="int32"),
+        "fecha": np.asarray(fecha, dtype="datetime64[ns]"),
+        "tiempo": np.asarray(tiempo, dtype="float32"),
+        "sensacion": pd.Categorical(np.asarray(sensacion, dtype=object), categories=SENSACIONES),
+    }, columns=COLUMNAS_SESIONES)
+
+
+def tabla_series(atletas, atleta, sesion, fecha, ejercicio, carga, series=None, repeticiones=None):
+    """Construye la tabla de series con sus tipos; "ejercicio" admite códigos o nombres."""
+    return pd.DataFrame({
+        "atleta": pd.Categorical(np.asarray(atleta, dtype=object), categories=atletas),
+        "sesion": np.asarray(sesion, dtype="int32"),
+        "fecha": np.asarray(fecha, dtype="datetime64[ns]"),
+        "ejercicio": _ejercicios(ejercicio),
+        "carga": np.asarray(carga, dtype="float32"),
+        "series": _enteros(series, len(carga)),
+        "repeticiones": _enteros(repeticiones, len(carga)),
+    }, columns=COLUMNAS_SERIES)
+
+
+# =============================================================================
+# CONVERSIÓN ENTRE FORMATO ANCHO Y LARGO
+# =============================================================================
+def ancho_a_largo(df, atleta):
+    """
+    Convierte un DataFrame tipado en formato ancho a las tablas de sesiones y series.
+
+    Solo se guardan las celdas con valor; las vacías (NaN) no ocupan filas.
+
+    Args:
+        df (pd.DataFrame): DataFrame tipado de un atleta (ver `esquema.tipar_dataframe`).
+        atleta (str): Identificador del atleta en las tablas largas.
+
+    Returns:
+        tuple: (sesiones, series) como DataFrames.
+    """
+    _, columnas_ejercicios = _columnas()
+    fechas = df["Fecha"].to_numpy(dtype="datetime64[ns]")
+    atletas = [atleta]
+    sesiones = tabla_sesiones(
+        atletas, [atleta] * len(df), np.arange(len(df)), fechas,
+        df["Tiempo entrenado"].to_numpy(dtype="float32"), df["Sensación"].to_numpy()
+    )
+
+    valores = df[columnas_ejercicios].to_numpy(dtype="float32")
+    filas, codigos = np.nonzero(~np.isnan(valores))  # Recorre por filas: el orden de sesión se conserva
+    series = tabla_series(atletas, [atleta] * len(filas), filas, fechas[filas], codigos, valores[filas, codigos])
+    return sesiones, series
+
+
+def _rejilla(sesiones, series, columna):
+    """Matriz (sesiones x COLUMNAS_EJERCICIOS) con `columna` de las series (NaN donde no hay)."""
+    posicion = pd.Index(sesiones["sesion"].to_numpy()).get_indexer(series["sesion"].to_numpy())
+    valores = np.full((len(sesiones), len(_columnas()[1])), np.nan, dtype="float32")
+    valores[posicion, series["ejercicio"].cat.codes.to_numpy()] = (
+        pd.to_numeric(series[columna]).to_numpy(dtype="float32", na_value=np.nan)
+    )
+    return valores
+
+
+def largo_a_ancho(sesiones, series):
+    """
+    Reconstruye el DataFrame tipado en formato ancho de un atleta.
+
+    Las series y repeticiones no tienen sitio en el formato ancho y se descartan
+    (ver `detalle_a_ancho`).
+    """
+    columnas, columnas_ejercicios = _columnas()
+    sesiones = sesiones.sort_values(["fecha", "sesion"], kind="stable")
+    valores = _rejilla(sesiones, series, "carga")
+
+    df = pd.DataFrame({
+        "Fecha": sesiones["fecha"].to_numpy(dtype="datetime64[ns]"),
+        "Tiempo entrenado": sesiones["tiempo"].to_numpy(dtype="float32"),
+        "Sensación": sesiones["sensacion"].astype(object).to_numpy(),
+        **{ejercicio: valores[:, j] for j, ejercicio in enumerate(columnas_ejercicios)},
+    }, columns=columnas)
+    return tipar_dataframe(df, columnas_ejercicios)
+
+
+def detalle_a_ancho(sesiones, series):
+    """
+    Series y repeticiones de un atleta con la forma de `largo_a_ancho`.
+
+    Returns:
+        tuple: (series, repeticiones), DataFrames indexados por fecha con una
+        columna por ejercicio (NaN donde no se conocen).
+    """
+    columnas_ejercicios = _columnas()[1]
+    sesiones = sesiones.sort_values(["fecha", "sesion"], kind="stable")
+    indice = pd.DatetimeIndex(sesiones["fecha"].to_numpy())
+    return tuple(
+        pd.DataFrame(_rejilla(sesiones, series, columna), index=indice, columns=columnas_ejercicios)
+        for columna in ("series", "repeticiones")
+    )
+
+
+def dfs_a_largo(dfs):
+    """Convierte los DataFrames anchos de varios atletas (por nombre) a dos tablas largas comunes."""
+    atletas = list(dfs.keys())
+    partes = [ancho_a_largo(df, atleta) for atleta, df in dfs.items()]
+    if not partes:
+        partes = [ancho_a_largo(pd.DataFrame(columns=_columnas()[0]), "")]
+    sesiones = pd.concat([p[0] for p in partes], ignore_index=True)
+    series = pd.concat([p[1] for p in partes], ignore_index=True)
+    for tabla in (sesiones, series):
+        tabla["atleta"] = pd.Categorical(tabla["atleta"].astype(object), categories=atletas)
+    return sesiones, series
+
+
+# =============================================================================
+# CONSULTAS SOBRE EL FORMATO LARGO
+# =============================================================================
+def ultimos_valores_largo(series):
+    """
+    Último valor de cada ejercicio de cada atleta, sin pasar por el formato ancho.
+
+    Returns:
+        pd.Series: Carga indexada por (atleta, ejercicio), solo para los pares con valor.
+    """
+    ordenadas = series.sort_values(["fecha", "sesion"], kind="stable")
+    return ordenadas.groupby(["atleta", "ejercicio"], observed=True)["carga"].last()
+
+
+def puntuaciones_largo(series, generos):
+    """
+    Puntúa todas las categorías de varios atletas a partir de sus series en formato largo.
+
+    Args:
+        series (pd.DataFrame): Tabla de series (ver `ancho_a_largo`).
+        generos (dict): Género de cada atleta, por su identificador en `series`.
+
+    Returns:
+        dict: Puntuaciones por categoría de cada atleta.
+    """
+    atletas = list(generos.keys())
+    if not atletas:
+        return {}
+    ejercicios = stats_analysis.EJERCICIOS_PUNTUADOS
+
+    ultimos = ultimos_valores_largo(series)
+    filas = pd.Index(atletas).get_indexer(ultimos.index.get_level_values("atleta"))
+    columnas = pd.Index(ejercicios).get_indexer(ultimos.index.get_level_values("ejercicio").astype(str))
+    usados = (filas >= 0) & (columnas >= 0)  # Solo ejercicios que puntúan, de atletas pedidos
+
+    valores = np.zeros((len(atletas), len(ejercicios)))
+    valores[filas[usados], columnas[usados]] = ultimos.to_numpy(dtype=float)[usados]
+    maximos = np.vstack([stats_analysis.maximos_vector(generos[atleta]) for atleta in atletas])
+    puntuaciones = stats_analysis.puntuar(valores, maximos)
+    return {
+        atleta: {categoria: float(valor) for categoria, valor in zip(stats_analysis.CATEGORIAS.keys(), fila)}
+        for atleta, fila in zip(atletas, puntuaciones)
+    }
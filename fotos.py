@@ -0,0 +1,289 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from drive_utils import buscar_ultima_imagen_drive, iterar_imagenes_drive, descargar_imagen_drive, version_archivo
+from instrumentacion import tramo
+
+# =============================================================================
+# FOTOS DE PROGRESO: INGESTA, VARIANTES E ÍNDICE
+# =============================================================================
+# Cada foto se procesa una sola vez al descubrirla: se descarga (o se lee de la
+# carpeta local), se generan una miniatura y una versión para pantalla en WebP
+# y se anota en un índice ordenado por fecha. La app solo sirve esas variantes,
+# nunca el original, así que lo que se envía por visita no depende del número
+# ni del tamaño de las fotos.
+DIRECTORIO_FOTOS = ".fotos"  # Variantes WebP (miniaturas/ y pantalla/) e indice.json
+LADO_MINIATURA = 256  # Lado mayor de las miniaturas, en píxeles
+LADO_PANTALLA = 1280  # Lado mayor de la versión que se abre en la galería
+CALIDAD_WEBP = 80
+INTERVALO_INGESTA = 300  # Segundos mínimos entre dos consultas a la misma carpeta de Drive
+LOTE_INGESTA = 10  # Fotos nuevas que procesa como mucho cada ingesta de una carpeta de Drive
+EXTENSIONES_LOCALES = (".png", ".jpg", ".jpeg", ".webp")
+
+_candado = threading.RLock()
+_indice = None  # Lista de fotos ordenada por fecha (la más antigua primero)
+_marcas = None  # carpeta -> createdTime hasta el que ya se procesó todo (ver ingerir_carpeta_drive)
+_ultima_ingesta = {}  # carpeta -> instante de la última consulta a Drive
+_a_medias = set()  # Carpetas cuya última ingesta llenó el lote y dejó fotos por procesar
+
+
+def _ruta_indice():
+    return os.path.join(DIRECTORIO_FOTOS, "indice.json")
+
+
+def _ruta_marcas():
+    return os.path.join(DIRECTORIO_FOTOS, "marcas.json")
+
+
+def ruta_variante(foto, variante):
+    """Ruta del archivo WebP de una foto ("miniaturas" o "pantalla")."""
+    return os.path.join(DIRECTORIO_FOTOS, variante, f"{foto['id']}.webp")
+
+
+def _cargar_indice():
+    global _indice
+    if _indice is None:
+        try:
+            with open(_ruta_indice(), encoding="utf-8") as f:
+                _indice = json.load(f)
+        except (OSError, ValueError):
+            _indice = []
+    return _indice
+
+
+def _guardar_json(ruta, datos):
+    os.makedirs(DIRECTORIO_FOTOS, exist_ok=True)
+    with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(ruta + ".tmp", ruta)
+
+
+def _guardar_indice():
+    _guardar_json(_ruta_indice(), _indice)
+
+
+def _cargar_marcas():
+    global _marcas
+    if _marcas is None:
+        try:
+            with open(_ruta_marcas(), encoding="utf-8") as f:
+                _marcas = json.load(f)
+        except (OSError, ValueError):
+            _marcas = {}
+    return _marcas
+
+
+def _generar_variantes(foto, datos):
+    """Genera la versión para pantalla y la miniatura de una foto a partir de sus bytes."""
+    from PIL import Image, ImageOps  # Diferido: solo hace falta al ingerir fotos nuevas
+
+    with Image.open(io.BytesIO(datos)) as original:
+        original.draft("RGB", (LADO_PANTALLA, LADO_PANTALLA))  # Los JPEG se decodifican ya reducidos
+        imagen = ImageOps.exif_transpose(original).convert("RGB")
+    foto["ancho"], foto["alto"] = imagen.size
+
+    for variante, lado in (("pantalla", LADO_PANTALLA), ("miniaturas", LADO_MINIATURA)):
+        imagen.thumbnail((lado, lado))  # La miniatura sale de la versión ya reducida
+        ruta = ruta_variante(foto, variante)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        imagen.save(ruta + ".tmp", format="WEBP", quality=CALIDAD_WEBP)
+        os.replace(ruta + ".tmp", ruta)
+
+
+def _anadir(fotos):
+    """Añade fotos ya procesadas al índice, que sigue ordenado por fecha."""
+    indice = _cargar_indice()
+    nuevas = {foto["id"] for foto in fotos}
+    indice[:] = [foto for foto in indice if foto["id"] not in nuevas] + fotos
+    indice.sort(key=lambda foto: (foto["fecha"], foto["nombre"]))
+    _guardar_indice()
+
+
+# =============================================================================
+# INGESTA
+# =============================================================================
+def _foto_drive(carpeta_id, archivo):
+    """Entrada del índice para un archivo de Drive (sin variantes aún)."""
+    return {
+        "id": archivo["id"], "carpeta": carpeta_id, "nombre": archivo["name"],
+        "fecha": archivo["createdTime"], "version": version_archivo(archivo),
+    }
+
+
+def ingerir_ultima_drive(carpeta_id, servicio=None):
+    """
+    Procesa solo la foto más reciente de una carpeta de Drive.
+
+    Drive la busca con una consulta de un solo archivo, así que la cabecera
+    muestra la última foto sin esperar a que la galería se ponga al día. Si
+    esa versión ya está en el índice no se descarga nada.
+
+    Returns:
+        bool: True si la foto era nueva.
+    """
+    archivo = buscar_ultima_imagen_drive(carpeta_id, servicio)
+    if archivo is None:
+        return False
+    foto = _foto_drive(carpeta_id, archivo)
+    with _candado:
+        if any(conocida["id"] == foto["id"] and conocida.get("version") == foto["version"]
+               for conocida in _cargar_indice()):
+            return False
+
+    with tramo("fotos.ingesta_ultima", carpeta=carpeta_id):
+        _generar_variantes(foto, descargar_imagen_drive(archivo, servicio))
+    with _candado:
+        _anadir([foto])
+    return True
+
+
+def ingerir_carpeta_drive(carpeta_id, servicio=None, forzar=False, lote=LOTE_INGESTA):
+    """
+    Procesa las fotos de una carpeta de Drive que aún no estén en el índice.
+
+    La carpeta se consulta como mucho una vez cada INTERVALO_INGESTA segundos
+    (salvo con `forzar`), y solo se piden las fotos creadas desde la marca de
+    la carpeta: la fecha de la última foto antes de la cual todo se procesó
+    bien. Una foto que falla (o las que comparten la fecha de la marca) se
+    vuelve a listar en la siguiente consulta; las ya conocidas se saltan por
+    ID y md5. Las descargas pasan por la caché de imágenes, así que reintentar
+    una foto que no se pudo procesar no la vuelve a descargar.
+
+    Cada llamada procesa como mucho `lote` fotos nuevas (None: todas) y deja
+    la marca en la última, así que la primera ingesta de una carpeta grande se
+    reparte entre varias llamadas en lugar de descargarlo todo de una vez;
+    `ingesta_pendiente()` dice si quedan fotos por procesar.
+
+    Returns:
+        int: Número de fotos nuevas.
+    """
+    with _candado:
+        if not forzar and time.monotonic() - _ultima_ingesta.get(carpeta_id, -INTERVALO_INGESTA) < INTERVALO_INGESTA:
+            return 0
+        _ultima_ingesta[carpeta_id] = time.monotonic()
+        conocidas = {
+            foto["id"]: foto.get("version") for foto in _cargar_indice() if foto["carpeta"] == carpeta_id
+        }
+        desde = _cargar_marcas().get(carpeta_id)
+
+    with tramo("fotos.ingesta_drive", carpeta=carpeta_id):
+        nuevas = []
+        marca = desde
+        fallida = False
+        llena = False
+        for archivo in iterar_imagenes_drive(carpeta_id, servicio, desde, tamano_pagina=lote or 1000):
+            if lote and len(nuevas) >= lote:
+                llena = True
+                break
+            version = version_archivo(archivo)
+            if conocidas.get(archivo["id"]) != version:
+                foto = _foto_drive(carpeta_id, archivo)
+                try:
+                    _generar_variantes(foto, descargar_imagen_drive(archivo, servicio))
+                    nuevas.append(foto)
+                except Exception as e:
+                    print(f"No se pudo procesar la foto {archivo['name']}: {e}")
+                    fallida = True
+            if not fallida:  # La marca no pasa de la primera foto que falló
+                marca = archivo["createdTime"]
+
+    with _candado:
+        if nuevas:
+            _anadir(nuevas)
+        if llena:
+            _a_medias.add(carpeta_id)
+        else:
+            _a_medias.discard(carpeta_id)
+        if marca != desde:
+            _cargar_marcas()[carpeta_id] = marca
+            _guardar_json(_ruta_marcas(), _marcas)
+    return len(nuevas)
+
+
+def ingerir_carpeta_local(carpeta):
+    """
+    Procesa las fotos de una carpeta local que aún no estén en el índice.
+
+    Una foto se reconoce por su ruta, tamaño y fecha de modificación, así que
+    solo se vuelve a procesar si el archivo cambia.
+
+    Returns:
+        int: Número de fotos nuevas.
+    """
+    with _candado:
+        conocidas = {foto["id"]: foto.get("version") for foto in _cargar_indice() if foto["carpeta"] == carpeta}
+
+    nuevas = []
+    with tramo("fotos.ingesta_local", carpeta=carpeta):
+        for entrada in os.scandir(carpeta):
+            if not entrada.is_file() or not entrada.name.lower().endswith(EXTENSIONES_LOCALES):
+                continue
+            info = entrada.stat()
+            foto_id = hashlib.sha1(os.path.abspath(entrada.path).encode()).hexdigest()[:16]
+            version = f"{info.st_size}-{int(info.st_mtime)}"
+            if conocidas.get(foto_id) == version:
+                continue
+            foto = {
+                "id": foto_id, "carpeta": carpeta, "nombre": entrada.name, "ruta": entrada.path,
+                "fecha": datetime.fromtimestamp(info.st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+                "version": version,
+            }
+            try:
+                with open(entrada.path, "rb") as f:
+                    _generar_variantes(foto, f.read())
+            except Exception as e:
+                print(f"No se pudo procesar la foto {entrada.name}: {e}")
+                continue
+            nuevas.append(foto)
+
+    if nuevas:
+        with _candado:
+            _anadir(nuevas)
+    return len(nuevas)
+
+
+# =============================================================================
+# CONSULTAS SOBRE EL ÍNDICE
+# =============================================================================
+def fotos(carpetas=None):
+    """Fotos del índice (de las carpetas dadas), de la más reciente a la más antigua."""
+    with _candado:
+        indice = list(_cargar_indice())
+    if carpetas is not None:
+        carpetas = set(carpetas)
+        indice = [foto for foto in indice if foto["carpeta"] in carpetas]
+    return indice[::-1]
+
+
+def ingesta_pendiente(carpeta_id):
+    """True si la última ingesta de la carpeta de Drive llenó su lote y dejó fotos sin procesar."""
+    with _candado:
+        return carpeta_id in _a_medias
+
+
+def ultima_foto(carpeta):
+    """La foto más reciente de una carpeta, o None si no tiene ninguna."""
+    recientes = fotos([carpeta])
+    return recientes[0] if recientes else None
+
+
+def reiniciar_indice():
+    """Olvida el índice en memoria y las marcas de ingesta (se relee del disco)."""
+    global _indice, _marcas
+    with _candado:
+        _indice = None
+        _marcas = None
+        _ultima_ingesta.clear()
+        _a_medias.clear()
+
+
+if __name__ == "__main__":
+    # Ingesta manual de las carpetas de todos los atletas
+    from atletas import obtener_atletas
+
+    for carpeta_id in dict.fromkeys(atleta["carpeta_drive"] for atleta in obtener_atletas()):
+        print(f"{carpeta_id}: {ingerir_carpeta_drive(carpeta_id, forzar=True, lote=None)} foto(s) nuevas")
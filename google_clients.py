@@ -0,0 +1,132 @@
+import threading
+from instrumentacion import tramo
+from planificador_google import ejecutar
+
+# Configuración de credenciales
+CREDENCIALES_SHEETS = "sheets-key.json"  # Ruta al archivo JSON de credenciales de Sheets
+SCOPE_SHEETS = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+CREDENCIALES_DRIVE = "drive-key.json"  # Ruta al archivo JSON de credenciales de Drive
+SCOPES_DRIVE = ["https://www.googleapis.com/auth/drive.readonly"]
+
+# gspread, oauth2client y googleapiclient se importan dentro de las funciones
+# que los usan: tardan en cargar y el arranque de la app no los necesita hasta
+# la primera llamada real a Google (ni nunca, si se inyecta un cliente falso).
+
+# =============================================================================
+# ESTADO COMPARTIDO POR TODO EL PROCESO
+# =============================================================================
+# Streamlit ejecuta cada sesión en su propio hilo, así que todo lo que se
+# comparte aquí va protegido por un candado.
+_candado = threading.RLock()
+_cliente_sheets = None
+_hojas = {}
+_servicio_drive = None
+_servicio_drive_fijo = None  # Sustituto inyectado (p. ej. DriveFalso en pruebas)
+
+
+def obtener_cliente_sheets():
+    """
+    Devuelve el cliente de gspread del proceso, autenticándose solo la primera vez.
+
+    gspread guarda las credenciales en su sesión HTTP y renueva el token
+    automáticamente cuando caduca, así que no hace falta volver a autorizar.
+    """
+    global _cliente_sheets
+    with _candado:
+        if _cliente_sheets is None:
+            with tramo("sheets.autenticacion"):
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+
+                creds = ServiceAccountCredentials.from_json_keyfile_name(CREDENCIALES_SHEETS, SCOPE_SHEETS)
+                _cliente_sheets = gspread.authorize(creds)
+        return _cliente_sheets
+
+
+def obtener_hoja(nombre_hoja):
+    """
+    Devuelve la primera pestaña de la hoja de cálculo `nombre_hoja`.
+
+    El manejador se abre una vez por proceso y se reutiliza en las siguientes
+    llamadas, evitando la búsqueda de la hoja en Drive en cada recarga. La
+    apertura se hace fuera del candado (puede esperar a la cuota o reintentar)
+    y las aperturas simultáneas de la misma hoja comparten una sola petición.
+    """
+    with _candado:
+        hoja = _hojas.get(nombre_hoja)
+        if hoja is not None:
+            return hoja
+        cliente = obtener_cliente_sheets()
+    with tramo("sheets.abrir", hoja=nombre_hoja):
+        hoja = ejecutar("sheets.lectura", "open", lambda: cliente.open(nombre_hoja).sheet1, clave=nombre_hoja)
+    with _candado:
+        return _hojas.setdefault(nombre_hoja, hoja)
+
+
+def invalidar_hoja(nombre_hoja=None):
+    """Olvida el manejador de una hoja (o de todas) para forzar su reapertura."""
+    with _candado:
+        if nombre_hoja is None:
+            _hojas.clear()
+        else:
+            _hojas.pop(nombre_hoja, None)
+
+
+def obtener_servicio_drive():
+    """
+    Devuelve el servicio de Google Drive del proceso, construyéndolo solo la primera vez.
+
+    Las credenciales se cargan una vez y se renuevan solas al caducar. El
+    transporte httplib2 no es seguro entre hilos, así que cada petición se
+    ejecuta con su propio objeto http autorizado (`requestBuilder`) en lugar
+    de construir un servicio por hilo.
+    """
+    global _servicio_drive
+    if _servicio_drive_fijo is not None:
+        return _servicio_drive_fijo
+    with _candado:
+        if _servicio_drive is None:
+            with tramo("drive.construir_servicio"):
+                import google_auth_httplib2
+                import httplib2
+                from google.oauth2 import service_account
+                from googleapiclient.discovery import build
+                from googleapiclient.http import HttpRequest
+
+                creds = service_account.Credentials.from_service_account_file(
+                    CREDENCIALES_DRIVE, scopes=SCOPES_DRIVE
+                )
+
+                def nueva_peticion(_http, *args, **kwargs):
+                    http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+                    return HttpRequest(http, *args, **kwargs)
+
+                _servicio_drive = build(
+                    "drive", "v3", requestBuilder=nueva_peticion, cache_discovery=False,
+                    http=google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+                )
+        return _servicio_drive
+
+
+def establecer_cliente_sheets(cliente):
+    """Sustituye el cliente de gspread del proceso (p. ej. por uno falso en pruebas)."""
+    global _cliente_sheets
+    with _candado:
+        _cliente_sheets = cliente
+        _hojas.clear()
+
+
+def establecer_servicio_drive(servicio):
+    """Sustituye el servicio de Drive del proceso (p. ej. por uno falso en pruebas); None vuelve al real."""
+    global _servicio_drive_fijo
+    _servicio_drive_fijo = servicio
+
+
+def reiniciar_clientes():
+    """Descarta clientes, credenciales y manejadores cacheados del proceso."""
+    global _cliente_sheets, _servicio_drive, _servicio_drive_fijo
+    with _candado:
+        _cliente_sheets = None
+        _servicio_drive = None
+        _servicio_drive_fijo = None
+        _hojas.clear()
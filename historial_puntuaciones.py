@@ -0,0 +1,197 @@
+import hashlib
+import json
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import stats_analysis
+from base_local import conectar, candado
+from esquema import FORMATO_FECHA
+from stats_analysis import CATEGORIAS, puntuar, maximos_vector
+
+# =============================================================================
+# HISTORIAL MATERIALIZADO DE PUNTUACIONES
+# =============================================================================
+# Guarda, para cada atleta, la puntuación de cada categoría tras cada sesión.
+# Al registrar una sesión nueva solo se calcula esa fila a partir del último
+# valor conocido de cada ejercicio (tabla `estado_puntuaciones`); el historial
+# completo se rehace cuando cambian MAXIMOS/CATEGORIAS o cuando deja de cuadrar
+# con los datos. Las tablas están en la base local compartida (ver `base_local`).
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS puntuaciones (
+    hoja TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    puntuacion REAL NOT NULL,
+    PRIMARY KEY (hoja, fecha, categoria)
+);
+CREATE TABLE IF NOT EXISTS estado_puntuaciones (
+    hoja TEXT NOT NULL,
+    ejercicio TEXT NOT NULL,
+    valor REAL NOT NULL,
+    PRIMARY KEY (hoja, ejercicio)
+);
+CREATE TABLE IF NOT EXISTS meta_puntuaciones (
+    hoja TEXT PRIMARY KEY,
+    firma TEXT NOT NULL,
+    sesiones INTEGER NOT NULL,
+    ultima_fecha TEXT
+);
+"""
+
+
+def _conectar():
+    """Abre la base local, creando las tablas del historial si no existen."""
+    return conectar(_ESQUEMA)
+
+
+def firma_configuracion(genero):
+    """Huella de la configuración de puntuación; si cambia, hay que reconstruir."""
+    configuracion = {
+        "categorias": CATEGORIAS,
+        "pesos": stats_analysis.PESO_EJERCICIOS,
+        "maximos": stats_analysis.MAXIMOS[genero],
+        "mejor_ejercicio": sorted(stats_analysis.CATEGORIAS_MEJOR_EJERCICIO),
+    }
+    return hashlib.sha1(json.dumps(configuracion, sort_keys=True).encode()).hexdigest()
+
+
+def _filas_puntuaciones(nombre_hoja, fechas, puntuaciones):
+    categorias = list(CATEGORIAS.keys())
+    return [
+        (nombre_hoja, fecha, categoria, float(valor))
+        for fecha, fila in zip(fechas, puntuaciones)
+        for categoria, valor in zip(categorias, fila)
+    ]
+
+
+def reconstruir_historial(nombre_hoja, df, genero):
+    """
+    Rehace desde cero el historial de un atleta a partir de su DataFrame tipado.
+
+    Los valores de cada ejercicio se arrastran hacia delante (último valor
+    conocido en cada sesión) y todas las sesiones se puntúan en una sola
+    operación matricial.
+    """
+    stats_analysis.preparar_tablas_puntuacion()  # Por si MAXIMOS o CATEGORIAS cambiaron
+    ejercicios = stats_analysis.EJERCICIOS_PUNTUADOS
+    valores = (
+        df.reindex(columns=ejercicios).apply(pd.to_numeric, errors="coerce")
+        .ffill().fillna(0).to_numpy(dtype=float)
+    )
+    fechas = [fecha.strftime("%Y-%m-%d") for fecha in pd.to_datetime(df["Fecha"])]
+    puntuaciones = puntuar(valores, maximos_vector(genero)) if len(valores) else np.zeros((0, len(CATEGORIAS)))
+    ultimos = valores[-1] if len(valores) else np.zeros(len(ejercicios))
+
+    with candado, _conectar() as conexion:
+        conexion.execute("DELETE FROM puntuaciones WHERE hoja = ?", (nombre_hoja,))
+        conexion.execute("DELETE FROM estado_puntuaciones WHERE hoja = ?", (nombre_hoja,))
+        conexion.executemany(
+            "INSERT OR REPLACE INTO puntuaciones VALUES (?, ?, ?, ?)",
+            _filas_puntuaciones(nombre_hoja, fechas, puntuaciones)
+        )
+        conexion.executemany(
+            "INSERT INTO estado_puntuaciones VALUES (?, ?, ?)",
+            [(nombre_hoja, ejercicio, float(valor)) for ejercicio, valor in zip(ejercicios, ultimos)]
+        )
+        conexion.execute(
+            "INSERT OR REPLACE INTO meta_puntuaciones VALUES (?, ?, ?, ?)",
+            (nombre_hoja, firma_configuracion(genero), len(fechas), fechas[-1] if fechas else None)
+        )
+    conexion.close()
+
+
+def registrar_sesion(nombre_hoja, genero, registro):
+    """
+    Añade al historial la puntuación tras una sesión nueva, sin recorrer las anteriores.
+
+    Si el historial no está al día (configuración distinta o sesión con fecha
+    anterior a la última) se invalida para que se reconstruya la próxima vez
+    que se consulte.
+
+    Returns:
+        bool: True si se actualizó de forma incremental.
+    """
+    fecha = datetime.strptime(registro["Fecha"], FORMATO_FECHA).strftime("%Y-%m-%d")
+    ejercicios = stats_analysis.EJERCICIOS_PUNTUADOS
+
+    with candado, _conectar() as conexion:
+        meta = conexion.execute(
+            "SELECT firma, sesiones, ultima_fecha FROM meta_puntuaciones WHERE hoja = ?", (nombre_hoja,)
+        ).fetchone()
+        if meta is None or meta[0] != firma_configuracion(genero) or (meta[2] and fecha <= meta[2]):
+            conexion.execute("DELETE FROM meta_puntuaciones WHERE hoja = ?", (nombre_hoja,))
+            actualizado = False
+        else:
+            estado = dict(conexion.execute(
+                "SELECT ejercicio, valor FROM estado_puntuaciones WHERE hoja = ?", (nombre_hoja,)
+            ))
+            nuevos = pd.to_numeric(pd.Series([registro.get(ej) for ej in ejercicios], dtype=object), errors="coerce")
+            valores = np.array([
+                nuevo if not pd.isna(nuevo) else estado.get(ejercicio, 0.0)
+                for ejercicio, nuevo in zip(ejercicios, nuevos)
+            ], dtype=float)
+
+            conexion.executemany(
+                "INSERT OR REPLACE INTO puntuaciones VALUES (?, ?, ?, ?)",
+                _filas_puntuaciones(nombre_hoja, [fecha], puntuar(valores, maximos_vector(genero)))
+            )
+            conexion.executemany(
+                "INSERT OR REPLACE INTO estado_puntuaciones VALUES (?, ?, ?)",
+                [(nombre_hoja, ejercicio, float(valor)) for ejercicio, valor in zip(ejercicios, valores)]
+            )
+            conexion.execute(
+                "UPDATE meta_puntuaciones SET sesiones = sesiones + 1, ultima_fecha = ? WHERE hoja = ?",
+                (fecha, nombre_hoja)
+            )
+            actualizado = True
+    conexion.close()
+    return actualizado
+
+
+def obtener_historial(nombre_hoja, df, genero):
+    """
+    Devuelve el historial de puntuaciones (una fila por sesión, una columna por categoría).
+
+    Se reconstruye solo si falta, si cambió la configuración o si no cuadra con
+    el número de sesiones y la última fecha de `df`.
+    """
+    ultima_fecha = pd.Timestamp(df["Fecha"].iloc[-1]).strftime("%Y-%m-%d") if len(df) else None
+    conexion = _conectar()
+    try:
+        meta = conexion.execute(
+            "SELECT firma, sesiones, ultima_fecha FROM meta_puntuaciones WHERE hoja = ?", (nombre_hoja,)
+        ).fetchone()
+    finally:
+        conexion.close()
+
+    if meta != (firma_configuracion(genero), len(df), ultima_fecha):
+        reconstruir_historial(nombre_hoja, df, genero)
+
+    conexion = _conectar()
+    try:
+        largo = pd.read_sql_query(
+            "SELECT fecha, categoria, puntuacion FROM puntuaciones WHERE hoja = ? ORDER BY fecha",
+            conexion, params=(nombre_hoja,)
+        )
+    finally:
+        conexion.close()
+
+    historial = largo.pivot(index="fecha", columns="categoria", values="puntuacion")
+    historial.index = pd.to_datetime(historial.index)
+    return historial.reindex(columns=list(CATEGORIAS.keys()))
+
+
+def reconstruir_todo():
+    """Reconstruye el historial de todos los atletas del registro (tras cambiar MAXIMOS o CATEGORIAS)."""
+    from atletas import obtener_atletas
+    from data_management import inicializar_dataframes
+
+    atletas = obtener_atletas()
+    dfs = inicializar_dataframes(atletas)
+    for atleta in atletas:
+        reconstruir_historial(atleta["hoja"], dfs[atleta["nombre"]], atleta["genero"])
+        print(f"Historial de {atleta['nombre']} reconstruido ({len(dfs[atleta['nombre']])} sesiones)")
+
+
+if __name__ == "__main__":
+    reconstruir_todo()
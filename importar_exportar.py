@@ -0,0 +1,237 @@
+"""
+Importación y exportación masiva de entrenamientos (CSV o Parquet).
+
+Uso:
+    python importar_exportar.py importar Animalaco historico.csv
+    python importar_exportar.py importar Animalaco historico.parquet --estricto
+    python importar_exportar.py exportar Animalaco copia.csv
+
+Los archivos usan las columnas de la hoja (COLUMNAS), con la fecha en formato
+DD-MM-AAAA y el tiempo como H:MM:SS. Al importar se descartan las filas no
+válidas y las fechas que ya tienen entrenamiento; las filas nuevas se guardan
+de una vez y se suben a Google Sheets en lotes grandes de `append_rows`. La
+exportación escribe el historial por bloques, sin cargarlo entero en memoria.
+"""
+import argparse
+import csv
+import math
+import sys
+from datetime import datetime
+import pandas as pd
+import diario_escrituras
+from almacenamiento import obtener_almacenamiento
+from atletas import atleta_por_nombre
+from data_management import (
+    COLUMNAS, COLUMNAS_EJERCICIOS, validar_tiempo, inicializar_dataframes,
+    existe_entrenamiento_en_fecha, importar_entrenamientos,
+)
+from esquema import FORMATO_FECHA, SENSACIONES
+
+TAMANO_BLOQUE = 2000  # Filas leídas o escritas por bloque
+MAX_ERRORES_MOSTRADOS = 20
+
+
+# =============================================================================
+# LECTURA Y VALIDACIÓN
+# =============================================================================
+def leer_bloques(ruta, tamano=TAMANO_BLOQUE):
+    """Lee un CSV o Parquet por bloques, como DataFrames de texto ("" donde no hay valor)."""
+    if ruta.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=tamano):
+            df = lote.to_pandas()
+            yield df.astype(object).where(df.notna(), "").astype(str)
+    else:
+        yield from pd.read_csv(ruta, dtype=str, keep_default_na=False, chunksize=tamano, encoding="utf-8")
+
+
+def _numero(texto):
+    """Convierte el texto de un ejercicio a número (int si es entero), "" si está vacío."""
+    if texto == "":
+        return ""
+    valor = float(texto.replace(",", "."))
+    if not math.isfinite(valor):
+        raise ValueError("no finito")  # float() acepta "nan", "inf" e "infinity"
+    if valor < 0:
+        raise ValueError("negativo")
+    return int(valor) if valor.is_integer() else valor
+
+
+def validar_fila(fila):
+    """
+    Valida una fila del archivo y la convierte en un registro como los del formulario.
+
+    Returns:
+        tuple: (registro, None) si es válida, o (None, motivo) si no lo es.
+    """
+    try:
+        fecha = datetime.strptime(fila["Fecha"].strip(), FORMATO_FECHA)
+    except ValueError:
+        return None, f"fecha no válida '{fila['Fecha']}'"
+
+    tiempo = fila.get("Tiempo entrenado", "").strip()
+    if tiempo and not validar_tiempo(tiempo):
+        return None, f"tiempo no válido '{tiempo}'"
+    sensacion = fila.get("Sensación", "").strip()
+    if sensacion and sensacion not in SENSACIONES:
+        return None, f"sensación desconocida '{sensacion}'"
+
+    registro = {"Fecha": fecha.strftime(FORMATO_FECHA), "Tiempo entrenado": tiempo, "Sensación": sensacion}
+    for ejercicio in COLUMNAS_EJERCICIOS:
+        try:
+            registro[ejercicio] = _numero(fila.get(ejercicio, "").strip())
+        except ValueError:
+            return None, f"valor no válido en '{ejercicio}': '{fila[ejercicio]}'"
+    return registro, None
+
+
+def _comprobar_columnas(df):
+    desconocidas = [columna for columna in df.columns if columna not in COLUMNAS]
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas: {', '.join(desconocidas)}")
+    if "Fecha" not in df.columns:
+        raise ValueError("Falta la columna 'Fecha'")
+
+
+# =============================================================================
+# IMPORTACIÓN
+# =============================================================================
+def importar(nombre_atleta, ruta, estricto=False, subir=True):
+    """
+    Importa un archivo de sesiones para un atleta.
+
+    Args:
+        nombre_atleta (str): Nombre del atleta en el registro.
+        ruta (str): Archivo CSV o Parquet.
+        estricto (bool): Si hay alguna fila no válida, no se importa nada.
+        subir (bool): Subir ya a Google Sheets (si no, lo hará el vaciador de la app).
+
+    Returns:
+        dict: Recuento de filas leídas, importadas, ya existentes y no válidas.
+    """
+    atleta = atleta_por_nombre(nombre_atleta)
+    df_actual = inicializar_dataframes([atleta])[atleta["nombre"]]
+    resumen = {"leidas": 0, "importadas": 0, "existentes": 0, "invalidas": 0}
+    errores = []
+
+    def filas_validas():
+        """Recorre el archivo validando cada fila; los errores se acumulan aparte."""
+        numero = 1  # La fila 1 del archivo es la cabecera
+        for bloque in leer_bloques(ruta):
+            _comprobar_columnas(bloque)
+            validos = []
+            for fila in bloque.to_dict("records"):
+                numero += 1
+                registro, motivo = validar_fila(fila)
+                if registro is None:
+                    errores.append(f"fila {numero}: {motivo}")
+                else:
+                    validos.append(registro)
+            yield len(bloque), validos
+
+    if estricto:
+        for _ in filas_validas():
+            pass
+        if errores:
+            return _informar(resumen | {"invalidas": len(errores)}, errores)
+        errores.clear()
+
+    # Se sube al final, en lotes, desde este proceso
+    anterior = diario_escrituras.establecer_vaciado_automatico(False)
+    try:
+        vistas = set()
+        for leidas, validos in filas_validas():
+            resumen["leidas"] += leidas
+            nuevos = []
+            for registro in validos:
+                fecha = datetime.strptime(registro["Fecha"], FORMATO_FECHA)
+                if registro["Fecha"] in vistas or existe_entrenamiento_en_fecha(df_actual, fecha):
+                    resumen["existentes"] += 1
+                    continue
+                vistas.add(registro["Fecha"])
+                nuevos.append(registro)
+            if nuevos:
+                resumen["importadas"] += importar_entrenamientos(nuevos, atleta["hoja"])
+    finally:
+        diario_escrituras.establecer_vaciado_automatico(anterior)
+    resumen["invalidas"] = len(errores)
+
+    if subir:
+        resumen["pendientes"] = diario_escrituras.vaciar_diario()
+    return _informar(resumen, errores)
+
+
+def _informar(resumen, errores):
+    for error in errores[:MAX_ERRORES_MOSTRADOS]:
+        print(error, file=sys.stderr)
+    if len(errores) > MAX_ERRORES_MOSTRADOS:
+        print(f"... y {len(errores) - MAX_ERRORES_MOSTRADOS} errores más", file=sys.stderr)
+    print(", ".join(f"{clave}: {valor}" for clave, valor in resumen.items()), file=sys.stderr)
+    return resumen
+
+
+# =============================================================================
+# EXPORTACIÓN
+# =============================================================================
+def exportar(nombre_atleta, ruta, tamano=TAMANO_BLOQUE):
+    """
+    Escribe el historial completo de un atleta en CSV o Parquet, bloque a bloque.
+
+    Returns:
+        int: Número de sesiones exportadas.
+    """
+    atleta = atleta_por_nombre(nombre_atleta)
+    bloques = obtener_almacenamiento().bloques(atleta["hoja"], tamano)
+    total = 0
+
+    if ruta.lower().endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        esquema = pa.schema([(columna, pa.string()) for columna in COLUMNAS])
+        with pq.ParquetWriter(ruta, esquema) as escritor:
+            for filas in bloques:
+                columnas = list(zip(*filas))
+                escritor.write_table(pa.table(
+                    {columna: list(valores) for columna, valores in zip(COLUMNAS, columnas)}, schema=esquema
+                ))
+                total += len(filas)
+    else:
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(COLUMNAS)
+            for filas in bloques:
+                escritor.writerows(filas)
+                total += len(filas)
+
+    print(f"{total} sesiones exportadas a {ruta}", file=sys.stderr)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    importacion = subcomandos.add_parser("importar", help="Importa sesiones desde un CSV o Parquet")
+    importacion.add_argument("atleta", help="Nombre del atleta en el registro")
+    importacion.add_argument("archivo")
+    importacion.add_argument("--estricto", action="store_true", help="No importar nada si alguna fila no es válida")
+    importacion.add_argument("--sin-subir", action="store_true", help="Dejar la subida a Sheets al vaciador de la app")
+
+    exportacion = subcomandos.add_parser("exportar", help="Exporta el historial a un CSV o Parquet")
+    exportacion.add_argument("atleta", help="Nombre del atleta en el registro")
+    exportacion.add_argument("archivo")
+    exportacion.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Filas por bloque")
+
+    args = parser.parse_args()
+    if args.comando == "importar":
+        resumen = importar(args.atleta, args.archivo, estricto=args.estricto, subir=not args.sin_subir)
+        if args.estricto and resumen["invalidas"]:
+            sys.exit(1)
+    else:
+        exportar(args.atleta, args.archivo, tamano=args.bloque)
+
+
+if __name__ == "__main__":
+    main()
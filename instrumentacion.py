@@ -0,0 +1,210 @@
+import contextvars
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+# =============================================================================
+# INSTRUMENTACIÓN: TRAMOS CRONOMETRADOS Y LLAMADAS A LAS APIS DE GOOGLE
+# =============================================================================
+# Está desactivada salvo que se defina CAMBIO_FISICO_DEBUG=1 o que la ejecución
+# actual de la app la active con ?debug=<clave>, donde la clave es la de
+# CAMBIO_FISICO_CLAVE_DEBUG (sin ella, el parámetro no hace nada). Desactivada,
+# `tramo()` devuelve siempre el mismo contexto vacío y `contar_llamada()`
+# retorna sin hacer nada.
+ACTIVADA = os.environ.get("CAMBIO_FISICO_DEBUG") == "1"
+CLAVE_DEPURACION = os.environ.get("CAMBIO_FISICO_CLAVE_DEBUG") or None
+
+_logger = logging.getLogger("cambio_fisico.instrumentacion")
+_registro_actual = contextvars.ContextVar("registro_instrumentacion", default=None)
+
+
+class Registro:
+    """Tramos y contadores de una ejecución (un rerun de Streamlit o de un fragmento)."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.cerrado = False  # Ya se mostró: lo que venga después es otra ejecución
+        self.tramos = []
+        self.llamadas = Counter()
+        self.bytes = Counter()
+        self._candado = threading.Lock()
+
+    def anadir_tramo(self, nombre, duracion, atributos):
+        with self._candado:
+            self.tramos.append({"tramo": nombre, "ms": duracion * 1000, **atributos})
+
+    def anadir_llamada(self, servicio, operacion, bytes_):
+        with self._candado:
+            self.llamadas[f"{servicio}.{operacion}"] += 1
+            self.bytes[servicio] += bytes_
+
+
+class _TramoNulo:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _TramoNulo()
+
+
+class _Tramo:
+    def __init__(self, nombre, registro, atributos):
+        self.nombre = nombre
+        self.registro = registro
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, *exc):
+        duracion = time.perf_counter() - self.inicio
+        if tipo is not None:
+            self.atributos["error"] = tipo.__name__
+        if self.registro is not None:
+            self.registro.anadir_tramo(self.nombre, duracion, self.atributos)
+        _emitir({"evento": "tramo", "tramo": self.nombre, "ms": round(duracion * 1000, 3), **self.atributos})
+        return False
+
+
+def _configurar_log():
+    """Envía los eventos a la salida de errores, una línea JSON por evento."""
+    if not _logger.handlers:
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(manejador)
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+
+
+if ACTIVADA:
+    _configurar_log()
+
+
+def _emitir(datos):
+    """Escribe un evento como una línea de JSON en el log."""
+    _logger.info(json.dumps(datos, ensure_ascii=False, default=str))
+
+
+def activa():
+    """Indica si hay que medir en el contexto actual."""
+    return ACTIVADA or _registro_actual.get() is not None
+
+
+def tramo(nombre, **atributos):
+    """
+    Cronometra un bloque de código.
+
+        with tramo("sheets.batch_get", hoja=nombre_hoja):
+            ...
+    """
+    registro = _registro_actual.get()
+    if registro is None and not ACTIVADA:
+        return _NULO
+    return _Tramo(nombre, registro, atributos)
+
+
+def contar_llamada(servicio, operacion, bytes_=0):
+    """Anota una llamada a una API de Google y los bytes transferidos."""
+    registro = _registro_actual.get()
+    if registro is None and not ACTIVADA:
+        return
+    if registro is not None:
+        registro.anadir_llamada(servicio, operacion, bytes_)
+    _emitir({"evento": "llamada_api", "servicio": servicio, "operacion": operacion, "bytes": bytes_})
+
+
+def tamano_valores(valores):
+    """Tamaño aproximado (bytes de texto) de una respuesta de Sheets en filas."""
+    return sum(len(str(celda)) for fila in valores for celda in fila)
+
+
+def depuracion_permitida(clave):
+    """Indica si `clave` (el parámetro ?debug de la URL) coincide con CLAVE_DEPURACION."""
+    if CLAVE_DEPURACION is None or not clave:
+        return False
+    return hmac.compare_digest(str(clave).encode(), CLAVE_DEPURACION.encode())
+
+
+def iniciar_ejecucion(activar=False):
+    """
+    Empieza a medir una ejecución de la app si la instrumentación está activa.
+
+    Returns:
+        Registro: El registro de la ejecución, o None si no se mide.
+    """
+    if not (ACTIVADA or activar):
+        _registro_actual.set(None)
+        return None
+    _configurar_log()
+    registro = Registro()
+    _registro_actual.set(registro)
+    return registro
+
+
+def iniciar_fragmento(activar=False):
+    """
+    Empieza a medir un fragmento de Streamlit que se re-ejecuta solo.
+
+    Dentro de una ejecución completa el fragmento sigue anotando en el
+    registro de la página (que aún no se ha mostrado) y devuelve None. En un
+    rerun del fragmento solo, empieza un registro nuevo, para no añadir sus
+    tramos a la última ejecución completa.
+
+    Returns:
+        Registro: El registro propio del fragmento, o None.
+    """
+    actual = _registro_actual.get()
+    if actual is not None and not actual.cerrado:
+        return None
+    return iniciar_ejecucion(activar)
+
+
+def en_contexto(funcion, *args):
+    """
+    Prepara una llamada para otro hilo conservando el registro actual.
+
+    Se usa con grupos de hilos: `grupo.submit(*en_contexto(cargar_hoja, hoja))`.
+    """
+    return (contextvars.copy_context().run, funcion, *args)
+
+
+def resumen(registro):
+    """Resumen de un registro: tramos, llamadas, bytes y tiempo total."""
+    with registro._candado:
+        return {
+            "total_ms": (time.perf_counter() - registro.inicio) * 1000,
+            "tramos": list(registro.tramos),
+            "llamadas": dict(registro.llamadas),
+            "bytes": dict(registro.bytes),
+        }
+
+
+def mostrar_panel_depuracion(registro, barra_lateral=True):
+    """
+    Muestra los tiempos y llamadas de la ejecución actual y cierra su registro.
+
+    Los fragmentos no pueden escribir en la barra lateral: con
+    `barra_lateral=False` el panel se pinta dentro del fragmento.
+    """
+    if registro is None:
+        return
+    import streamlit as st
+
+    registro.cerrado = True
+    datos = resumen(registro)
+    _emitir({"evento": "ejecucion", **{k: v for k, v in datos.items() if k != "tramos"}})
+    with (st.sidebar if barra_lateral else st.container()).expander("🔧 Depuración", expanded=False):
+        st.metric("Tiempo total", f"{datos['total_ms']:.0f} ms")
+        st.write("**Llamadas a Google**", datos["llamadas"] or "ninguna")
+        st.write("**Bytes transferidos**", datos["bytes"] or "ninguno")
+        from planificador_google import metricas  # Diferido: el planificador importa este módulo
+        st.write("**Planificador (acumulado del proceso)**", metricas() or "sin llamadas")
+        st.dataframe(datos["tramos"], width="stretch")
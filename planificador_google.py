@@ -0,0 +1,255 @@
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from instrumentacion import tramo, contar_llamada, activa
+
+# =============================================================================
+# PLANIFICADOR DE LLAMADAS A LAS APIS DE GOOGLE
+# =============================================================================
+# Todas las llamadas a Sheets y Drive pasan por `ejecutar()`, que:
+#   - reparte la cuota con un cubo de fichas por tipo de llamada, de modo que
+#     ninguna ventana de un minuto supere el límite, aunque haya muchas
+#     sesiones de la app a la vez;
+#   - reintenta con espera exponencial (y aleatoria) los errores transitorios:
+#     429, 5xx y fallos de red, respetando Retry-After si Google lo envía;
+#   - agrupa las lecturas idénticas simultáneas en una sola petición: la
+#     primera sesión la lanza y las demás esperan y reciben su resultado.
+# Las escrituras no se reintentan aquí: el diario ya las reintenta sin duplicar
+# filas (una escritura fallida puede haberse aplicado igualmente).
+LIMITES = {  # Peticiones por minuto de cada cuota (None = sin límite)
+    "sheets.lectura": 60,
+    "sheets.escritura": 60,
+    "drive": 600,
+}
+RAFAGA = 10  # Peticiones que se pueden lanzar seguidas antes de empezar a espaciarlas
+MAX_REINTENTOS = 5
+ESPERA_BASE = 1.0  # Segundos antes del primer reintento; se duplica en cada uno
+ESPERA_MAXIMA = 32.0
+MAX_ERRORES_GUARDADOS = 50
+
+_candado = threading.Lock()
+_cubos = {}
+_en_vuelo = {}  # clave de lectura -> _Vuelo
+_metricas = Counter()
+_errores = deque(maxlen=MAX_ERRORES_GUARDADOS)
+
+
+class CuboFichas:
+    """
+    Limitador de ritmo: admite `capacidad` peticiones seguidas y repone
+    `por_segundo` fichas cada segundo.
+    """
+
+    def __init__(self, capacidad, por_segundo):
+        self.capacidad = capacidad
+        self.por_segundo = por_segundo
+        self._fichas = float(capacidad)
+        self._instante = time.monotonic()
+        self._candado = threading.Lock()
+
+    def tomar(self):
+        """Toma una ficha, esperando a que haya una. Devuelve los segundos esperados."""
+        esperado = 0.0
+        while True:
+            with self._candado:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._instante) * self.por_segundo)
+                self._instante = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return esperado
+                espera = (1 - self._fichas) / self.por_segundo
+            time.sleep(espera)
+            esperado += espera
+
+
+class _Vuelo:
+    """Lectura en curso que comparten todas las sesiones que la piden a la vez."""
+
+    def __init__(self):
+        self.terminado = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+def _cubo(cuota):
+    """Cubo de fichas de una cuota, o None si no tiene límite."""
+    with _candado:
+        if cuota not in _cubos:
+            por_minuto = LIMITES.get(cuota)
+            if por_minuto is None:
+                _cubos[cuota] = None
+            else:
+                # La ráfaga sale de lo que se repone, así ningún minuto pasa de `por_minuto`
+                rafaga = min(RAFAGA, por_minuto)
+                _cubos[cuota] = CuboFichas(rafaga, max(por_minuto - rafaga, 1) / 60)
+        return _cubos[cuota]
+
+
+def _contar(cuota, metrica, cantidad=1):
+    with _candado:
+        _metricas[cuota, metrica] += cantidad
+
+
+# =============================================================================
+# ERRORES TRANSITORIOS
+# =============================================================================
+def codigo_http(error):
+    """Código HTTP de un error de gspread o de googleapiclient, o None si no lo tiene."""
+    respuesta = getattr(error, "response", None)  # gspread.exceptions.APIError
+    if respuesta is not None and getattr(respuesta, "status_code", None) is not None:
+        return int(respuesta.status_code)
+    respuesta = getattr(error, "resp", None)  # googleapiclient.errors.HttpError
+    if respuesta is not None and getattr(respuesta, "status", None) is not None:
+        return int(respuesta.status)
+    return None
+
+
+def es_transitorio(error):
+    """Indica si merece la pena reintentar: cuota agotada (429), error del servidor o de red."""
+    codigo = codigo_http(error)
+    if codigo is not None:
+        return codigo == 429 or codigo >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    requests = sys.modules.get("requests")  # Solo si gspread ya lo cargó
+    return requests is not None and isinstance(
+        error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+    )
+
+
+def _espera_reintento(error, intento):
+    """Segundos hasta el siguiente intento: exponencial con variación aleatoria o Retry-After."""
+    espera = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento) * random.uniform(0.5, 1.0)
+    cabeceras = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        espera = max(espera, float(cabeceras.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        pass
+    return min(espera, ESPERA_MAXIMA)
+
+
+# =============================================================================
+# EJECUCIÓN
+# =============================================================================
+def _llamar(cuota, operacion, funcion, reintentar, tamano):
+    """Lanza la llamada respetando la cuota y reintentando los errores transitorios."""
+    servicio = cuota.split(".")[0]
+    cubo = _cubo(cuota)
+    intento = 0
+    while True:
+        if cubo is not None:
+            with tramo("planificador.espera_cuota", cuota=cuota):
+                esperado = cubo.tomar()
+            if esperado:
+                _contar(cuota, "esperas_cuota")
+                _contar(cuota, "segundos_espera", esperado)
+        _contar(cuota, "llamadas")
+        try:
+            resultado = funcion()
+        except Exception as e:
+            if not reintentar or intento >= MAX_REINTENTOS or not es_transitorio(e):
+                _contar(cuota, "fallos")
+                with _candado:
+                    _errores.append({
+                        "instante": time.time(), "cuota": cuota, "operacion": operacion,
+                        "codigo": codigo_http(e), "error": str(e) or type(e).__name__,
+                    })
+                raise
+            espera = _espera_reintento(e, intento)
+            _contar(cuota, "reintentos")
+            with tramo("planificador.reintento", cuota=cuota, operacion=operacion, codigo=codigo_http(e)):
+                time.sleep(espera)
+            intento += 1
+            continue
+        contar_llamada(servicio, operacion, tamano(resultado) if tamano is not None and activa() else 0)
+        return resultado
+
+
+def ejecutar(cuota, operacion, funcion, clave=None, reintentar=True, tamano=None):
+    """
+    Ejecuta una llamada a Google a través del planificador.
+
+        valores = ejecutar("sheets.lectura", "get_all_values", hoja.get_all_values,
+                           clave=("get_all_values", nombre_hoja))
+
+    Args:
+        cuota (str): Cuota que consume ("sheets.lectura", "sheets.escritura", "drive").
+        operacion (str): Nombre de la operación, para métricas e instrumentación.
+        funcion (callable): Llamada sin argumentos que hace la petición.
+        clave (hashable, optional): Identifica la lectura; las llamadas simultáneas
+            con la misma clave comparten una sola petición (y su resultado, que
+            no se debe modificar). Sin clave no se agrupa.
+        reintentar (bool): Reintentar los errores transitorios (no en escrituras).
+        tamano (callable, optional): Bytes de la respuesta, para la instrumentación.
+
+    Returns:
+        Lo que devuelva `funcion`. Si falla tras los reintentos, se relanza el error.
+    """
+    if clave is None:
+        return _llamar(cuota, operacion, funcion, reintentar, tamano)
+
+    clave = (cuota, operacion, clave)
+    with _candado:
+        vuelo = _en_vuelo.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _en_vuelo[clave] = _Vuelo()
+        else:
+            _metricas[cuota, "agrupadas"] += 1
+
+    if not lider:
+        with tramo("planificador.espera_agrupada", cuota=cuota, operacion=operacion):
+            vuelo.terminado.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.resultado
+
+    try:
+        vuelo.resultado = _llamar(cuota, operacion, funcion, reintentar, tamano)
+        return vuelo.resultado
+    except Exception as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _candado:
+            del _en_vuelo[clave]
+        vuelo.terminado.set()
+
+
+# =============================================================================
+# MÉTRICAS Y ERRORES
+# =============================================================================
+def metricas():
+    """
+    Contadores acumulados del proceso, por cuota: llamadas, reintentos, fallos,
+    esperas por cuota (y segundos esperados) y lecturas agrupadas.
+    """
+    with _candado:
+        resultado = {}
+        for (cuota, metrica), valor in _metricas.items():
+            resultado.setdefault(cuota, {})[metrica] = valor
+        return resultado
+
+
+def errores_desde(instante):
+    """Llamadas que fallaron definitivamente después de `instante` (segundos de época)."""
+    with _candado:
+        return [error for error in _errores if error["instante"] >= instante]
+
+
+def establecer_limites(limites):
+    """Cambia los límites por minuto de las cuotas dadas (None = sin límite)."""
+    with _candado:
+        LIMITES.update(limites)
+        for cuota in limites:
+            _cubos.pop(cuota, None)
+
+
+def reiniciar_metricas():
+    """Pone a cero las métricas y olvida los errores guardados."""
+    with _candado:
+        _metricas.clear()
+        _errores.clear()
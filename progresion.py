@@ -0,0 +1,368 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import stats_analysis
+from almacenamiento import obtener_almacenamiento
+from base_local import conectar, candado
+from esquema import FORMATO_FECHA
+from instrumentacion import tramo
+
+# =============================================================================
+# ANALÍTICA DE PROGRESIÓN
+# =============================================================================
+# Todo se calcula sobre la matriz (sesiones x COLUMNAS_EJERCICIOS) de una vez,
+# sin bucles por ejercicio. Un valor 0 o vacío significa que el ejercicio no se
+# hizo en esa sesión. Con repeticiones conocidas (`detalle_series` del
+# almacenamiento o campo "Series" del registro) la carga se convierte en 1RM
+# estimado; si no, la carga es el 1RM. Índice, resumen y sesiones nuevas toman
+# las repeticiones de la misma fuente, así que los récords no cambian al
+# reconstruir el índice.
+VENTANA_VOLUMEN = "28D"  # Ventana móvil del volumen
+VENTANA_TENDENCIA = 90  # Días de historial que entran en la pendiente
+MIN_SESIONES_TENDENCIA = 3  # Sesiones mínimas de un ejercicio para darle pendiente
+HORIZONTE_PROYECCION = 520  # Semanas; más allá, el máximo se da por inalcanzable al ritmo actual
+UNIDADES = {"plancha": "s"}  # Unidad de los ejercicios que no se miden en kg
+
+
+def _columnas():
+    from data_management import COLUMNAS_EJERCICIOS  # Diferido: data_management importa Google
+    return COLUMNAS_EJERCICIOS
+
+
+def unidad(ejercicio):
+    """Unidad en la que se registra un ejercicio ("kg" salvo los de UNIDADES)."""
+    return UNIDADES.get(ejercicio, "kg")
+
+
+def e1rm(carga, repeticiones=None):
+    """
+    1RM estimado con la fórmula de Epley: carga * (1 + repeticiones / 30).
+
+    Con una repetición, o si no se conocen las repeticiones, el 1RM es la carga.
+    Admite escalares o arrays (con NaN donde no hay repeticiones).
+    """
+    carga = np.asarray(carga, dtype=float)
+    if repeticiones is None:
+        return carga
+    repeticiones = np.asarray(repeticiones, dtype=float)
+    return np.where(repeticiones > 1, carga * (1 + repeticiones / 30), carga)
+
+
+def _matriz(df, repeticiones=None):
+    """Fechas y matriz float de 1RM estimados (NaN donde no se hizo el ejercicio)."""
+    ejercicios = _columnas()
+    valores = df.reindex(columns=ejercicios).to_numpy(dtype=float)
+    if repeticiones is not None:
+        valores = e1rm(valores, repeticiones.reindex(index=df.index, columns=ejercicios).to_numpy(dtype=float))
+    valores[~(valores > 0)] = np.nan
+    return df["Fecha"].to_numpy(dtype="datetime64[ns]"), valores, ejercicios
+
+
+def detectar_records(df, repeticiones=None):
+    """
+    Sesiones en las que se batió el récord (1RM estimado) de algún ejercicio.
+
+    La primera vez que se hace un ejercicio cuenta como récord (sin anterior).
+
+    Args:
+        df (pd.DataFrame): DataFrame tipado de un atleta.
+        repeticiones (pd.DataFrame, optional): Repeticiones con la forma de `df`.
+
+    Returns:
+        pd.DataFrame: Columnas fecha, ejercicio, valor y anterior, por fecha.
+    """
+    fechas, valores, ejercicios = _matriz(df, repeticiones)
+    acumulado = np.maximum.accumulate(np.where(np.isnan(valores), -np.inf, valores), axis=0)
+    anterior = np.full_like(acumulado, -np.inf)
+    anterior[1:] = acumulado[:-1]
+    filas, columnas = np.nonzero(valores > anterior)  # NaN nunca es récord
+    return pd.DataFrame({
+        "fecha": fechas[filas],
+        "ejercicio": pd.Categorical.from_codes(columnas, categories=ejercicios),
+        "valor": valores[filas, columnas],
+        "anterior": np.where(np.isinf(anterior[filas, columnas]), np.nan, anterior[filas, columnas]),
+    })
+
+
+def volumen_movil(df, ventana=VENTANA_VOLUMEN, series=None, repeticiones=None):
+    """
+    Volumen de cada ejercicio sumado en una ventana móvil de tiempo.
+
+    El volumen de una sesión es carga x series x repeticiones; lo que no se
+    conozca cuenta como 1 (sin ellas, es la carga total movida en la ventana).
+
+    Returns:
+        pd.DataFrame: Una fila por sesión (índice de fechas), una columna por ejercicio.
+    """
+    ejercicios = _columnas()
+    volumen = df.reindex(columns=ejercicios).astype("float64")
+    for factor in (series, repeticiones):
+        if factor is not None:
+            volumen = volumen * factor.reindex(index=df.index, columns=ejercicios).astype("float64").fillna(1)
+    return volumen.fillna(0).rolling(ventana).sum()
+
+
+def pendientes(df, dias=VENTANA_TENDENCIA, repeticiones=None):
+    """
+    Pendiente (unidad del ejercicio por semana) de cada ejercicio en los últimos `dias` días.
+
+    Es la recta de mínimos cuadrados de cada columna, calculada para todas a la
+    vez con máscaras; los ejercicios con menos de MIN_SESIONES_TENDENCIA
+    sesiones en la ventana quedan en NaN.
+
+    Returns:
+        pd.Series: Pendiente por ejercicio.
+    """
+    if len(df):
+        df = df.loc[df.index[-1] - pd.Timedelta(days=dias):]
+    fechas, valores, ejercicios = _matriz(df, repeticiones)
+    semanas = (fechas - fechas[:1]) / np.timedelta64(7, "D") if len(fechas) else np.zeros(0)
+
+    presentes = ~np.isnan(valores)
+    n = presentes.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media_t = np.where(presentes, semanas[:, None], 0.0).sum(axis=0) / n
+        media_v = np.where(presentes, valores, 0.0).sum(axis=0) / n
+        dt = np.where(presentes, semanas[:, None] - media_t, 0.0)
+        dv = np.where(presentes, valores - media_v, 0.0)
+        varianza = (dt * dt).sum(axis=0)
+        pendiente = np.where(
+            (n >= MIN_SESIONES_TENDENCIA) & (varianza > 0), (dt * dv).sum(axis=0) / varianza, np.nan
+        )
+    return pd.Series(pendiente, index=ejercicios, name="tendencia")
+
+
+def proyeccion_maximos(ultimos, pendiente, genero, desde):
+    """
+    Semanas que faltan para llegar al máximo (MAXIMOS) de cada ejercicio puntuado.
+
+    MAXIMOS son cargas en crudo, así que el último valor y la pendiente deben
+    serlo también (no 1RM estimados).
+
+    Args:
+        ultimos (pd.Series): Última carga de cada ejercicio.
+        pendiente (pd.Series): Pendiente (por semana) de la carga de cada ejercicio.
+        genero (str): Clave de MAXIMOS.
+        desde (pd.Timestamp): Fecha desde la que se proyecta (la última sesión).
+
+    Returns:
+        pd.DataFrame: maximo, semanas (0 si ya se alcanzó, NaN si no se progresa
+        o se tardaría más de HORIZONTE_PROYECCION) y fecha estimada, por ejercicio puntuado.
+    """
+    ejercicios = stats_analysis.EJERCICIOS_PUNTUADOS
+    maximos = stats_analysis.maximos_vector(genero)
+    actual = ultimos.reindex(ejercicios).to_numpy(dtype=float)
+    ritmo = pendiente.reindex(ejercicios).to_numpy(dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        semanas = np.where(actual >= maximos, 0.0, np.where(ritmo > 0, (maximos - actual) / ritmo, np.nan))
+    semanas[semanas > HORIZONTE_PROYECCION] = np.nan
+    return pd.DataFrame({
+        "maximo": maximos,
+        "semanas": semanas,
+        "fecha": pd.Timestamp(desde) + pd.to_timedelta(np.ceil(semanas * 7), unit="D"),
+    }, index=ejercicios)
+
+
+# =============================================================================
+# ÍNDICE DE RÉCORDS
+# =============================================================================
+# Para cada atleta y ejercicio guarda el récord (1RM estimado) con su fecha y
+# el último valor. Una sesión nueva solo compara sus ejercicios con el índice,
+# así que registrarla cuesta lo mismo con diez sesiones que con diez mil. Se
+# reconstruye cuando deja de cuadrar con los datos (número de sesiones o
+# última fecha), como el historial de puntuaciones, y vive en la misma base
+# local compartida (ver `base_local`).
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    hoja TEXT NOT NULL,
+    ejercicio TEXT NOT NULL,
+    valor REAL NOT NULL,
+    fecha TEXT NOT NULL,
+    ultimo REAL NOT NULL,
+    fecha_ultimo TEXT NOT NULL,
+    PRIMARY KEY (hoja, ejercicio)
+);
+CREATE TABLE IF NOT EXISTS meta_records (
+    hoja TEXT PRIMARY KEY,
+    sesiones INTEGER NOT NULL,
+    ultima_fecha TEXT
+);
+"""
+
+
+def _conectar():
+    """Abre la base local, creando las tablas del índice de récords si no existen."""
+    return conectar(_ESQUEMA)
+
+
+def reconstruir_indice(nombre_hoja, df, repeticiones=None):
+    """Rehace el índice de récords de un atleta a partir de su DataFrame tipado."""
+    fechas, valores, ejercicios = _matriz(df, repeticiones)
+    dia = lambda fila: pd.Timestamp(fechas[fila]).strftime("%Y-%m-%d")
+    filas = []
+    ultima_fecha = None
+    if len(valores):
+        presentes = ~np.isnan(valores)
+        mejor = np.where(presentes, valores, -np.inf).argmax(axis=0)  # Primera sesión con el récord
+        ultima = len(valores) - 1 - presentes[::-1].argmax(axis=0)
+        filas = [
+            (nombre_hoja, ejercicios[j], float(valores[mejor[j], j]), dia(mejor[j]),
+             float(valores[ultima[j], j]), dia(ultima[j]))
+            for j in np.flatnonzero(presentes.any(axis=0))
+        ]
+        ultima_fecha = dia(-1)
+
+    with candado, _conectar() as conexion:
+        conexion.execute("DELETE FROM records WHERE hoja = ?", (nombre_hoja,))
+        conexion.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)", filas)
+        conexion.execute("INSERT OR REPLACE INTO meta_records VALUES (?, ?, ?)", (nombre_hoja, len(fechas), ultima_fecha))
+    conexion.close()
+
+
+def _valores_registro(registro):
+    """1RM estimado de cada ejercicio hecho en un registro del formulario."""
+    detalle = registro.get("Series") or {}
+    valores = {}
+    for ejercicio in _columnas():
+        carga = pd.to_numeric(registro.get(ejercicio), errors="coerce")
+        if pd.isna(carga) or carga <= 0:
+            continue
+        valores[ejercicio] = float(e1rm(carga, (detalle.get(ejercicio) or {}).get("repeticiones")))
+    return valores
+
+
+def nuevos_records(nombre_hoja, registro):
+    """
+    Ejercicios del registro que baten el récord guardado, sin modificar el índice.
+
+    Returns:
+        list: Diccionarios {ejercicio, valor, anterior} (anterior es None si es el primero).
+    """
+    conexion = _conectar()
+    try:
+        if conexion.execute("SELECT 1 FROM meta_records WHERE hoja = ?", (nombre_hoja,)).fetchone() is None:
+            return []  # Índice sin construir: no se sabe
+        guardados = dict(conexion.execute("SELECT ejercicio, valor FROM records WHERE hoja = ?", (nombre_hoja,)))
+    finally:
+        conexion.close()
+    return [
+        {"ejercicio": ejercicio, "valor": valor, "anterior": guardados.get(ejercicio)}
+        for ejercicio, valor in _valores_registro(registro).items()
+        if valor > guardados.get(ejercicio, 0.0)
+    ]
+
+
+def registrar_sesion(nombre_hoja, registro):
+    """
+    Actualiza el índice con una sesión nueva, comparando solo sus ejercicios.
+
+    Si el índice de la hoja aún no existe, no se toca: se construirá entero la
+    próxima vez que se consulte.
+
+    Returns:
+        bool: True si se actualizó.
+    """
+    fecha = datetime.strptime(registro["Fecha"], FORMATO_FECHA).strftime("%Y-%m-%d")
+    valores = _valores_registro(registro)
+
+    with candado, _conectar() as conexion:
+        meta = conexion.execute(
+            "SELECT ultima_fecha FROM meta_records WHERE hoja = ?", (nombre_hoja,)
+        ).fetchone()
+        if meta is None:
+            actualizado = False
+        else:
+            guardados = {
+                ejercicio: (valor, fecha_ultimo) for ejercicio, valor, fecha_ultimo in conexion.execute(
+                    "SELECT ejercicio, valor, fecha_ultimo FROM records WHERE hoja = ?", (nombre_hoja,)
+                )
+            }
+            for ejercicio, valor in valores.items():
+                record, fecha_ultimo = guardados.get(ejercicio, (None, None))
+                if record is None:
+                    conexion.execute(
+                        "INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)", (nombre_hoja, ejercicio, valor, fecha, valor, fecha)
+                    )
+                    continue
+                if valor > record:
+                    conexion.execute(
+                        "UPDATE records SET valor = ?, fecha = ? WHERE hoja = ? AND ejercicio = ?",
+                        (valor, fecha, nombre_hoja, ejercicio)
+                    )
+                if fecha >= fecha_ultimo:  # Una sesión atrasada no cambia el último valor
+                    conexion.execute(
+                        "UPDATE records SET ultimo = ?, fecha_ultimo = ? WHERE hoja = ? AND ejercicio = ?",
+                        (valor, fecha, nombre_hoja, ejercicio)
+                    )
+            conexion.execute(
+                "UPDATE meta_records SET sesiones = sesiones + 1, ultima_fecha = MAX(COALESCE(ultima_fecha, ''), ?) "
+                "WHERE hoja = ?", (fecha, nombre_hoja)
+            )
+            actualizado = True
+    conexion.close()
+    return actualizado
+
+
+def obtener_indice(nombre_hoja, df):
+    """
+    Devuelve el índice de récords de un atleta (reconstruyéndolo si no cuadra con `df`).
+
+    Al reconstruirlo usa las repeticiones guardadas, como `registrar_sesion` con
+    las del registro.
+
+    Returns:
+        pd.DataFrame: record, fecha_record, ultimo y fecha_ultimo, por ejercicio.
+    """
+    ultima_fecha = pd.Timestamp(df.index[-1]).strftime("%Y-%m-%d") if len(df) else None
+    conexion = _conectar()
+    try:
+        meta = conexion.execute(
+            "SELECT sesiones, ultima_fecha FROM meta_records WHERE hoja = ?", (nombre_hoja,)
+        ).fetchone()
+    finally:
+        conexion.close()
+    if meta != (len(df), ultima_fecha):
+        with tramo("progresion.reconstruir_indice", hoja=nombre_hoja, sesiones=len(df)):
+            reconstruir_indice(nombre_hoja, df, obtener_almacenamiento().detalle_series(nombre_hoja)[1])
+
+    conexion = _conectar()
+    try:
+        indice = pd.read_sql_query(
+            "SELECT ejercicio, valor AS record, fecha AS fecha_record, ultimo, fecha_ultimo "
+            "FROM records WHERE hoja = ?", conexion, params=(nombre_hoja,), index_col="ejercicio",
+            parse_dates=["fecha_record", "fecha_ultimo"]
+        )
+    finally:
+        conexion.close()
+    return indice.reindex([ejercicio for ejercicio in _columnas() if ejercicio in indice.index])
+
+
+def resumen_progresion(nombre_hoja, df, genero):
+    """
+    Tabla de progresión de un atleta: unidad, récord, último valor, pendiente,
+    volumen reciente y semanas hasta el máximo de cada ejercicio que ha hecho.
+
+    Récords y últimos valores salen del índice; pendiente y volumen solo miran
+    las últimas semanas, así que el coste no crece con la longitud del historial.
+    Récord, último valor y pendiente son de 1RM estimado; la proyección al
+    máximo usa la carga en crudo, como MAXIMOS.
+    """
+    with tramo("progresion.resumen", hoja=nombre_hoja):
+        indice = obtener_indice(nombre_hoja, df)
+        if indice.empty:
+            return indice
+        desde = df.index[-1] - pd.Timedelta(days=max(VENTANA_TENDENCIA, pd.Timedelta(VENTANA_VOLUMEN).days))
+        reciente = df.loc[desde:]
+        series, repeticiones = obtener_almacenamiento().detalle_series(nombre_hoja, desde)
+        indice.insert(0, "unidad", [unidad(ejercicio) for ejercicio in indice.index])
+        tendencia = pendientes(reciente, repeticiones=repeticiones)
+        indice["tendencia"] = tendencia.reindex(indice.index)
+        indice["volumen"] = volumen_movil(reciente, series=series, repeticiones=repeticiones).iloc[-1].reindex(indice.index)
+        cargas = pd.Series(
+            stats_analysis.ultimos_valores(df).astype(float), index=stats_analysis.EJERCICIOS_PUNTUADOS
+        )
+        tendencia_cargas = tendencia if repeticiones is None else pendientes(reciente)
+        proyeccion = proyeccion_maximos(cargas, tendencia_cargas, genero, df.index[-1])
+        indice["semanas_a_maximo"] = proyeccion["semanas"].reindex(indice.index)
+        indice["fecha_maximo"] = proyeccion["fecha"].reindex(indice.index)
+        return indice
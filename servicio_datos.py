@@ -0,0 +1,386 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+import pandas as pd
+import fotos
+from almacenamiento import obtener_almacenamiento
+from atletas import obtener_atletas
+from data_management import guardar_entrenamiento, COLUMNAS_EJERCICIOS
+from diario_escrituras import estado_escritura
+from esquema import anadir_registro, existe_fecha, FORMATO_FECHA
+from instrumentacion import tramo
+from stats_analysis import ultimos_valores
+
+# =============================================================================
+# SERVICIO DE DATOS COMPARTIDO (SIRVE LO ÚLTIMO BUENO Y REFRESCA DETRÁS)
+# =============================================================================
+# Los DataFrames de los atletas y las fotos se sirven desde una instantánea en
+# memoria compartida por todas las sesiones, sin esperar a Google. Un hilo en
+# segundo plano los refresca cada INTERVALO_REFRESCO segundos. Si Google no
+# responde, se sigue sirviendo la instantánea y se anota el error para que la
+# app muestre la antigüedad.
+#
+# Las sesiones nuevas se aplican a la instantánea en cuanto se guardan en
+# local (escritura optimista), sin recargar nada. El hilo de refresco consulta
+# después en el diario si Google Sheets las aceptó: hasta entonces, los
+# refrescos las conservan aunque la hoja aún no las tenga. Si Google rechaza
+# una y Sheets es el único almacenamiento, se quita de la instantánea; con la
+# base local como copia principal se conserva y solo se avisa.
+#
+# Cada hoja lleva una versión que sube con cada cambio de su instantánea
+# (sesión registrada, sesión deshecha o refresco). Un refresco anota la versión
+# antes de cargar y descarta su resultado si cambió mientras tanto, para no
+# pisar datos más nuevos con una carga que empezó antes.
+INTERVALO_REFRESCO = float(os.environ.get("CAMBIO_FISICO_INTERVALO_REFRESCO", "300"))  # Segundos
+INTERVALO_CONFIRMACION = 5  # Segundos entre consultas al diario mientras haya sesiones sin confirmar
+INTERVALO_LOTE_FOTOS = 10  # Segundos entre lotes de la ingesta de fotos mientras queden por procesar
+MAX_RECHAZOS_GUARDADOS = 50
+
+_candado = threading.Lock()
+_candado_carga = threading.Lock()  # Las primeras visitas esperan a una sola carga
+_candado_escritura = threading.Lock()  # Un registro a la vez, para comprobar bien las fechas repetidas
+_evento = threading.Event()
+_hilo = None
+_datos = {}  # hoja -> {"df", "instante" (último refresco bueno o None), "error", "ultimos" (o None), "version"}
+_fotos = {}  # carpeta -> {"instante", "error"}
+_ultimos_formulario = {}  # hoja -> (versión, último valor de cada ejercicio)
+_pendientes = set()  # Hojas que hay que refrescar cuanto antes
+_sin_confirmar = {}  # (hoja, Fecha) -> registro aplicado que Google aún no ha confirmado
+_rechazadas = deque(maxlen=MAX_RECHAZOS_GUARDADOS)
+
+
+def dataframes(atletas):
+    """
+    Devuelve el DataFrame de cada atleta (por nombre) desde la instantánea compartida.
+
+    Las hojas que aún no están en memoria se leen de la instantánea local del
+    motor (sin Google) y se piden al hilo de refresco; solo si tampoco hay
+    instantánea local se cargan en el momento.
+    """
+    faltan = [atleta["hoja"] for atleta in atletas if atleta["hoja"] not in _datos]
+    if faltan:
+        with _candado_carga:
+            faltan = [hoja for hoja in faltan if hoja not in _datos]
+            if faltan:
+                _cargar_inicial(faltan)
+    with _candado:
+        return {atleta["nombre"]: _datos[atleta["hoja"]]["df"] for atleta in atletas}
+
+
+def _cargar_inicial(hojas):
+    with tramo("servicio_datos.carga_inicial", hojas=len(hojas)):
+        almacenamiento = obtener_almacenamiento()
+        dfs = dict(zip(hojas, almacenamiento.instantanea(hojas)))
+        sin_instantanea = [hoja for hoja, df in dfs.items() if df is None]
+        if sin_instantanea:
+            dfs.update(zip(sin_instantanea, almacenamiento.cargar(sin_instantanea)))
+    with _candado:
+        for hoja, df in dfs.items():
+            _datos[hoja] = {"df": df, "instante": None, "error": None, "ultimos": None, "version": 0}
+        _pendientes.update(hojas)  # Confirmar cuanto antes contra Google
+    _evento.set()
+
+
+def ultimos(atletas):
+    """
+    Últimos valores de los ejercicios puntuados de cada atleta (por nombre).
+
+    Se calculan una vez por instantánea y cada sesión registrada los actualiza
+    solo con su fila, así que las puntuaciones no recorren el historial.
+    """
+    dataframes(atletas)
+    resultado = {}
+    for atleta in atletas:
+        hoja = atleta["hoja"]
+        with _candado:
+            df, valores = _datos[hoja]["df"], _datos[hoja]["ultimos"]
+        if valores is None:
+            valores = ultimos_valores(df)
+            with _candado:
+                if _datos[hoja]["df"] is df:
+                    _datos[hoja]["ultimos"] = valores
+        resultado[atleta["nombre"]] = valores
+    return resultado
+
+
+def ultimos_ejercicios(atleta):
+    """
+    Último valor registrado de cada ejercicio de un atleta (las ayudas del formulario).
+
+    Sale de la instantánea y se calcula una vez por versión de la hoja, así
+    que pintar el formulario no consulta el almacenamiento.
+
+    Returns:
+        dict: Ejercicio -> último valor, solo de los ejercicios con algún registro.
+    """
+    hoja = atleta["hoja"]
+    dataframes([atleta])
+    with _candado:
+        df, version = _datos[hoja]["df"], _datos[hoja]["version"]
+        guardados = _ultimos_formulario.get(hoja)
+    if guardados is not None and guardados[0] == version:
+        return guardados[1]
+    ultimos = df[COLUMNAS_EJERCICIOS].ffill().iloc[-1] if len(df) else pd.Series(dtype=float)
+    valores = {ejercicio: float(valor) for ejercicio, valor in ultimos.dropna().items()}
+    with _candado:
+        _ultimos_formulario[hoja] = (version, valores)
+    return valores
+
+
+# =============================================================================
+# ESCRITURA OPTIMISTA
+# =============================================================================
+def registrar_sesion(atleta, registro):
+    """
+    Guarda una sesión y la aplica enseguida a la instantánea compartida.
+
+    La sesión queda guardada en local (y anotada en el diario) antes de
+    volver; la subida a Google Sheets la confirma después el hilo de refresco.
+    Si Google la rechaza se avisa con `rechazadas_desde` y, cuando Sheets es
+    el único almacenamiento, se quita de la instantánea.
+
+    Returns:
+        pd.DataFrame: DataFrame del atleta con la sesión, o None si ya había
+        una ese día o no se pudo guardar.
+    """
+    hoja = atleta["hoja"]
+    fecha = datetime.strptime(registro["Fecha"], FORMATO_FECHA)
+    dataframes([atleta])
+    with _candado_escritura, tramo("servicio_datos.registrar", hoja=hoja):
+        with _candado:
+            df = _datos[hoja]["df"]
+        if existe_fecha(df, fecha):
+            return None
+        nuevo = guardar_entrenamiento(df, registro, hoja)
+        if nuevo is df:
+            return None  # Fecha ya guardada o error al guardar
+
+        with _candado:
+            entrada = _datos[hoja]
+            if entrada["df"] is not df:  # Un refresco lo cambió mientras se guardaba
+                df = entrada["df"]
+                nuevo = df if existe_fecha(df, fecha) else anadir_registro(df, registro, COLUMNAS_EJERCICIOS)
+            valores = entrada["ultimos"]
+            if valores is not None:
+                # Solo si la sesión va al final; una atrasada obliga a recalcularlos
+                valores = None if len(df) and fecha < df.index[-1] else ultimos_valores(nuevo.iloc[-1:], valores)
+            _datos[hoja] = {**entrada, "df": nuevo, "ultimos": valores, "version": entrada["version"] + 1}
+            _sin_confirmar[hoja, registro["Fecha"]] = registro
+    _evento.set()  # Empezar a vigilar la confirmación
+    return nuevo
+
+
+def _superponer(hoja, df):
+    """Añade a un DataFrame recién refrescado las sesiones de la hoja aún sin confirmar que le falten."""
+    for (hoja_registro, texto), registro in _sin_confirmar.items():
+        if hoja_registro == hoja and not existe_fecha(df, datetime.strptime(texto, FORMATO_FECHA)):
+            df = anadir_registro(df, registro, COLUMNAS_EJERCICIOS)
+    return df
+
+
+def confirmar_escrituras():
+    """
+    Consulta en el diario las sesiones aún sin confirmar: las que ya están en
+    Google Sheets dejan de vigilarse y las que Google rechazó se deshacen.
+    """
+    with _candado:
+        claves = list(_sin_confirmar)
+    for hoja, texto in claves:
+        estado = estado_escritura(hoja, texto)
+        if estado is None or estado["estado"] == "enviada":  # Sin espejo no pasa por el diario
+            with _candado:
+                _sin_confirmar.pop((hoja, texto), None)
+        elif estado["estado"] == "descartada":
+            _deshacer(hoja, texto, estado["error"])
+
+
+def _deshacer(hoja, texto, error):
+    """
+    Deja de vigilar una sesión que Google rechazó. Solo se quita de la
+    instantánea si no hay copia local: entonces no está guardada en ningún sitio.
+    """
+    deshecha = not obtener_almacenamiento().copia_local
+    print(f"Google Sheets rechazó el registro de {hoja} del {texto} ({'se deshace' if deshecha else 'se conserva en local'}): {error}")
+    fecha = pd.Timestamp(datetime.strptime(texto, FORMATO_FECHA))
+    with _candado:
+        _sin_confirmar.pop((hoja, texto), None)
+        if deshecha and hoja in _datos:
+            df = _datos[hoja]["df"]
+            _datos[hoja] = {
+                **_datos[hoja], "df": df[df.index != fecha], "ultimos": None, "version": _datos[hoja]["version"] + 1
+            }
+        _rechazadas.append({
+            "instante": time.time(), "hoja": hoja, "fecha": texto, "error": error, "deshecha": deshecha,
+        })
+
+
+def rechazadas_desde(instante):
+    """Sesiones que Google rechazó después de `instante` (segundos de época); "deshecha" indica si se quitaron."""
+    with _candado:
+        return [rechazada for rechazada in _rechazadas if rechazada["instante"] >= instante]
+
+
+# =============================================================================
+# REFRESCO EN SEGUNDO PLANO
+# =============================================================================
+
+
+def refrescar(hojas=None, con_fotos=True):
+    """
+    Recarga las hojas dadas (por defecto, todas las del registro) y, si se pide,
+    busca fotos nuevas en las carpetas de Drive. Lo llama el hilo de refresco.
+    """
+    atletas = obtener_atletas()
+    if hojas is None:
+        hojas = [atleta["hoja"] for atleta in atletas]
+    with _candado:
+        versiones = {hoja: _datos.get(hoja, {}).get("version", 0) for hoja in hojas}
+
+    try:
+        with tramo("servicio_datos.refresco", hojas=len(hojas)):
+            dfs = obtener_almacenamiento().refrescar(hojas)
+    except Exception as e:
+        print(f"Error al refrescar los datos (se sigue con la instantánea): {e}")
+        with _candado:
+            for hoja in hojas:
+                if hoja in _datos:
+                    _datos[hoja]["error"] = str(e) or type(e).__name__
+    else:
+        ahora = time.time()
+        obsoletas = []
+        with _candado:
+            for hoja, df in zip(hojas, dfs):
+                version = _datos.get(hoja, {}).get("version", 0)
+                if version != versiones[hoja]:
+                    obsoletas.append(hoja)  # Cambió mientras se cargaba: se refrescará otra vez
+                    continue
+                # Las sesiones recién registradas siguen ahí aunque la hoja aún no las tenga
+                _datos[hoja] = {
+                    "df": _superponer(hoja, df), "instante": ahora, "error": None, "ultimos": None,
+                    "version": version + 1,
+                }
+            _pendientes.update(obsoletas)
+        if obsoletas:
+            _evento.set()
+
+    if con_fotos:
+        refrescar_fotos(atletas)
+
+
+def refrescar_fotos(atletas=None):
+    """
+    Busca fotos nuevas en las carpetas de Drive: primero la última de cada
+    carpeta (la de la cabecera, con una consulta de un solo archivo) y después
+    un lote de la galería (ver `fotos.ingerir_carpeta_drive`).
+
+    Returns:
+        bool: True si alguna carpeta aún tiene fotos por procesar.
+    """
+    pendiente = False
+    for carpeta in dict.fromkeys(atleta["carpeta_drive"] for atleta in atletas or obtener_atletas()):
+        try:
+            fotos.ingerir_ultima_drive(carpeta)
+            fotos.ingerir_carpeta_drive(carpeta, forzar=True)
+            _fotos[carpeta] = {"instante": time.time(), "error": None}
+        except Exception as e:
+            print(f"Error al buscar fotos nuevas en Google Drive: {e}")
+            _fotos[carpeta] = {**_fotos.get(carpeta, {"instante": None}), "error": str(e) or type(e).__name__}
+        pendiente = pendiente or fotos.ingesta_pendiente(carpeta)
+    return pendiente
+
+
+def _bucle_refresco():
+    """
+    Refresca todo cada INTERVALO_REFRESCO segundos y enseguida las hojas que se
+    piden. Mientras haya sesiones sin confirmar, mira el diario cada
+    INTERVALO_CONFIRMACION segundos, y mientras la galería tenga fotos por
+    procesar, ingiere un lote cada INTERVALO_LOTE_FOTOS segundos.
+    """
+    proximo = time.monotonic() + INTERVALO_REFRESCO
+    fotos_pendientes = False
+    while True:
+        with _candado:
+            espera = proximo - time.monotonic()
+            if _sin_confirmar:
+                espera = min(espera, INTERVALO_CONFIRMACION)
+        if fotos_pendientes:
+            espera = min(espera, INTERVALO_LOTE_FOTOS)
+        _evento.wait(max(espera, 0))
+        _evento.clear()
+        with _candado:
+            completo = time.monotonic() >= proximo
+            hojas = None if completo else sorted(_pendientes)
+            _pendientes.clear()
+        try:
+            if completo or hojas:
+                refrescar(hojas, con_fotos=False)
+            if completo or not _fotos or fotos_pendientes:
+                fotos_pendientes = refrescar_fotos()
+        except Exception as e:
+            print(f"Error en el hilo de refresco de datos: {e}")
+        if completo:
+            proximo = time.monotonic() + INTERVALO_REFRESCO
+        try:
+            confirmar_escrituras()
+        except Exception as e:
+            print(f"Error al confirmar las escrituras en el diario: {e}")
+
+
+def iniciar_servicio():
+    """Arranca (una sola vez por proceso) el hilo que refresca los datos en segundo plano."""
+    global _hilo
+    with _candado:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle_refresco, name="refresco-datos", daemon=True)
+            _hilo.start()
+
+
+# =============================================================================
+# ESTADO DE LOS DATOS
+# =============================================================================
+def estado(hojas):
+    """
+    Antigüedad de los datos de varias hojas.
+
+    Returns:
+        dict: "instante" del refresco bueno más antiguo (None si alguna hoja aún
+        no se ha confirmado contra la fuente) y "error" del último refresco fallido.
+    """
+    with _candado:
+        entradas = [_datos[hoja] for hoja in hojas if hoja in _datos]
+    instantes = [entrada["instante"] for entrada in entradas]
+    errores = [entrada["error"] for entrada in entradas if entrada["error"]]
+    return {
+        "instante": None if not instantes or None in instantes else min(instantes),
+        "error": errores[0] if errores else None,
+    }
+
+
+def estado_fotos(carpeta):
+    """Instante de la última búsqueda de fotos correcta en una carpeta y último error, si lo hubo."""
+    return _fotos.get(carpeta, {"instante": None, "error": None})
+
+
+def antiguedad(instante):
+    """Texto corto con el tiempo transcurrido desde `instante` ("hace 5 min")."""
+    segundos = max(0, time.time() - instante)
+    if segundos < 60:
+        return "hace un momento"
+    if segundos < 3600:
+        return f"hace {int(segundos // 60)} min"
+    if segundos < 86400:
+        return f"hace {int(segundos // 3600)} h"
+    return f"el {pd.Timestamp(instante, unit='s').strftime('%d/%m/%Y')}"
+
+
+def reiniciar():
+    """Olvida las instantáneas en memoria (se vuelven a cargar al pedirlas)."""
+    with _candado:
+        _datos.clear()
+        _fotos.clear()
+        _ultimos_formulario.clear()
+        _pendientes.clear()
+        _sin_confirmar.clear()
+        _rechazadas.clear()
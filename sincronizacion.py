@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import pandas as pd
+from google_clients import obtener_hoja
+from instrumentacion import tramo, tamano_valores
+from planificador_google import ejecutar
+
+# Configuración de las instantáneas locales
+DIRECTORIO_INSTANTANEAS = ".instantaneas"  # Una subcarpeta por hoja con sus partes Parquet
+MAX_PARTES = 20  # Al superar este número de partes se compactan en una sola
+
+# Estado en memoria por hoja: {"cabecera", "filas", "partes", "crudo", "df"}
+_estados = {}
+_candados = {}
+_candado_global = threading.Lock()
+
+
+def _candado_hoja(nombre_hoja):
+    """Devuelve el candado de una hoja, creándolo si hace falta."""
+    with _candado_global:
+        return _candados.setdefault(nombre_hoja, threading.Lock())
+
+
+def _directorio(nombre_hoja):
+    return os.path.join(DIRECTORIO_INSTANTANEAS, nombre_hoja)
+
+
+def _recortar(fila):
+    """Quita las celdas vacías del final, como hace la API de Sheets."""
+    fila = list(fila)
+    while fila and fila[-1] == "":
+        fila.pop()
+    return fila
+
+
+def _rellenar(filas, ancho):
+    """Iguala todas las filas al ancho de la cabecera."""
+    return [(list(fila) + [""] * ancho)[:ancho] for fila in filas]
+
+
+def _a_registros(cabecera, filas):
+    """Convierte filas de texto en un DataFrame igual al de `get_all_records`."""
+    from gspread.utils import numericise_all  # Diferido: importar gspread es lento
+
+    registros = [dict(zip(cabecera, numericise_all(fila, default_blank=""))) for fila in filas]
+    return pd.DataFrame(registros)
+
+
+def _crudo(filas, ancho):
+    """DataFrame de texto con columnas posicionales, apto para Parquet."""
+    return pd.DataFrame(filas, columns=[f"c{i}" for i in range(ancho)], dtype=str)
+
+
+# =============================================================================
+# PERSISTENCIA EN DISCO
+# =============================================================================
+def _guardar_meta(nombre_hoja, estado):
+    ruta = os.path.join(_directorio(nombre_hoja), "meta.json")
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"cabecera": estado["cabecera"], "filas": estado["filas"], "partes": estado["partes"]}, f)
+    os.replace(temporal, ruta)  # Escritura atómica de la marca de agua
+
+
+def _escribir_parte(nombre_hoja, estado, filas):
+    """
+    Añade las filas nuevas como una parte Parquet más de la instantánea.
+
+    Si no hay motor de Parquet disponible la instantánea vive solo en memoria.
+    """
+    directorio = _directorio(nombre_hoja)
+    os.makedirs(directorio, exist_ok=True)
+    try:
+        if estado["partes"] + 1 > MAX_PARTES:
+            # Compactar todas las partes en una sola
+            for nombre in os.listdir(directorio):
+                if nombre.endswith(".parquet"):
+                    os.remove(os.path.join(directorio, nombre))
+            estado["crudo"].to_parquet(os.path.join(directorio, "parte-00000.parquet"), index=False)
+            estado["partes"] = 1
+        elif filas:
+            ancho = len(estado["cabecera"])
+            _crudo(filas, ancho).to_parquet(
+                os.path.join(directorio, f"parte-{estado['partes']:05d}.parquet"), index=False
+            )
+            estado["partes"] += 1
+        _guardar_meta(nombre_hoja, estado)
+    except ImportError as e:
+        print(f"Instantánea de {nombre_hoja} solo en memoria (falta el motor de Parquet): {e}")
+
+
+def _escribir_completa(nombre_hoja, estado):
+    """Sustituye la instantánea en disco por una única parte con todos los datos."""
+    directorio = _directorio(nombre_hoja)
+    os.makedirs(directorio, exist_ok=True)
+    for nombre in os.listdir(directorio):
+        os.remove(os.path.join(directorio, nombre))
+    estado["partes"] = 0
+    _escribir_parte(nombre_hoja, estado, estado["crudo"].values.tolist())
+
+
+def _leer_estado(nombre_hoja):
+    """Carga la instantánea de disco, o None si no existe o está incompleta."""
+    directorio = _directorio(nombre_hoja)
+    try:
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        ancho = len(meta["cabecera"])
+        partes = [
+            pd.read_parquet(os.path.join(directorio, f"parte-{i:05d}.parquet"))
+            for i in range(meta["partes"])
+        ]
+        crudo = pd.concat(partes, ignore_index=True) if partes else _crudo([], ancho)
+        if len(crudo) != meta["filas"]:
+            return None
+    except (OSError, ValueError, KeyError, ImportError):
+        return None
+
+    filas = crudo.values.tolist()
+    return {
+        "cabecera": meta["cabecera"],
+        "filas": meta["filas"],
+        "partes": meta["partes"],
+        "crudo": crudo,
+        "df": _a_registros(meta["cabecera"], filas),
+    }
+
+
+# =============================================================================
+# SINCRONIZACIÓN
+# =============================================================================
+def _sincronizacion_completa(nombre_hoja, hoja):
+    """Descarga la hoja entera y rehace su instantánea."""
+    with tramo("sheets.get_all_values", hoja=nombre_hoja):
+        valores = ejecutar(
+            "sheets.lectura", "get_all_values", hoja.get_all_values, clave=nombre_hoja, tamano=tamano_valores
+        )
+    cabecera = _recortar(valores[0]) if valores else []
+    filas = _rellenar(valores[1:], len(cabecera))
+
+    estado = {
+        "cabecera": cabecera,
+        "filas": len(filas),
+        "partes": 0,
+        "crudo": _crudo(filas, len(cabecera)),
+        "df": _a_registros(cabecera, filas),
+    }
+    _escribir_completa(nombre_hoja, estado)
+    return estado
+
+
+def _sincronizacion_incremental(nombre_hoja, hoja, estado):
+    """
+    Trae solo las filas posteriores a la marca de agua.
+
+    Una única llamada `batch_get` lee la cabecera y el rango que empieza en la
+    última fila sincronizada. Si la cabecera cambió, o esa última fila ya no
+    coincide (se borraron o editaron filas), devuelve None para forzar una
+    lectura completa.
+    """
+    cabecera = estado["cabecera"]
+    if not cabecera:
+        return None
+
+    from gspread.utils import rowcol_to_a1
+
+    ultima_columna = rowcol_to_a1(1, len(cabecera)).rstrip("0123456789")
+    fila_marca = estado["filas"] + 1  # La fila 1 es la cabecera
+    rangos = ["1:1", f"A{fila_marca}:{ultima_columna}"]
+    with tramo("sheets.batch_get", hoja=nombre_hoja):
+        rango_cabecera, rango_delta = ejecutar(
+            "sheets.lectura", "batch_get", lambda: hoja.batch_get(rangos), clave=(nombre_hoja, *rangos),
+            tamano=lambda rangos: sum(map(tamano_valores, rangos))
+        )
+
+    cabecera_remota = _recortar(rango_cabecera[0]) if rango_cabecera else []
+    if cabecera_remota != cabecera or not rango_delta:
+        return None
+
+    # La primera fila del rango debe ser la última que ya teníamos
+    if estado["filas"] == 0:
+        ultima_local = cabecera
+    else:
+        ultima_local = estado["crudo"].iloc[-1].tolist()
+    if _recortar(rango_delta[0]) != _recortar(ultima_local):
+        return None
+
+    nuevas = _rellenar(rango_delta[1:], len(cabecera))
+    if nuevas:
+        estado["crudo"] = pd.concat([estado["crudo"], _crudo(nuevas, len(cabecera))], ignore_index=True)
+        estado["df"] = pd.concat([estado["df"], _a_registros(cabecera, nuevas)], ignore_index=True)
+        estado["filas"] += len(nuevas)
+        _escribir_parte(nombre_hoja, estado, nuevas)
+    return estado
+
+
+def sincronizar_hoja(nombre_hoja):
+    """
+    Devuelve los datos de una hoja de Google Sheets apoyándose en su instantánea local.
+
+    Solo se descargan las filas añadidas desde la última sincronización; la
+    hoja se relee entera cuando no hay instantánea o cuando la cabecera o el
+    número de filas indican que se editó en el sitio.
+
+    Args:
+        nombre_hoja (str): Nombre de la hoja de Google Sheets.
+
+    Returns:
+        pd.DataFrame: Los mismos datos que daría `get_all_records`.
+    """
+    with _candado_hoja(nombre_hoja), tramo("sincronizar_hoja", hoja=nombre_hoja):
+        estado = _estados.get(nombre_hoja)
+        if estado is None:
+            with tramo("instantanea.leer_disco", hoja=nombre_hoja):
+                estado = _leer_estado(nombre_hoja)
+        hoja = obtener_hoja(nombre_hoja)
+
+        nuevo_estado = None
+        if estado is not None:
+            nuevo_estado = _sincronizacion_incremental(nombre_hoja, hoja, estado)
+        if nuevo_estado is None:
+            nuevo_estado = _sincronizacion_completa(nombre_hoja, hoja)
+
+        _estados[nombre_hoja] = nuevo_estado
+        return nuevo_estado["df"].copy()
+
+
+def instantanea_local(nombre_hoja):
+    """Devuelve la última instantánea conocida de una hoja sin llamar a Google, o None."""
+    with _candado_hoja(nombre_hoja):
+        estado = _estados.get(nombre_hoja) or _leer_estado(nombre_hoja)
+        if estado is None:
+            return None
+        _estados[nombre_hoja] = estado
+        return estado["df"].copy()
@@ -1,8 +1,11 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 import pandas as pd
-import plotly.graph_objects as go
-from datetime import datetime
 import numpy as np
 import streamlit as st
+from instrumentacion import tramo, activa
 
 # =============================================================================
 # CONFIGURACIÓN DE CATEGORÍAS Y MÁXIMOS (ACTUALIZADA CON HOMBRO)
@@ -45,6 +48,53 @@ MAXIMOS = {
     }
 }
 
+# Categorías que puntúan solo con su mejor ejercicio (sin media ponderada ni tope de 10)
+CATEGORIAS_MEJOR_EJERCICIO = {"biceps"}
+
+# =============================================================================
+# TABLAS PRECALCULADAS PARA EL MOTOR DE PUNTUACIÓN
+# =============================================================================
+def preparar_tablas_puntuacion():
+    """
+    Precalcula los vectores que usa el motor de puntuación a partir de
+    CATEGORIAS, PESO_EJERCICIOS y MAXIMOS. Hay que volver a llamarla si se
+    cambian esas constantes en caliente.
+    """
+    global EJERCICIOS_PUNTUADOS, _INDICE_CATEGORIA, _PONDERACIONES, _MAXIMOS_VECTOR, _INDICES_MEJOR
+    EJERCICIOS_PUNTUADOS = [ej for ejercicios in CATEGORIAS.values() for ej in ejercicios]
+    categorias = list(CATEGORIAS.keys())
+
+    # Matriz (ejercicio x categoría) con un 1 donde el ejercicio puntúa en la categoría
+    _INDICE_CATEGORIA = np.zeros((len(EJERCICIOS_PUNTUADOS), len(categorias)))
+    ponderaciones = []
+    posicion = 0
+    for c, categoria in enumerate(categorias):
+        for ejercicio in CATEGORIAS[categoria]:
+            _INDICE_CATEGORIA[posicion, c] = 1.0
+            ponderaciones.append(PESO_EJERCICIOS.get(categoria, {}).get(ejercicio, 1.0))
+            posicion += 1
+    _PONDERACIONES = np.array(ponderaciones, dtype=float)
+
+    _MAXIMOS_VECTOR = {
+        genero: np.array([
+            float(maximos[categoria][ejercicio])
+            for categoria in categorias for ejercicio in CATEGORIAS[categoria]
+        ])
+        for genero, maximos in MAXIMOS.items()
+    }
+
+    # Posiciones de los ejercicios de cada categoría de "mejor ejercicio"
+    _INDICES_MEJOR = {
+        categorias.index(categoria): np.flatnonzero(_INDICE_CATEGORIA[:, categorias.index(categoria)])
+        for categoria in CATEGORIAS_MEJOR_EJERCICIO if categoria in CATEGORIAS
+    }
+
+preparar_tablas_puntuacion()
+
+def maximos_vector(genero):
+    """Máximos de cada ejercicio de EJERCICIOS_PUNTUADOS para un género."""
+    return _MAXIMOS_VECTOR[genero]
+
 # =============================================================================
 # FUNCIONES DE CÁLCULO (ACTUALIZADAS, CON NOMBRES ORIGINALES)
 # =============================================================================
@@ -53,100 +103,284 @@ def obtener_ultimo_registro_ejercicio(df, ejercicio):
     registros = df[ejercicio].dropna()
     return registros.iloc[-1] if not registros.empty else 0
 
-def calcular_puntuacion_grupo(df, categoria, genero):
-    """Calcula la puntuación para una categoría específica"""
-    ejercicios = CATEGORIAS[categoria]
-    total = 0
-    peso_total = 0
-    
-    # Caso especial para bíceps
-    if categoria == "biceps":
-        # Obtener el último registro entre las dos opciones
-        ultimos_registros = [
-            obtener_ultimo_registro_ejercicio(df, ej) 
-            for ej in ejercicios
-        ]
-        ejercicio_usado = ejercicios[np.argmax(ultimos_registros)]  # El que tenga valor más reciente
-        peso = max(ultimos_registros)
-        maximo = MAXIMOS[genero][categoria][ejercicio_usado]
-        
-        # Convertir peso a número
-        try:
-            peso = float(peso)
-        except (ValueError, TypeError):
-            peso = 0.0
-        
-        return (peso / maximo) * 10 if maximo != 0 else 0
+def ultimos_valores(df, previos=None):
+    """
+    Devuelve el último valor no nulo de cada ejercicio puntuado, en una sola pasada.
+    
+    Equivale a llamar a `obtener_ultimo_registro_ejercicio` por ejercicio y
+    convertir a float (0 si no es numérico), pero para todas las columnas a la
+    vez. La tabla se recorre desde el final en bloques crecientes, así que en
+    historiales largos solo se tocan las últimas filas.
+    
+    Args:
+        df (pd.DataFrame): Sesiones ordenadas por fecha.
+        previos (np.ndarray, optional): Últimos valores de las sesiones anteriores
+            a `df`; así basta con pasar las filas nuevas para actualizarlos.
     
-    # Para otras categorías
-    for ejercicio in ejercicios:
-        peso = obtener_ultimo_registro_ejercicio(df, ejercicio)
+    Returns:
+        np.ndarray: Vector float con un valor por ejercicio de EJERCICIOS_PUNTUADOS.
+    """
+    if previos is None:
+        ultimos = np.zeros(len(EJERCICIOS_PUNTUADOS), dtype=object)
+    else:
+        ultimos = np.array(previos, dtype=object)
+    posiciones = df.columns.get_indexer(EJERCICIOS_PUNTUADOS)
+    pendientes = np.flatnonzero(posiciones >= 0)  # Los ejercicios sin columna valen 0
+    
+    fin = len(df)
+    tamano = 64
+    while len(pendientes) and fin > 0:
+        inicio = max(0, fin - tamano)
+        bloque = df.iloc[inicio:fin].iloc[:, posiciones[pendientes]].to_numpy(dtype=object)
+        presentes = ~pd.isna(bloque)
         
-        # Convertir peso a número
-        try:
-            peso = float(peso)
-        except (ValueError, TypeError):
-            peso = 0.0
-            
-        if peso == 0:
-            continue
-            
-        # Obtener ponderación y máximo
-        ponderacion = PESO_EJERCICIOS.get(categoria, {}).get(ejercicio, 1.0)
-        maximo = MAXIMOS[genero][categoria][ejercicio]
+        # Fila del último valor presente de cada columna (la primera, mirando desde abajo)
+        encontrados = presentes.any(axis=0)
+        ultima_fila = len(bloque) - 1 - presentes[::-1].argmax(axis=0)
+        ultimos[pendientes[encontrados]] = bloque[ultima_fila[encontrados], np.flatnonzero(encontrados)]
         
-        # Calcular contribución
-        contribucion = (peso / maximo) * 10 * ponderacion
-        total += contribucion
-        peso_total += ponderacion
+        pendientes = pendientes[~encontrados]
+        fin = inicio
+        tamano *= 4
     
-    return min(total / peso_total, 10) if peso_total > 0 else 0
+    return pd.to_numeric(pd.Series(ultimos), errors="coerce").fillna(0).to_numpy(dtype=float)
 
-def generar_radar_chart(puntuaciones):
-    """Genera el gráfico de araña con Plotly"""
+def puntuar(valores, maximos):
+    """
+    Calcula la puntuación de todas las categorías a partir de una matriz de valores.
+    
+    Args:
+        valores (np.ndarray): Matriz (filas x EJERCICIOS_PUNTUADOS) de pesos.
+        maximos (np.ndarray): Máximos por ejercicio, con la misma forma (o un vector).
+    
+    Returns:
+        np.ndarray: Matriz (filas x categorías) con las puntuaciones.
+    """
+    valores = np.atleast_2d(valores)
+    maximos = np.broadcast_to(maximos, valores.shape)
+    
+    # Media ponderada de los ejercicios con peso, con tope de 10
+    usados = valores != 0
+    contribuciones = np.where(usados, valores / maximos * 10 * _PONDERACIONES, 0.0)
+    pesos = np.where(usados, _PONDERACIONES, 0.0)
+    total = contribuciones @ _INDICE_CATEGORIA
+    peso_total = pesos @ _INDICE_CATEGORIA
+    puntuaciones = np.where(
+        peso_total > 0, np.minimum(total / np.where(peso_total > 0, peso_total, 1), 10), 0.0
+    )
+    
+    # Categorías que puntúan solo con el ejercicio de mayor peso
+    filas = np.arange(valores.shape[0])
+    for c, indices in _INDICES_MEJOR.items():
+        mejor = indices[valores[:, indices].argmax(axis=1)]
+        peso = valores[filas, mejor]
+        maximo = maximos[filas, mejor]
+        puntuaciones[:, c] = np.where(maximo != 0, peso / np.where(maximo != 0, maximo, 1) * 10, 0.0)
+    
+    return puntuaciones
+
+def calcular_puntuaciones(df, genero):
+    """Calcula la puntuación de todas las categorías para un DataFrame"""
+    fila = puntuar(ultimos_valores(df), _MAXIMOS_VECTOR[genero])[0]
+    return {categoria: float(valor) for categoria, valor in zip(CATEGORIAS.keys(), fila)}
+
+def calcular_puntuaciones_atletas(dfs, generos, ultimos=None):
+    """
+    Calcula las puntuaciones de todas las categorías para varios atletas a la vez.
+    
+    Args:
+        dfs (dict): DataFrame de cada atleta, por nombre.
+        generos (dict): Género de cada atleta, por nombre.
+        ultimos (dict, optional): Últimos valores ya calculados de cada atleta
+            (ver `ultimos_valores`); los que falten se calculan desde `dfs`.
+    
+    Returns:
+        dict: Puntuaciones por categoría de cada atleta, por nombre.
+    """
+    nombres = list(dfs.keys())
+    if not nombres:
+        return {}
+    with tramo("puntuacion", atletas=len(nombres)):
+        ultimos = ultimos or {}
+        valores = np.vstack([
+            ultimos[nombre] if nombre in ultimos else ultimos_valores(dfs[nombre]) for nombre in nombres
+        ])
+        maximos = np.vstack([_MAXIMOS_VECTOR[generos[nombre]] for nombre in nombres])
+        puntuaciones = puntuar(valores, maximos)
+    return {
+        nombre: {categoria: float(valor) for categoria, valor in zip(CATEGORIAS.keys(), fila)}
+        for nombre, fila in zip(nombres, puntuaciones)
+    }
+
+def calcular_puntuacion_grupo(df, categoria, genero):
+    """Calcula la puntuación para una categoría específica"""
+    return calcular_puntuaciones(df, genero)[categoria]
+
+# =============================================================================
+# GRÁFICOS DE ARAÑA MEMOIZADOS
+# =============================================================================
+# Las figuras se guardan por una huella de las puntuaciones (y nombres de los
+# atletas), así que un rerun con los mismos datos no vuelve a construirlas. La
+# caché es LRU y guarda como mucho MAX_FIGURAS_CACHE figuras; el JSON de cada
+# una se genera una sola vez, la primera vez que se pide. Las figuras devueltas
+# se comparten: no hay que modificarlas.
+MAX_FIGURAS_CACHE = 64
+COLORES_ATLETAS = ["#FF6B6B", "#4ECDC4", "#FFE66D", "#A8E6CF", "#C3AED6", "#FF9F1C"]
+
+_figuras = OrderedDict()  # huella -> {"figura", "json"}
+_candado_figuras = threading.Lock()
+
+def _huella(tipo, puntuaciones_por_atleta):
+    datos = [
+        (atleta, [(categoria, round(float(valor), 6)) for categoria, valor in puntuaciones.items()])
+        for atleta, puntuaciones in puntuaciones_por_atleta.items()
+    ]
+    return hashlib.sha1(json.dumps([tipo, datos]).encode()).hexdigest()
+
+def _figura_memoizada(huella, construir):
+    """Devuelve la entrada de la caché para `huella`, construyendo la figura si falta."""
+    with _candado_figuras:
+        entrada = _figuras.get(huella)
+        if entrada is not None:
+            _figuras.move_to_end(huella)
+            return entrada
+    entrada = {"figura": construir(), "json": None}
+    with _candado_figuras:
+        _figuras[huella] = entrada
+        while len(_figuras) > MAX_FIGURAS_CACHE:
+            _figuras.popitem(last=False)
+    return entrada
+
+def _traza_radar(go, puntuaciones, color, nombre=None):
     categorias = list(puntuaciones.keys())
     valores = list(puntuaciones.values()) + [list(puntuaciones.values())[0]]  # Cerrar el círculo
-    
-    fig = go.Figure(
-        data=go.Scatterpolar(
-            r=valores,
-            theta=categorias + [categorias[0]],
-            fill="toself",
-            line=dict(color="#FF6B6B", width=2),
-            marker=dict(size=8)
+    return go.Scatterpolar(
+        r=valores,
+        theta=categorias + [categorias[0]],
+        fill="toself",
+        name=nombre,
+        opacity=0.6 if nombre is not None else 1,
+        line=dict(color=color, width=2),
+        marker=dict(size=8)
+    )
+
+def _layout_radar(go, leyenda=False):
+    return go.Layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 10],
+                tickfont=dict(color="#4ECDC4"),
+                gridcolor="#4ECDC4"
+            )
         ),
-        layout=go.Layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 10],
-                    tickfont=dict(color="#4ECDC4"),
-                    gridcolor="#4ECDC4"
-                )
-            ),
-            paper_bgcolor="#2D3047",
-            font=dict(color="#FFFFFF"),
-            title="- - - ",
-            title_font=dict(size=20)
-        )
+        paper_bgcolor="#2D3047",
+        font=dict(color="#FFFFFF"),
+        title="- - - ",
+        title_font=dict(size=20),
+        showlegend=leyenda
     )
-    return fig
+
+def _entrada_radar(puntuaciones):
+    def construir():
+        import plotly.graph_objects as go  # Diferido: plotly es lo más lento de importar
+
+        return go.Figure(data=_traza_radar(go, puntuaciones, COLORES_ATLETAS[0]), layout=_layout_radar(go))
+
+    return _figura_memoizada(_huella("radar", {"": puntuaciones}), construir)
+
+def _entrada_combinada(puntuaciones_por_atleta):
+    def construir():
+        import plotly.graph_objects as go
+
+        trazas = [
+            _traza_radar(go, puntuaciones, COLORES_ATLETAS[i % len(COLORES_ATLETAS)], nombre)
+            for i, (nombre, puntuaciones) in enumerate(puntuaciones_por_atleta.items())
+        ]
+        return go.Figure(data=trazas, layout=_layout_radar(go, leyenda=True))
+
+    return _figura_memoizada(_huella("combinado", puntuaciones_por_atleta), construir)
+
+def _json_entrada(entrada):
+    """JSON de una figura de la caché, serializado solo la primera vez."""
+    if entrada["json"] is None:
+        entrada["json"] = entrada["figura"].to_json()
+    return entrada["json"]
+
+def generar_radar_chart(puntuaciones):
+    """Genera el gráfico de araña con Plotly (memoizado por las puntuaciones)"""
+    return _entrada_radar(puntuaciones)["figura"]
+
+def generar_radar_combinado(puntuaciones_por_atleta):
+    """Genera un único gráfico de araña con una traza superpuesta por atleta (memoizado)"""
+    return _entrada_combinada(puntuaciones_por_atleta)["figura"]
+
+def radar_chart_json(puntuaciones):
+    """JSON del gráfico de araña de un atleta, serializado una sola vez"""
+    return _json_entrada(_entrada_radar(puntuaciones))
+
+def radar_combinado_json(puntuaciones_por_atleta):
+    """JSON del gráfico combinado de varios atletas, serializado una sola vez"""
+    return _json_entrada(_entrada_combinada(puntuaciones_por_atleta))
 
 # =============================================================================
 # INTEGRACIÓN CON STREAMLIT (CON NOMBRES ORIGINALES)
 # =============================================================================
-def mostrar_analisis_fuerza(df, genero):
+def mostrar_analisis_fuerza(df, genero, puntuaciones=None):
     """Muestra el análisis en Streamlit"""
     
     if df.empty:
         st.warning("No hay datos para analizar")
         return
     
-    # Calcular puntuaciones
-    puntuaciones = {
-        categoria: calcular_puntuacion_grupo(df, categoria, genero)
-        for categoria in CATEGORIAS.keys()
-    }
+    # Calcular puntuaciones (si no vienen ya calculadas en bloque)
+    if puntuaciones is None:
+        puntuaciones = calcular_puntuaciones(df, genero)
+    
+    with tramo("plotly.radar_chart"):
+        fig = generar_radar_chart(puntuaciones)
+    with tramo("streamlit.plotly_chart", bytes=len(radar_chart_json(puntuaciones)) if activa() else None):
+        st.plotly_chart(fig, width="stretch")
+
+def mostrar_analisis_combinado(puntuaciones_por_atleta):
+    """Muestra todos los atletas superpuestos en un solo gráfico de araña"""
+    
+    if not puntuaciones_por_atleta:
+        st.warning("No hay datos para analizar")
+        return
+    
+    with tramo("plotly.radar_combinado", atletas=len(puntuaciones_por_atleta)):
+        fig = generar_radar_combinado(puntuaciones_por_atleta)
+    bytes_ = len(radar_combinado_json(puntuaciones_por_atleta)) if activa() else None
+    with tramo("streamlit.plotly_chart", bytes=bytes_):
+        st.plotly_chart(fig, width="stretch")
+
+def mostrar_progreso(historial):
+    """Muestra la evolución de las puntuaciones por categoría"""
+    
+    if len(historial) < 2:
+        st.info("Registra al menos dos entrenamientos para ver tu progreso")
+        return
+    
+    st.line_chart(historial, y_label="Puntuación")
+
+def mostrar_progresion(resumen):
+    """Muestra récords, tendencias y proyección a los máximos de cada ejercicio"""
+    
+    if resumen.empty:
+        return
     
-    fig = generar_radar_chart(puntuaciones)
-    st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+    st.dataframe(
+        resumen.drop(columns=["fecha_ultimo"]),
+        width="stretch",
+        column_config={
+            "unidad": st.column_config.TextColumn("Unidad"),
+            "record": st.column_config.NumberColumn("Récord (1RM est.)", format="%.1f"),
+            "fecha_record": st.column_config.DateColumn("Fecha récord", format="DD/MM/YYYY"),
+            "ultimo": st.column_config.NumberColumn("Último", format="%.1f"),
+            "tendencia": st.column_config.NumberColumn("Tendencia (por semana)", format="%+.2f"),
+            "volumen": st.column_config.NumberColumn("Volumen 4 semanas", format="%.0f"),
+            "semanas_a_maximo": st.column_config.NumberColumn("Semanas hasta el máximo", format="%.0f"),
+            "fecha_maximo": st.column_config.DateColumn("Máximo estimado", format="DD/MM/YYYY"),
+        },
+    )
\ No newline at end of file
@@ -1,78 +1,275 @@
+import functools
+import time
 import streamlit as st
 from datetime import datetime
-from data_management import guardar_entrenamiento
+from data_management import validar_tiempo
 from data_management import existe_entrenamiento_en_fecha
-from stats_analysis import mostrar_analisis_fuerza  # Importa la función de análisis
-import os
-from PIL import Image
-from drive_utils import mostrar_imagen_desde_drive  # Importar la función para mostrar imágenes desde Drive
+from stats_analysis import mostrar_analisis_fuerza, mostrar_analisis_combinado, calcular_puntuaciones_atletas, mostrar_progreso, mostrar_progresion  # Importa las funciones de análisis
+from historial_puntuaciones import obtener_historial
+import fotos  # Índice de fotos de progreso con miniaturas y versiones para pantalla
+from progresion import resumen_progresion, nuevos_records, unidad
 
 
 def obtener_ultima_imagen(carpeta_imagenes):
-    """Obtiene la última imagen numerada en la carpeta especificada."""
+    """Obtiene la imagen más reciente de la carpeta especificada (según el índice de fotos)."""
     try:
-        # Listar archivos en la carpeta
-        archivos = [f for f in os.listdir(carpeta_imagenes) if f.endswith(('.png', '.jpg', '.jpeg'))]
-        
-        # Ordenar archivos por nombre (asumiendo que están numerados)
-        archivos.sort(key=lambda x: int(x.split('.')[0]))
-        
-        # Obtener la última imagen
-        ultima_imagen = archivos[-1] if archivos else None
-        
-        return os.path.join(carpeta_imagenes, ultima_imagen) if ultima_imagen else None
+        # Solo se procesan los archivos nuevos o modificados desde la última vez
+        fotos.ingerir_carpeta_local(carpeta_imagenes)
+        ultima = fotos.ultima_foto(carpeta_imagenes)
+        return ultima["ruta"] if ultima else None
     except Exception as e:
         st.error(f"Error al cargar la imagen: {e}")
         return None
 
 
-from data_management import inicializar_dataframes
+from servicio_datos import dataframes, ultimos, ultimos_ejercicios, registrar_sesion, rechazadas_desde, iniciar_servicio, estado as estado_datos, estado_fotos, antiguedad
+from diario_escrituras import iniciar_vaciador, profundidad_cola
+from atletas import obtener_atletas, atleta_por_nombre, atleta_por_hoja
+from almacenamiento import obtener_almacenamiento
+from instrumentacion import iniciar_ejecucion, iniciar_fragmento, depuracion_permitida, tramo, mostrar_panel_depuracion
+from planificador_google import errores_desde
 
-def setup_streamlit_ui():
-    """Configura la interfaz de usuario de Streamlit."""
-    st.title("🏋️ DOS BUENORROS ENTRENANDO")
+FOTOS_POR_PAGINA = 12  # Miniaturas por página de la galería
+COLUMNAS_GALERIA = 4
+GRAFICOS_POR_FILA = 2  # Gráficos de araña por fila en la pestaña principal
+RADAR_COMBINADO = True  # Por defecto, todos los atletas en un único gráfico superpuesto
 
-    # Inicializar DataFrames desde Google Sheets
-    df_animalaco, df_mamasota = inicializar_dataframes()
-    
-    # Creación de las pestañas
-    tab1, tab2, tab3 = st.tabs(["🏠 Principal", "Animalaco", "Mamasota"])
+# =============================================================================
+# DATOS PEREZOSOS POR SESIÓN
+# =============================================================================
+# Los DataFrames se piden al servicio de datos (instantánea compartida que se
+# refresca en segundo plano) la primera vez que un fragmento los necesita y se
+# guardan en la sesión, para que toda una ejecución vea los mismos datos. Cada
+# ejecución completa vacía esta caché; las re-ejecuciones de un fragmento
+# reutilizan lo ya obtenido.
+def _cache_dfs():
+    return st.session_state.setdefault("dfs", {})
+
+def obtener_df(atleta):
+    """Devuelve el DataFrame de un atleta, cargándolo solo si aún no está en la sesión."""
+    cache = _cache_dfs()
+    if atleta["nombre"] not in cache:
+        cache.update(dataframes([atleta]))
+    return cache[atleta["nombre"]]
+
+def obtener_dfs(atletas):
+    """Devuelve los DataFrames de varios atletas, cargando a la vez los que falten."""
+    cache = _cache_dfs()
+    faltan = [atleta for atleta in atletas if atleta["nombre"] not in cache]
+    if faltan:
+        cache.update(dataframes(faltan))
+    return {atleta["nombre"]: cache[atleta["nombre"]] for atleta in atletas}
+
+# =============================================================================
+# FRAGMENTOS (SE RE-EJECUTAN POR SEPARADO)
+# =============================================================================
+def medido(fragmento):
+    """
+    Mide por separado los reruns de un fragmento (con su propio panel de
+    depuración); dentro de la ejecución completa cuenta en la de la página.
+    """
+    @functools.wraps(fragmento)
+    def envoltura(*args, **kwargs):
+        registro = iniciar_fragmento(activar=st.session_state.get("depuracion", False))
+        try:
+            return fragmento(*args, **kwargs)
+        finally:
+            mostrar_panel_depuracion(registro, barra_lateral=False)
+    return envoltura
 
-    with tab1:
-        st.header("ESTADÍSTICAS DE AMBOS")
+@st.fragment
+@medido
+def fragmento_estadisticas(atletas):
+    """Gráficos de araña de todos los atletas."""
+    with tramo("ui.estadisticas"):
+        dfs = obtener_dfs(atletas)
         
-        # Crear dos columnas
-        col1, col2 = st.columns(2)
+        # Puntuaciones de todos los atletas en un solo cálculo (con los últimos
+        # valores que el servicio mantiene al día sesión a sesión)
+        puntuaciones = calcular_puntuaciones_atletas(
+            dfs, {atleta["nombre"]: atleta["genero"] for atleta in atletas}, ultimos(atletas)
+        )
         
-        # Gráfico de Animalaco (hombre)
-        with col1:
-            st.subheader("Animalaco")
-            mostrar_analisis_fuerza(df_animalaco, "hombre")
+        # Un solo gráfico con todos los atletas superpuestos (un único envío al navegador)
+        if st.toggle("Gráfico combinado", value=RADAR_COMBINADO, key="radar_combinado"):
+            mostrar_analisis_combinado({
+                atleta["nombre"]: puntuaciones[atleta["nombre"]]
+                for atleta in atletas if not dfs[atleta["nombre"]].empty
+            })
+            return
         
-        # Gráfico de Mamasota (mujer)
-        with col2:
-            st.subheader("Mamasota")
-            mostrar_analisis_fuerza(df_mamasota, "mujer")
+        # Un gráfico por atleta, en filas de GRAFICOS_POR_FILA columnas
+        for inicio in range(0, len(atletas), GRAFICOS_POR_FILA):
+            columnas = st.columns(GRAFICOS_POR_FILA)
+            for columna, atleta in zip(columnas, atletas[inicio:inicio + GRAFICOS_POR_FILA]):
+                with columna:
+                    st.subheader(atleta["nombre"])
+                    mostrar_analisis_fuerza(
+                        dfs[atleta["nombre"]], atleta["genero"], puntuaciones[atleta["nombre"]]
+                    )
+
+@st.fragment
+@medido
+def fragmento_foto(carpetas):
+    """
+    Última foto de cada carpeta de Google Drive, en su versión para pantalla.
+    Las fotos nuevas las incorpora al índice el hilo de refresco, no esta ejecución.
+    """
+    with tramo("ui.foto_drive"):
+        for carpeta_id in carpetas:
+            ultima = fotos.ultima_foto(carpeta_id)
+            estado = estado_fotos(carpeta_id)
+            if ultima:
+                st.image(fotos.ruta_variante(ultima, "pantalla"), caption="Última imagen registrada")
+            elif estado["error"]:
+                st.warning("Google Drive no responde y aún no hay fotos guardadas.")
+            elif estado["instante"] is None:
+                st.info("Buscando la última foto en Google Drive…")
+            else:
+                st.warning("No se encontraron imágenes en la carpeta de Google Drive.")
+
+@st.fragment
+@medido
+def fragmento_galeria(carpetas):
+    """
+    Galería cronológica: una página de miniaturas cada vez y la foto completa
+    (versión para pantalla) solo de la que se abre.
+    """
+    # Cerrada no se envía nada; abrirla solo re-ejecuta este fragmento
+    if not st.toggle("📸 Evolución en fotos", key="galeria_abierta"):
+        return
+    with tramo("ui.galeria"):
+        todas = fotos.fotos(carpetas)
+        if not todas:
+            st.info("Aún no hay fotos de progreso")
+            return
+        
+        paginas = (len(todas) - 1) // FOTOS_POR_PAGINA + 1
+        pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, key="galeria_pagina") - 1
         
-        # Mostrar la última imagen desde Google Drive
-        mostrar_imagen_desde_drive()
-
-    # Resto de las pestañas (Animalaco y Mamasota)
-    with tab2:
-        st.header("Pestaña Animalaco")
-        st.write("Registra tu entrenamiento aquí.")
-        df_animalaco = mostrar_formulario_entrenamiento(df_animalaco, "Animalaco")
-
-    with tab3:
-        st.header("Pestaña Mamasota")
-        st.write("Registra tu entrenamiento aquí.")
-        df_mamasota = mostrar_formulario_entrenamiento(df_mamasota, "Mamasota")
+        abierta = st.session_state.get("galeria_foto")
+        visibles = todas[pagina * FOTOS_POR_PAGINA:(pagina + 1) * FOTOS_POR_PAGINA]
+        for inicio in range(0, len(visibles), COLUMNAS_GALERIA):
+            for columna, foto in zip(st.columns(COLUMNAS_GALERIA), visibles[inicio:inicio + COLUMNAS_GALERIA]):
+                with columna:
+                    st.image(fotos.ruta_variante(foto, "miniaturas"), caption=foto["fecha"][:10])
+                    if st.button("Ver", key=f"galeria_ver_{foto['id']}"):
+                        abierta = st.session_state["galeria_foto"] = foto["id"]
+        
+        foto = next((foto for foto in todas if foto["id"] == abierta), None)
+        if foto:
+            st.image(fotos.ruta_variante(foto, "pantalla"), caption=f"{foto['nombre']} ({foto['fecha'][:10]})")
+
+def mostrar_estado_datos(hojas, desde):
+    """
+    Muestra en la barra lateral la antigüedad de los datos y avisa si Google
+    falló (tras reintentar) en el último refresco o en esta ejecución.
+    """
+    estado = estado_datos(hojas)
+    servicios = {error["cuota"].split(".")[0] for error in errores_desde(desde)}
+    if estado["error"] or "sheets" in servicios:
+        edad = f"actualizados {antiguedad(estado['instante'])}" if estado["instante"] else "de la última copia local"
+        st.sidebar.warning(f"Google Sheets no responde: se muestran los datos guardados ({edad}) y los registros nuevos se subirán más tarde.", icon="⚠️")
+    elif estado["instante"] is None:
+        st.sidebar.caption("🔄 Actualizando datos desde Google…")
+    else:
+        st.sidebar.caption(f"🕒 Datos actualizados {antiguedad(estado['instante'])}")
+    if "drive" in servicios:
+        st.sidebar.warning("Google Drive no responde: puede que falten las fotos más recientes.", icon="⚠️")
+    
+    # Registros que Google Sheets rechazó desde la ejecución anterior
+    for rechazada in rechazadas_desde(st.session_state.get("rechazos_desde", desde)):
+        destino = "y no se ha guardado" if rechazada["deshecha"] else "(sigue guardado en la app, pero no en la hoja)"
+        st.sidebar.error(
+            f"Google Sheets rechazó el entrenamiento de {atleta_por_hoja(rechazada['hoja'])['nombre']} "
+            f"del {rechazada['fecha']} {destino}: {rechazada['error']}"
+        )
+    st.session_state["rechazos_desde"] = desde
+
+@st.fragment
+@medido
+def fragmento_formulario(atleta):
+    """Formulario de registro de un atleta; tocarlo solo re-ejecuta este fragmento."""
+    with tramo("ui.formulario", atleta=atleta["nombre"]):
+        df = obtener_df(atleta)
+        nuevo = mostrar_formulario_entrenamiento(df, atleta["nombre"])
+    if nuevo is not df:
+        # La sesión ya está en la instantánea en memoria: la ejecución completa
+        # pinta el progreso y los récords con ella sin recargar las hojas
+        st.rerun(scope="app")
+
+def setup_streamlit_ui():
+    """Configura la interfaz de usuario de Streamlit."""
+    # Medir esta ejecución si está activada la depuración (?debug=<clave> de CAMBIO_FISICO_CLAVE_DEBUG)
+    st.session_state["depuracion"] = depuracion_permitida(st.query_params.get("debug"))
+    registro = iniciar_ejecucion(activar=st.session_state["depuracion"])
+    inicio = time.time()
+    
+    st.title("🏋️ DOS BUENORROS ENTRENANDO")
+
+    # Subir en segundo plano los registros que queden pendientes en el diario
+    iniciar_vaciador()
+    
+    # Refrescar datos y fotos en segundo plano; la página se pinta con la última instantánea
+    iniciar_servicio()
+    pendientes = profundidad_cola()
+    if pendientes:
+        st.sidebar.caption(f"⏳ {pendientes} registro(s) pendientes de subir a Google Sheets")
+
+    # Ejecución completa: los datos se volverán a pedir cuando alguien los necesite
+    st.session_state["dfs"] = {}
+    atletas = obtener_atletas()
+    
+    # Creación de las pestañas: la principal y una por atleta del registro.
+    # Solo se ejecuta el contenido de la pestaña abierta.
+    pestanas = st.tabs(
+        ["🏠 Principal"] + [atleta["nombre"] for atleta in atletas],
+        key="pestana_activa", on_change="rerun"
+    )
+
+    if pestanas[0].open:
+        with pestanas[0]:
+            st.header("ESTADÍSTICAS DE TODOS")
+            fragmento_estadisticas(atletas)
+            carpetas = list(dict.fromkeys(atleta["carpeta_drive"] for atleta in atletas))
+            fragmento_foto(carpetas)
+            fragmento_galeria(carpetas)
+
+    # Una pestaña de registro por atleta
+    for pestana, atleta in zip(pestanas[1:], atletas):
+        if not pestana.open:
+            continue
+        with pestana, tramo("ui.pestana_atleta", atleta=atleta["nombre"]):
+            st.header(f"Pestaña {atleta['nombre']}")
+            registrada = st.session_state.pop(f"{atleta['nombre']}_registrado", None)
+            if registrada:
+                st.success(f"Entrenamiento del {registrada} registrado. Se está subiendo a Google Sheets.")
+            
+            # Evolución de las puntuaciones sesión a sesión
+            st.subheader("Progreso")
+            mostrar_progreso(obtener_historial(atleta["hoja"], obtener_df(atleta), atleta["genero"]))
+            
+            # Récords, tendencias y proyección a los máximos (índice de récords + últimas semanas)
+            st.subheader("Récords y tendencias")
+            for record in st.session_state.pop(f"{atleta['nombre']}_nuevos_records", []):
+                st.success(f"🏆 Nuevo récord en {record['ejercicio']}: {record['valor']:g} {unidad(record['ejercicio'])}")
+            mostrar_progresion(resumen_progresion(atleta["hoja"], obtener_df(atleta), atleta["genero"]))
+            
+            st.write("Registra tu entrenamiento aquí.")
+            fragmento_formulario(atleta)
+    
+    # Antigüedad de los datos y fallos de Google, en lugar de mostrar datos vacíos sin explicación
+    mostrar_estado_datos([atleta["hoja"] for atleta in atletas], inicio)
+    
+    # Tiempos y llamadas a Google de esta ejecución (solo en depuración)
+    mostrar_panel_depuracion(registro)
         
         
         
 def mostrar_formulario_entrenamiento(df, tab_name):
     """
     Muestra el formulario para registrar un entrenamiento.
+    Devuelve el DataFrame con la sesión nueva si se registró una, o `df` si no.
     """
     # Paso 1: Selección del focus y ejercicios
     st.subheader("Paso 1: Selecciona el focus y los ejercicios")
@@ -121,12 +318,12 @@ def mostrar_formulario_entrenamiento(df, tab_name):
 
     # Botón para continuar al Paso 2
     if st.button("Continuar al Paso 2", key=f"{tab_name}_continuar_paso_2"):
-        st.session_state["ejercicios_seleccionados"] = ejercicios_seleccionados
-        st.session_state["focus"] = focus
-        st.session_state["mostrar_paso_2"] = True
+        st.session_state[f"{tab_name}_ejercicios_seleccionados"] = ejercicios_seleccionados
+        st.session_state[f"{tab_name}_focus_elegido"] = focus
+        st.session_state[f"{tab_name}_mostrar_paso_2"] = True
 
     # Paso 2: Registro de pesos y detalles
-    if st.session_state.get("mostrar_paso_2", False):
+    if st.session_state.get(f"{tab_name}_mostrar_paso_2", False):
         st.subheader("Paso 2: Registra los pesos y detalles del entrenamiento")
         with st.form(key=f"registro_entrenamiento_{tab_name}"):
             # Fecha del entrenamiento
@@ -143,34 +340,47 @@ def mostrar_formulario_entrenamiento(df, tab_name):
                     key=f"{tab_name}_tiempo"
                 )
 
-                # Validación del formato del tiempo entrenado
-                def validar_tiempo(tiempo):
-                    try:
-                        horas, minutos, segundos = map(int, tiempo.split(":"))
-                        if 0 <= horas < 24 and 0 <= minutos < 60 and 0 <= segundos < 60:
-                            return True
-                        return False
-                    except:
-                        return False
-
+                # Validación del formato del tiempo entrenado (ver data_management.validar_tiempo)
                 if tiempo_entrenado and not validar_tiempo(tiempo_entrenado):
                     st.error("Formato de tiempo incorrecto. Usa el formato HH:MM:SS (por ejemplo, 1:34:00).")
 
                 # Diccionario para almacenar los ejercicios y sus pesos
                 ejercicios_realizados = {}
+                detalle_series = {}  # Series y repeticiones, solo si el almacenamiento las guarda
+                con_series = obtener_almacenamiento().guarda_series
+                atleta = atleta_por_nombre(tab_name)
+                ultimos = ultimos_ejercicios(atleta)  # De la instantánea, una vez por versión
 
                 # Registro de pesos para los ejercicios seleccionados
-                for f, ejercicios in st.session_state["ejercicios_seleccionados"].items():
+                for f, ejercicios in st.session_state[f"{tab_name}_ejercicios_seleccionados"].items():
                     st.subheader(f"Ejercicios de {f}")
                     for ejercicio in ejercicios:
                         if f == "core" and ejercicio == "plancha":
                             ejercicios_realizados[ejercicio] = st.number_input(
-                                f"{ejercicio} (segundos)", min_value=0, key=f"{tab_name}_{ejercicio}_segundos"
+                                f"{ejercicio} (segundos)", min_value=0, key=f"{tab_name}_{ejercicio}_segundos",
+                                help=f"Último registro: {ultimos[ejercicio]:g} s" if ejercicio in ultimos else None
                             )
                         else:
-                            ejercicios_realizados[ejercicio] = st.number_input(
-                                f"{ejercicio} (kg)", min_value=0, key=f"{tab_name}_{ejercicio}_kg"
+                            columna_kg, columna_series, columna_repeticiones = (
+                                st.columns([2, 1, 1]) if con_series else (st.container(), None, None)
                             )
+                            ejercicios_realizados[ejercicio] = columna_kg.number_input(
+                                f"{ejercicio} (kg)", min_value=0, key=f"{tab_name}_{ejercicio}_kg",
+                                help=f"Último registro: {ultimos[ejercicio]:g} kg" if ejercicio in ultimos else None
+                            )
+                            if con_series:
+                                # 0 = no se apunta; con repeticiones, los récords son de 1RM estimado
+                                detalle = {
+                                    "series": columna_series.number_input(
+                                        "Series", min_value=0, step=1, key=f"{tab_name}_{ejercicio}_series"
+                                    ),
+                                    "repeticiones": columna_repeticiones.number_input(
+                                        "Repeticiones", min_value=0, step=1, key=f"{tab_name}_{ejercicio}_repeticiones"
+                                    ),
+                                }
+                                detalle = {clave: int(valor) for clave, valor in detalle.items() if valor}
+                                if detalle:
+                                    detalle_series[ejercicio] = detalle
 
                 # Sensación del entrenamiento
                 sensacion = st.selectbox(
@@ -186,13 +396,21 @@ def mostrar_formulario_entrenamiento(df, tab_name):
                         "Sensación": sensacion,
                         **ejercicios_realizados
                     }
+                    if detalle_series:
+                        registro["Series"] = detalle_series
 
-                    # Guardar el registro en Google Sheets
-                    nombre_hoja = "data_animalaco" if tab_name == "Animalaco" else "data_mamasota"
-                    df = guardar_entrenamiento(df, registro, nombre_hoja)
-
-                    # Reiniciar la página
-                    st.rerun()
+                    # Récords que bate la sesión (se consulta el índice antes de guardarla)
+                    records = nuevos_records(atleta["hoja"], registro)
+                    
+                    # Guardar en local y aplicar ya a los datos en memoria (lo ven todas
+                    # las sesiones); la subida a Google Sheets se confirma en segundo plano
+                    nuevo = registrar_sesion(atleta, registro)
+                    if nuevo is None:
+                        st.error(f"No se pudo registrar el entrenamiento del {fecha_hora.strftime('%d/%m/%Y')}.")
+                    else:
+                        st.session_state[f"{tab_name}_nuevos_records"] = records
+                        st.session_state[f"{tab_name}_registrado"] = registro["Fecha"]
+                        df = nuevo
 
     return df
 
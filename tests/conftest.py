@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import diario_escrituras  # noqa: E402
+import google_clients  # noqa: E402
+import planificador_google  # noqa: E402
+from fakes_google import SheetsFalso  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def directorio_temporal(tmp_path, monkeypatch):
+    """Cada prueba trabaja en su propio directorio: la base local, las fotos y las cachés son archivos relativos."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def sheets():
+    """
+    Cliente de Sheets falso para todo el proceso, sin cuotas (se prueba el
+    código, no la espera) y con el vaciado del diario solo a mano.
+    """
+    cliente = SheetsFalso()
+    google_clients.establecer_cliente_sheets(cliente)
+    limites = dict(planificador_google.LIMITES)
+    planificador_google.establecer_limites(dict.fromkeys(limites))
+    anterior = diario_escrituras.establecer_vaciado_automatico(False)
+    yield cliente
+    diario_escrituras.establecer_vaciado_automatico(anterior)
+    planificador_google.establecer_limites(limites)
+    planificador_google.reiniciar_metricas()
+    google_clients.reiniciar_clientes()
+
+
+def error_http(codigo):
+    """Error de gspread con el código HTTP dado, como los que lanza Google Sheets."""
+    import requests
+    from gspread.exceptions import APIError
+
+    respuesta = requests.Response()
+    respuesta.status_code = codigo
+    respuesta._content = b'{"error": {"code": %d, "message": "prueba"}}' % codigo
+    return APIError(respuesta)
@@ -0,0 +1,127 @@
+import importlib
+
+import pytest
+
+import diario_escrituras
+from conftest import error_http
+
+HOJA = "data_pruebas"
+COLUMNAS = ["Fecha", "Tiempo entrenado", "press banca"]
+
+
+def _registro(fecha, carga=60):
+    return {"Fecha": fecha, "Tiempo entrenado": "1:00:00", "press banca": carga}
+
+
+@pytest.fixture
+def hoja(sheets):
+    return sheets.crear_hoja(HOJA, [COLUMNAS])
+
+
+def test_registrar_vaciar_y_marcar_enviada(hoja):
+    assert diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040"), COLUMNAS)
+    assert diario_escrituras.profundidad_cola(HOJA) == 1
+    assert diario_escrituras.estado_escritura(HOJA, "01-01-2040")["estado"] == "pendiente"
+
+    assert diario_escrituras.vaciar_diario(COLUMNAS) == 0
+
+    assert hoja.valores[1:] == [["01-01-2040", "1:00:00", "60"]]
+    assert diario_escrituras.estado_escritura(HOJA, "01-01-2040") == {"estado": "enviada", "error": None}
+    assert diario_escrituras.vaciar_diario(COLUMNAS) == 0
+    assert len(hoja.valores) == 2
+
+
+def test_la_misma_fecha_no_se_anota_dos_veces(hoja):
+    assert diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040", 60), COLUMNAS)
+    assert not diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040", 70), COLUMNAS)
+    assert diario_escrituras.registrar_escrituras(
+        HOJA, [_registro("01-01-2040", 80), _registro("02-01-2040")], COLUMNAS
+    ) == 1
+
+    diario_escrituras.vaciar_diario(COLUMNAS)
+
+    assert [fila[0] for fila in hoja.valores[1:]] == ["01-01-2040", "02-01-2040"]
+    assert hoja.valores[1][2] == "60"
+
+
+def test_vaciar_tras_reiniciar_el_proceso(hoja):
+    diario_escrituras.registrar_escrituras(HOJA, [_registro("01-01-2040"), _registro("02-01-2040")], COLUMNAS)
+    # Un vaciado anterior escribió la primera fila pero se cortó antes de marcarla
+    hoja.append_rows([["01-01-2040", "1:00:00", 60]])
+
+    recargado = importlib.reload(diario_escrituras)  # El diario vive en la base local, no en memoria
+    recargado.establecer_vaciado_automatico(False)
+
+    assert recargado.profundidad_cola(HOJA) == 2
+    assert recargado.vaciar_diario(COLUMNAS) == 0
+    assert [fila[0] for fila in hoja.valores[1:]] == ["01-01-2040", "02-01-2040"]
+
+
+def test_hoja_vacia_recibe_la_cabecera(sheets):
+    hoja = sheets.crear_hoja(HOJA)
+    diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040"), COLUMNAS)
+
+    diario_escrituras.vaciar_diario(COLUMNAS)
+
+    assert hoja.valores == [COLUMNAS, ["01-01-2040", "1:00:00", "60"]]
+
+
+def test_establecer_vaciado_automatico_devuelve_el_anterior(sheets):
+    assert diario_escrituras.establecer_vaciado_automatico(True) is False
+    assert diario_escrituras.establecer_vaciado_automatico(False) is True
+
+
+def _rechazar_carga(hoja, carga_rechazada, codigo=400):
+    """Hace que la hoja rechace (con `codigo`) todo lote que traiga esa carga en press banca."""
+    anadir = hoja.append_rows
+    lotes = []
+
+    def append_rows(filas, **kwargs):
+        lotes.append([fila[0] for fila in filas])
+        if any(fila[2] == carga_rechazada for fila in filas):
+            raise error_http(codigo)
+        anadir(filas, **kwargs)
+
+    hoja.append_rows = append_rows
+    return lotes
+
+
+def test_un_400_parte_el_lote_hasta_dar_con_la_fila(hoja):
+    fechas = ["01-01-2040", "02-01-2040", "03-01-2040", "04-01-2040"]
+    diario_escrituras.registrar_escrituras(
+        HOJA, [_registro(fecha, -1 if fecha == "03-01-2040" else 60) for fecha in fechas], COLUMNAS
+    )
+    lotes = _rechazar_carga(hoja, -1)
+
+    assert diario_escrituras.vaciar_diario(COLUMNAS) == 1
+
+    assert lotes == [fechas, fechas[:2], fechas[2:], ["03-01-2040"], ["04-01-2040"]]
+    assert [fila[0] for fila in hoja.valores[1:]] == ["01-01-2040", "02-01-2040", "04-01-2040"]
+    estado = diario_escrituras.estado_escritura(HOJA, "03-01-2040")
+    assert estado["estado"] == "pendiente" and estado["error"]
+
+
+def test_la_fila_se_descarta_tras_max_intentos_rechazo(hoja):
+    diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040", -1), COLUMNAS)
+    _rechazar_carga(hoja, -1)
+
+    for _ in range(diario_escrituras.MAX_INTENTOS_RECHAZO - 1):
+        assert diario_escrituras.vaciar_diario(COLUMNAS) == 1
+        assert diario_escrituras.estado_escritura(HOJA, "01-01-2040")["estado"] == "pendiente"
+    assert diario_escrituras.vaciar_diario(COLUMNAS) == 0
+
+    assert diario_escrituras.estado_escritura(HOJA, "01-01-2040")["estado"] == "descartada"
+    assert diario_escrituras.profundidad_cola() == 0
+    # Una fecha descartada se puede volver a registrar
+    assert diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040", 60), COLUMNAS)
+    assert diario_escrituras.vaciar_diario(COLUMNAS) == 0
+    assert hoja.valores[1:] == [["01-01-2040", "1:00:00", "60"]]
+
+
+def test_los_errores_que_no_son_400_nunca_descartan(hoja):
+    diario_escrituras.registrar_escritura(HOJA, _registro("01-01-2040", -1), COLUMNAS)
+    _rechazar_carga(hoja, -1, codigo=503)
+
+    for _ in range(diario_escrituras.MAX_INTENTOS_RECHAZO + 2):
+        assert diario_escrituras.vaciar_diario(COLUMNAS) == 1
+    assert diario_escrituras.estado_escritura(HOJA, "01-01-2040")["estado"] == "pendiente"
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from cache_imagenes import CacheImagenes
+from drive_utils import buscar_ultima_imagen_drive, listar_imagenes_drive, descargar_imagen_drive
+from fakes_google import DriveFalso
+
+CARPETA = "carpeta-pruebas"
+INICIO = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def drive():
+    servicio = DriveFalso()
+    for i in range(5):
+        servicio.anadir_archivo(CARPETA, f"foto_{i}.jpg", f"imagen {i}".encode(), creado=INICIO + timedelta(days=i))
+    servicio.anadir_archivo("otra-carpeta", "ajena.jpg", b"ajena", creado=INICIO + timedelta(days=30))
+    servicio.anadir_archivo(CARPETA, "notas.txt", b"texto", creado=INICIO + timedelta(days=30), mime_type="text/plain")
+    return servicio
+
+
+def test_ultima_imagen_en_una_sola_consulta(drive):
+    ultima = buscar_ultima_imagen_drive(CARPETA, servicio=drive)
+
+    assert ultima["name"] == "foto_4.jpg"
+    assert drive.llamadas == {"files.list": 1}
+
+
+def test_ultima_imagen_la_ordena_el_servidor(drive):
+    peticiones = []
+    archivos = drive.files
+
+    class Espia:
+        def list(self, **kwargs):
+            peticiones.append(kwargs)
+            return archivos().list(**kwargs)
+
+    drive.files = Espia
+    buscar_ultima_imagen_drive(CARPETA, servicio=drive)
+
+    assert peticiones[0]["orderBy"] == "createdTime desc"
+    assert peticiones[0]["pageSize"] == 1
+
+
+def test_ultima_imagen_de_carpeta_vacia(drive):
+    assert buscar_ultima_imagen_drive("carpeta-vacia", servicio=drive) is None
+
+
+def test_listar_recorre_todas_las_paginas(drive):
+    for i in range(5, 1205):
+        drive.anadir_archivo(CARPETA, f"foto_{i}.jpg", b"x", creado=INICIO + timedelta(minutes=i))
+
+    archivos = listar_imagenes_drive(CARPETA, servicio=drive)
+
+    assert len(archivos) == 1205
+    assert drive.llamadas["files.list"] == 2
+
+
+def test_listar_desde_una_fecha(drive):
+    desde = (INICIO + timedelta(days=3)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    nombres = [archivo["name"] for archivo in listar_imagenes_drive(CARPETA, servicio=drive, desde=desde)]
+
+    assert nombres == ["foto_3.jpg", "foto_4.jpg"]
+
+
+def test_descarga_servida_desde_la_cache(drive):
+    cache = CacheImagenes(directorio="cache")
+    ultima = buscar_ultima_imagen_drive(CARPETA, servicio=drive)
+
+    assert descargar_imagen_drive(ultima, servicio=drive, cache=cache) == b"imagen 4"
+    assert descargar_imagen_drive(ultima, servicio=drive, cache=cache) == b"imagen 4"
+    assert drive.llamadas["files.get_media"] == 1
@@ -0,0 +1,75 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+
+import cache_imagenes
+import fotos
+from fakes_google import DriveFalso
+
+CARPETA = "carpeta-pruebas"
+INICIO = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _jpeg(color):
+    salida = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(salida, format="JPEG")
+    return salida.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def indice_vacio(monkeypatch):
+    monkeypatch.setattr(cache_imagenes, "_cache", cache_imagenes.CacheImagenes())
+    fotos.reiniciar_indice()
+    yield
+    fotos.reiniciar_indice()
+
+
+@pytest.fixture
+def drive():
+    servicio = DriveFalso()
+    for i in range(6):
+        servicio.anadir_archivo(CARPETA, f"foto_{i}.jpg", _jpeg((i * 40, 0, 0)), creado=INICIO + timedelta(days=i))
+    return servicio
+
+
+def test_ultima_foto_con_una_consulta_y_una_descarga(drive):
+    assert fotos.ingerir_ultima_drive(CARPETA, servicio=drive)
+
+    assert fotos.ultima_foto(CARPETA)["nombre"] == "foto_5.jpg"
+    assert drive.llamadas == {"files.list": 1, "files.get_media": 1}
+
+
+def test_ultima_foto_ya_conocida_no_se_descarga(drive):
+    fotos.ingerir_ultima_drive(CARPETA, servicio=drive)
+
+    assert not fotos.ingerir_ultima_drive(CARPETA, servicio=drive)
+    assert drive.llamadas == {"files.list": 2, "files.get_media": 1}
+
+
+def test_la_galeria_no_repite_la_ultima_foto(drive):
+    fotos.ingerir_ultima_drive(CARPETA, servicio=drive)
+
+    assert fotos.ingerir_carpeta_drive(CARPETA, servicio=drive, forzar=True) == 5
+    assert [foto["nombre"] for foto in fotos.fotos([CARPETA])] == [f"foto_{i}.jpg" for i in range(5, -1, -1)]
+    assert drive.llamadas["files.get_media"] == 6
+
+
+def test_la_galeria_se_ingiere_por_lotes(drive):
+    assert fotos.ingerir_carpeta_drive(CARPETA, servicio=drive, forzar=True, lote=4) == 4
+    assert fotos.ingesta_pendiente(CARPETA)
+    assert len(fotos.fotos([CARPETA])) == 4
+
+    assert fotos.ingerir_carpeta_drive(CARPETA, servicio=drive, forzar=True, lote=4) == 2
+    assert not fotos.ingesta_pendiente(CARPETA)
+    assert drive.llamadas["files.get_media"] == 6
+
+
+def test_una_foto_rota_no_detiene_los_lotes(drive):
+    drive.anadir_archivo(CARPETA, "rota.jpg", b"no es una imagen", creado=INICIO - timedelta(days=1))
+
+    assert fotos.ingerir_carpeta_drive(CARPETA, servicio=drive, forzar=True, lote=4) == 4
+    assert fotos.ingerir_carpeta_drive(CARPETA, servicio=drive, forzar=True, lote=4) == 2
+    assert not fotos.ingesta_pendiente(CARPETA)
+    assert drive.llamadas["files.get_media"] == 7  # La rota se reintenta desde la caché
@@ -0,0 +1,53 @@
+import json
+import threading
+
+import pytest
+
+import google_clients
+
+
+@pytest.fixture
+def credenciales_drive(directorio_temporal):
+    """Archivo de cuenta de servicio con una clave generada (no se llega a pedir ningún token)."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    clave = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    with open(google_clients.CREDENCIALES_DRIVE, "w") as f:
+        json.dump({
+            "type": "service_account", "project_id": "pruebas", "private_key_id": "1",
+            "private_key": clave.decode(), "client_email": "pruebas@pruebas.iam.gserviceaccount.com",
+            "client_id": "1", "token_uri": "https://oauth2.googleapis.com/token",
+        }, f)
+    google_clients.reiniciar_clientes()
+    yield
+    google_clients.reiniciar_clientes()
+
+
+def test_un_servicio_de_drive_por_proceso(credenciales_drive):
+    servicio = google_clients.obtener_servicio_drive()
+    desde_otro_hilo = []
+    hilo = threading.Thread(target=lambda: desde_otro_hilo.append(google_clients.obtener_servicio_drive()))
+    hilo.start()
+    hilo.join()
+
+    assert google_clients.obtener_servicio_drive() is servicio
+    assert desde_otro_hilo == [servicio]
+
+
+def test_cada_peticion_lleva_su_propio_http(credenciales_drive):
+    archivos = google_clients.obtener_servicio_drive().files()
+
+    primera = archivos.list(q="'a' in parents")
+    segunda = archivos.get_media(fileId="b")
+
+    assert primera.http is not segunda.http
+
+
+def test_reiniciar_descarta_el_servicio(credenciales_drive):
+    servicio = google_clients.obtener_servicio_drive()
+    google_clients.reiniciar_clientes()
+
+    assert google_clients.obtener_servicio_drive() is not servicio
@@ -0,0 +1,45 @@
+import pytest
+
+import almacenamiento
+from progresion import resumen_progresion
+
+HOJA = "data_pruebas"
+
+
+@pytest.fixture
+def base():
+    motor = almacenamiento.AlmacenamientoSQLite(espejo=False)
+    almacenamiento.establecer_almacenamiento(motor)
+    yield motor
+    almacenamiento.establecer_almacenamiento(None)
+
+
+def _guardar(base, fecha, carga, repeticiones):
+    base.guardar_sesion(HOJA, {
+        "Fecha": fecha, "Tiempo entrenado": "1:00:00", "Sensación": "buena", "press banca": carga,
+        "Series": {"press banca": {"series": 3, "repeticiones": repeticiones}},
+    })
+
+
+def test_la_proyeccion_compara_cargas_en_crudo_con_maximos(base):
+    # 80, 85 y 90 kg a 10 repeticiones: el 1RM estimado ya pasa del máximo (100 kg)
+    for fecha, carga in (("01-01-2024", 80), ("08-01-2024", 85), ("15-01-2024", 90)):
+        _guardar(base, fecha, carga, 10)
+    df = base.cargar([HOJA])[0]
+
+    resumen = resumen_progresion(HOJA, df, "hombre").loc["press banca"]
+
+    assert resumen["record"] == pytest.approx(120)
+    assert resumen["semanas_a_maximo"] == pytest.approx(2)  # 90 kg + 5 kg por semana
+    assert resumen["fecha_maximo"].strftime("%d-%m-%Y") == "29-01-2024"
+
+
+def test_sin_repeticiones_la_proyeccion_usa_la_misma_pendiente(base):
+    for fecha, carga in (("01-01-2024", 80), ("08-01-2024", 85), ("15-01-2024", 90)):
+        _guardar(base, fecha, carga, None)
+    df = base.cargar([HOJA])[0]
+
+    resumen = resumen_progresion(HOJA, df, "hombre").loc["press banca"]
+
+    assert resumen["tendencia"] == pytest.approx(5)
+    assert resumen["semanas_a_maximo"] == pytest.approx(2)
@@ -0,0 +1,119 @@
+import pandas as pd
+import pytest
+
+import almacenamiento
+import atletas
+import diario_escrituras
+import servicio_datos
+from benchmarks.datos_sinteticos import atletas_sinteticos, historial_sintetico
+from conftest import error_http
+
+FECHA = "01-01-2040"
+
+
+def _registro(carga):
+    return {"Fecha": FECHA, "Tiempo entrenado": "1:00:00", "Sensación": "buena", "press banca": carga}
+
+
+@pytest.fixture
+def atleta(sheets, monkeypatch):
+    """Un atleta sintético con un año de historial en Sheets y la instantánea compartida vacía."""
+    registro = atletas_sinteticos(1)
+    sheets.crear_hoja(registro[0]["hoja"], historial_sintetico(1, semilla=0))
+    monkeypatch.setattr(atletas, "_atletas", atletas._atletas)
+    atletas.establecer_atletas(registro)
+    servicio_datos.reiniciar()
+    yield atletas.obtener_atletas()[0]
+    servicio_datos.reiniciar()
+    almacenamiento.establecer_almacenamiento(None)
+
+
+def _rechazar_todo(sheets, atleta):
+    def append_rows(filas, **kwargs):
+        raise error_http(400)
+
+    sheets.hojas[atleta["hoja"]].append_rows = append_rows
+
+
+def _df(atleta):
+    return servicio_datos.dataframes([atleta])[atleta["nombre"]]
+
+
+def _vaciar_hasta_descartar():
+    for _ in range(diario_escrituras.MAX_INTENTOS_RECHAZO):
+        diario_escrituras.vaciar_diario()
+
+
+def test_sesion_aceptada_deja_de_vigilarse(atleta, sheets):
+    almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())
+    antes = len(_df(atleta))
+
+    servicio_datos.registrar_sesion(atleta, _registro(61))
+    assert len(_df(atleta)) == antes + 1  # Aplicada sin esperar a Google
+    diario_escrituras.vaciar_diario()
+    servicio_datos.confirmar_escrituras()
+
+    assert servicio_datos._sin_confirmar == {}
+    assert servicio_datos.rechazadas_desde(0) == []
+    assert len(_df(atleta)) == antes + 1
+
+
+def test_rechazo_con_solo_sheets_deshace_la_sesion(atleta, sheets):
+    almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())
+    antes = len(_df(atleta))
+    _rechazar_todo(sheets, atleta)
+
+    servicio_datos.registrar_sesion(atleta, _registro(61))
+    version = servicio_datos._datos[atleta["hoja"]]["version"]
+    _vaciar_hasta_descartar()
+    servicio_datos.confirmar_escrituras()
+
+    df = _df(atleta)
+    assert len(df) == antes
+    assert pd.Timestamp(2040, 1, 1) not in df.index
+    assert servicio_datos._datos[atleta["hoja"]]["version"] == version + 1
+    assert [(r["fecha"], r["deshecha"]) for r in servicio_datos.rechazadas_desde(0)] == [(FECHA, True)]
+    assert servicio_datos._sin_confirmar == {}
+
+
+def test_rechazo_con_copia_local_conserva_la_sesion(atleta, sheets):
+    almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSQLite())
+    antes = len(_df(atleta))
+    _rechazar_todo(sheets, atleta)
+
+    servicio_datos.registrar_sesion(atleta, _registro(61))
+    _vaciar_hasta_descartar()
+    servicio_datos.confirmar_escrituras()
+
+    assert len(_df(atleta)) == antes + 1
+    assert [(r["fecha"], r["deshecha"]) for r in servicio_datos.rechazadas_desde(0)] == [(FECHA, False)]
+
+
+def test_sin_confirmar_se_vigila_mientras_google_no_responde(atleta, sheets):
+    almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())
+
+    def append_rows(filas, **kwargs):
+        raise error_http(503)
+
+    sheets.hojas[atleta["hoja"]].append_rows = append_rows
+    servicio_datos.registrar_sesion(atleta, _registro(61))
+    _vaciar_hasta_descartar()
+    servicio_datos.confirmar_escrituras()
+
+    assert list(servicio_datos._sin_confirmar) == [(atleta["hoja"], FECHA)]
+    assert servicio_datos.rechazadas_desde(0) == []
+
+
+def test_ultimos_ejercicios_una_vez_por_version(atleta, sheets, monkeypatch):
+    almacenamiento.establecer_almacenamiento(almacenamiento.AlmacenamientoSheets())
+    primeros = servicio_datos.ultimos_ejercicios(atleta)
+    calculos = []
+    ffill = pd.DataFrame.ffill
+    monkeypatch.setattr(pd.DataFrame, "ffill", lambda df, *a, **k: calculos.append(1) or ffill(df, *a, **k))
+
+    assert servicio_datos.ultimos_ejercicios(atleta) == primeros
+    assert calculos == []
+
+    servicio_datos.registrar_sesion(atleta, _registro(61))
+    assert servicio_datos.ultimos_ejercicios(atleta)["press banca"] == 61
+    assert calculos == [1]